@@ -244,3 +244,157 @@ SELECT * FROM products;
 -- View all orders
 -- ======================================
 SELECT * FROM orders;
+
+-- ======================================
+-- Indexes for the staff order search (newest first, keyset paged)
+-- ======================================
+CREATE INDEX idx_orders_timestamp ON orders (timestamp, orderId);
+CREATE INDEX idx_orders_status_timestamp ON orders (status, timestamp, orderId);
+CREATE INDEX idx_orders_user_timestamp ON orders (userId, timestamp, orderId);
+CREATE INDEX idx_orders_total_timestamp ON orders (total, timestamp);
+
+-- ======================================
+-- Indexes for category browsing (one per sort key)
+-- ======================================
+CREATE INDEX idx_products_category_price ON products (categoryId, price);
+CREATE INDEX idx_products_category_rating ON products (categoryId, rating);
+CREATE INDEX idx_products_category_discount ON products (categoryId, discount_percentage);
+
+-- ======================================
+-- Table: outbox_events (written with the order, delivered by backend/worker.py)
+-- ======================================
+CREATE TABLE outbox_events (
+    eventId BIGINT AUTO_INCREMENT PRIMARY KEY,
+    eventType VARCHAR(64) NOT NULL,
+    aggregateId INT,
+    payload JSON NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending', -- pending / done / dead
+    attempts INT NOT NULL DEFAULT 0,
+    lastError TEXT,
+    createdAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    availableAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    lockedBy VARCHAR(128),
+    lockedUntil DATETIME,
+    processedAt DATETIME,
+    INDEX idx_outbox_due (status, availableAt, eventId),
+    INDEX idx_outbox_locked (lockedBy)
+);
+
+-- ======================================
+-- Table: user_order_summaries (maintained by checkout and status updates)
+-- Backfill with: python backend/rebuild_order_summaries.py
+-- ======================================
+CREATE TABLE user_order_summaries (
+    userId INT PRIMARY KEY,
+    orderCount INT NOT NULL DEFAULT 0,
+    totalSpent DECIMAL(12, 2) NOT NULL DEFAULT 0.00, -- excludes cancelled orders
+    itemsPurchased INT NOT NULL DEFAULT 0,
+    lastOrderId INT,
+    lastOrderStatus VARCHAR(20),
+    lastOrderAt DATETIME,
+    UNIQUE KEY unique_last_order (lastOrderId),
+    FOREIGN KEY (userId) REFERENCES users(userId)
+);
+
+-- ======================================
+-- Archive tables: finished orders older than ORDER_ARCHIVE_AFTER_DAYS (default 365)
+-- are moved here in batches by: python backend/archive_orders.py
+-- (MySQL range partitioning is not used because partitioned InnoDB tables cannot have foreign keys.)
+-- ======================================
+CREATE TABLE orders_archive (
+    orderId INT PRIMARY KEY,
+    userId INT,
+    total DECIMAL(10, 2),
+    shipping JSON,
+    payment JSON,
+    status VARCHAR(20),
+    timestamp DATETIME,
+    INDEX idx_orders_archive_timestamp (timestamp, orderId),
+    INDEX idx_orders_archive_status_timestamp (status, timestamp, orderId),
+    INDEX idx_orders_archive_user_timestamp (userId, timestamp, orderId),
+    INDEX idx_orders_archive_total_timestamp (total, timestamp)
+);
+
+CREATE TABLE order_items_archive (
+    orderItemId INT PRIMARY KEY,
+    orderId INT,
+    productId INT,
+    quantity INT,
+    price DECIMAL(10, 2),
+    INDEX idx_order_items_archive_order (orderId)
+);
+
+-- ======================================
+-- Inventory: each tracked product's stock is split across INVENTORY_SLOTS counter rows
+-- so concurrent checkouts of one product lock different rows. Products without rows
+-- are not tracked. Checkout holds stock in inventory_reservations; cancelling gives it back.
+-- ======================================
+CREATE TABLE inventory_slots (
+    productId INT NOT NULL,
+    slot SMALLINT NOT NULL,
+    available INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (productId, slot),
+    FOREIGN KEY (productId) REFERENCES products(productId),
+    CHECK (available >= 0)
+);
+
+CREATE TABLE inventory_reservations (
+    reservationId BIGINT AUTO_INCREMENT PRIMARY KEY,
+    orderId INT NOT NULL, -- no foreign key: archived orders leave orders
+    productId INT NOT NULL,
+    slot SMALLINT NOT NULL,
+    quantity INT NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'held', -- held / committed / released
+    createdAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    expiresAt DATETIME,
+    INDEX idx_reservations_order (orderId),
+    INDEX idx_reservations_expiry (status, expiresAt),
+    INDEX idx_reservations_product (productId, status)
+);
+
+-- ======================================
+-- Abandoned cart items copied here by: python backend/expire_carts.py --archive
+-- (or the worker with CART_RETENTION_ARCHIVE=true) before they are deleted
+-- ======================================
+CREATE TABLE cart_items_archive (
+    cartItemId INT PRIMARY KEY,
+    userId VARCHAR(255) NOT NULL,
+    productId INT NOT NULL,
+    quantity INT NOT NULL,
+    addedAt TIMESTAMP NULL,
+    expiredAt DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_cart_items_archive_product (productId)
+);
+
+-- ======================================
+-- Staff order search by destination and payment method. shipping and payment are
+-- native JSON columns; the commonly filtered fields are copied into stored generated
+-- columns (trimmed, lower-cased, cut to the column width) so they can be indexed.
+-- The staff API lower-cases filter values to match. Adding stored columns rebuilds
+-- the tables, so run this in a maintenance window on large stores.
+-- ======================================
+ALTER TABLE orders
+    ADD COLUMN shipping_country VARCHAR(64) AS (LOWER(LEFT(TRIM(shipping->>'$.country'), 64))) STORED,
+    ADD COLUMN shipping_city VARCHAR(128) AS (LOWER(LEFT(TRIM(shipping->>'$.city'), 128))) STORED,
+    ADD COLUMN shipping_postcode VARCHAR(32) AS (LOWER(LEFT(TRIM(COALESCE(shipping->>'$.postcode', shipping->>'$.zip')), 32))) STORED,
+    ADD COLUMN payment_method VARCHAR(32) AS (LOWER(LEFT(TRIM(payment->>'$.method'), 32))) STORED,
+    ADD INDEX idx_orders_shipping_country_timestamp (shipping_country, timestamp, orderId),
+    ADD INDEX idx_orders_shipping_city_timestamp (shipping_city, timestamp, orderId),
+    ADD INDEX idx_orders_shipping_postcode_timestamp (shipping_postcode, timestamp, orderId),
+    ADD INDEX idx_orders_payment_method_timestamp (payment_method, timestamp, orderId);
+
+ALTER TABLE orders_archive
+    ADD COLUMN shipping_country VARCHAR(64) AS (LOWER(LEFT(TRIM(shipping->>'$.country'), 64))) STORED,
+    ADD COLUMN shipping_city VARCHAR(128) AS (LOWER(LEFT(TRIM(shipping->>'$.city'), 128))) STORED,
+    ADD COLUMN shipping_postcode VARCHAR(32) AS (LOWER(LEFT(TRIM(COALESCE(shipping->>'$.postcode', shipping->>'$.zip')), 32))) STORED,
+    ADD COLUMN payment_method VARCHAR(32) AS (LOWER(LEFT(TRIM(payment->>'$.method'), 32))) STORED,
+    ADD INDEX idx_orders_archive_shipping_country_timestamp (shipping_country, timestamp, orderId),
+    ADD INDEX idx_orders_archive_shipping_city_timestamp (shipping_city, timestamp, orderId),
+    ADD INDEX idx_orders_archive_shipping_postcode_timestamp (shipping_postcode, timestamp, orderId),
+    ADD INDEX idx_orders_archive_payment_method_timestamp (payment_method, timestamp, orderId);
+
+-- ======================================
+-- Delivered outbox events are purged by the worker once older than
+-- OUTBOX_RETENTION_DAYS; this index finds them oldest first.
+-- ======================================
+CREATE INDEX idx_outbox_processed ON outbox_events (status, processedAt);
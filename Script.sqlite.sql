@@ -0,0 +1,227 @@
+-- ======================================
+-- SQLite schema for DB_BACKEND=sqlite
+-- Mirrors Script.sql; applied automatically when the database file is new.
+-- Timestamps are stored as local-time 'YYYY-MM-DD HH:MM:SS' text, like MySQL's CURRENT_TIMESTAMP.
+-- ======================================
+
+-- ======================================
+-- Table: users (customers)
+-- ======================================
+CREATE TABLE users (
+    userId INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+-- ======================================
+-- Table: staff (admin and employees)
+-- ======================================
+CREATE TABLE staff (
+    staffId INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    role VARCHAR(20) NOT NULL DEFAULT 'staff',
+    created_at TIMESTAMP DEFAULT (datetime('now', 'localtime'))
+);
+
+-- ======================================
+-- Table: products
+-- ======================================
+CREATE TABLE products (
+    productId INTEGER PRIMARY KEY AUTOINCREMENT,
+    title VARCHAR(255) NOT NULL,
+    price DECIMAL(10, 2) NOT NULL,
+    categoryId INT,
+    image BLOB,
+    description TEXT,
+    rating DECIMAL(3, 2) DEFAULT 0.00,
+    discount_percentage INT DEFAULT 0,
+    original_price DECIMAL(10, 2) DEFAULT NULL
+);
+
+-- ======================================
+-- Table: cart_items (user shopping cart)
+-- ======================================
+CREATE TABLE cart_items (
+    cartItemId INTEGER PRIMARY KEY AUTOINCREMENT,
+    userId VARCHAR(255) NOT NULL,
+    productId INT NOT NULL REFERENCES products(productId),
+    quantity INT NOT NULL DEFAULT 1,
+    addedAt TIMESTAMP DEFAULT (datetime('now', 'localtime')),
+    UNIQUE (userId, productId)
+);
+
+-- ======================================
+-- Table: orders (main order info)
+-- ======================================
+CREATE TABLE orders (
+    orderId INTEGER PRIMARY KEY AUTOINCREMENT,
+    userId INT REFERENCES users(userId),
+    total DECIMAL(10, 2),
+    shipping JSON,
+    payment JSON,
+    status VARCHAR(20) DEFAULT 'pending',
+    timestamp DATETIME DEFAULT (datetime('now', 'localtime')),
+    -- Stored copies of the commonly filtered JSON fields (trimmed, lower-cased) so staff search can index them
+    shipping_country VARCHAR(64) GENERATED ALWAYS AS (lower(trim(json_extract(shipping, '$.country')))) STORED,
+    shipping_city VARCHAR(128) GENERATED ALWAYS AS (lower(trim(json_extract(shipping, '$.city')))) STORED,
+    shipping_postcode VARCHAR(32) GENERATED ALWAYS AS (lower(trim(coalesce(json_extract(shipping, '$.postcode'), json_extract(shipping, '$.zip'))))) STORED,
+    payment_method VARCHAR(32) GENERATED ALWAYS AS (lower(trim(json_extract(payment, '$.method')))) STORED
+);
+
+-- ======================================
+-- Table: order_items (items under each order)
+-- ======================================
+CREATE TABLE order_items (
+    orderItemId INTEGER PRIMARY KEY AUTOINCREMENT,
+    orderId INT REFERENCES orders(orderId),
+    productId INT REFERENCES products(productId),
+    quantity INT,
+    price DECIMAL(10, 2)
+);
+CREATE INDEX idx_order_items_order ON order_items (orderId);
+
+-- ======================================
+-- Indexes for the staff order search (newest first, keyset paged)
+-- ======================================
+CREATE INDEX idx_orders_timestamp ON orders (timestamp, orderId);
+CREATE INDEX idx_orders_status_timestamp ON orders (status, timestamp, orderId);
+CREATE INDEX idx_orders_user_timestamp ON orders (userId, timestamp, orderId);
+CREATE INDEX idx_orders_total_timestamp ON orders (total, timestamp);
+CREATE INDEX idx_orders_shipping_country_timestamp ON orders (shipping_country, timestamp, orderId);
+CREATE INDEX idx_orders_shipping_city_timestamp ON orders (shipping_city, timestamp, orderId);
+CREATE INDEX idx_orders_shipping_postcode_timestamp ON orders (shipping_postcode, timestamp, orderId);
+CREATE INDEX idx_orders_payment_method_timestamp ON orders (payment_method, timestamp, orderId);
+
+-- ======================================
+-- Indexes for category browsing (one per sort key)
+-- ======================================
+CREATE INDEX idx_products_category_price ON products (categoryId, price);
+CREATE INDEX idx_products_category_rating ON products (categoryId, rating);
+CREATE INDEX idx_products_category_discount ON products (categoryId, discount_percentage);
+
+-- ======================================
+-- Table: outbox_events (written with the order, delivered by backend/worker.py)
+-- ======================================
+CREATE TABLE outbox_events (
+    eventId INTEGER PRIMARY KEY AUTOINCREMENT,
+    eventType VARCHAR(64) NOT NULL,
+    aggregateId INT,
+    payload JSON NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending', -- pending / done / dead
+    attempts INT NOT NULL DEFAULT 0,
+    lastError TEXT,
+    createdAt DATETIME DEFAULT (datetime('now', 'localtime')),
+    availableAt DATETIME DEFAULT (datetime('now', 'localtime')),
+    lockedBy VARCHAR(128),
+    lockedUntil DATETIME,
+    processedAt DATETIME
+);
+CREATE INDEX idx_outbox_due ON outbox_events (status, availableAt, eventId);
+CREATE INDEX idx_outbox_locked ON outbox_events (lockedBy);
+CREATE INDEX idx_outbox_processed ON outbox_events (status, processedAt);
+
+-- ======================================
+-- Table: user_order_summaries (maintained by checkout and status updates)
+-- ======================================
+CREATE TABLE user_order_summaries (
+    userId INTEGER PRIMARY KEY REFERENCES users(userId),
+    orderCount INT NOT NULL DEFAULT 0,
+    totalSpent DECIMAL(12, 2) NOT NULL DEFAULT 0.00, -- excludes cancelled orders
+    itemsPurchased INT NOT NULL DEFAULT 0,
+    lastOrderId INT UNIQUE,
+    lastOrderStatus VARCHAR(20),
+    lastOrderAt DATETIME
+);
+
+-- ======================================
+-- Archive tables: finished orders moved by backend/archive_orders.py
+-- ======================================
+CREATE TABLE orders_archive (
+    orderId INTEGER PRIMARY KEY,
+    userId INT,
+    total DECIMAL(10, 2),
+    shipping JSON,
+    payment JSON,
+    status VARCHAR(20),
+    timestamp DATETIME,
+    -- Stored copies of the commonly filtered JSON fields (trimmed, lower-cased) so staff search can index them
+    shipping_country VARCHAR(64) GENERATED ALWAYS AS (lower(trim(json_extract(shipping, '$.country')))) STORED,
+    shipping_city VARCHAR(128) GENERATED ALWAYS AS (lower(trim(json_extract(shipping, '$.city')))) STORED,
+    shipping_postcode VARCHAR(32) GENERATED ALWAYS AS (lower(trim(coalesce(json_extract(shipping, '$.postcode'), json_extract(shipping, '$.zip'))))) STORED,
+    payment_method VARCHAR(32) GENERATED ALWAYS AS (lower(trim(json_extract(payment, '$.method')))) STORED
+);
+CREATE INDEX idx_orders_archive_timestamp ON orders_archive (timestamp, orderId);
+CREATE INDEX idx_orders_archive_status_timestamp ON orders_archive (status, timestamp, orderId);
+CREATE INDEX idx_orders_archive_user_timestamp ON orders_archive (userId, timestamp, orderId);
+CREATE INDEX idx_orders_archive_total_timestamp ON orders_archive (total, timestamp);
+CREATE INDEX idx_orders_archive_shipping_country_timestamp ON orders_archive (shipping_country, timestamp, orderId);
+CREATE INDEX idx_orders_archive_shipping_city_timestamp ON orders_archive (shipping_city, timestamp, orderId);
+CREATE INDEX idx_orders_archive_shipping_postcode_timestamp ON orders_archive (shipping_postcode, timestamp, orderId);
+CREATE INDEX idx_orders_archive_payment_method_timestamp ON orders_archive (payment_method, timestamp, orderId);
+
+CREATE TABLE order_items_archive (
+    orderItemId INTEGER PRIMARY KEY,
+    orderId INT,
+    productId INT,
+    quantity INT,
+    price DECIMAL(10, 2)
+);
+CREATE INDEX idx_order_items_archive_order ON order_items_archive (orderId);
+
+-- ======================================
+-- Inventory: stock split across counter slots, and the holds taken at checkout
+-- ======================================
+CREATE TABLE inventory_slots (
+    productId INT NOT NULL REFERENCES products(productId),
+    slot SMALLINT NOT NULL,
+    available INT NOT NULL DEFAULT 0 CHECK (available >= 0),
+    PRIMARY KEY (productId, slot)
+);
+
+CREATE TABLE inventory_reservations (
+    reservationId INTEGER PRIMARY KEY AUTOINCREMENT,
+    orderId INT NOT NULL,
+    productId INT NOT NULL,
+    slot SMALLINT NOT NULL,
+    quantity INT NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'held', -- held / committed / released
+    createdAt DATETIME DEFAULT (datetime('now', 'localtime')),
+    expiresAt DATETIME
+);
+CREATE INDEX idx_reservations_order ON inventory_reservations (orderId);
+CREATE INDEX idx_reservations_expiry ON inventory_reservations (status, expiresAt);
+CREATE INDEX idx_reservations_product ON inventory_reservations (productId, status);
+
+-- ======================================
+-- Abandoned cart items archived by backend/expire_carts.py --archive
+-- ======================================
+CREATE TABLE cart_items_archive (
+    cartItemId INTEGER PRIMARY KEY,
+    userId VARCHAR(255) NOT NULL,
+    productId INT NOT NULL,
+    quantity INT NOT NULL,
+    addedAt TIMESTAMP,
+    expiredAt DATETIME DEFAULT (datetime('now', 'localtime'))
+);
+CREATE INDEX idx_cart_items_archive_product ON cart_items_archive (productId);
+
+-- ======================================
+-- Sample data
+-- ======================================
+INSERT INTO staff (name, email, password, role)
+VALUES ('Admin User', 'staff@example.com', '$2b$12$wSWd2RE1kQhP7sS4Qn2a2.adlEJa7H2UcZlRVC.jEIGaWgdrr9e/K', 'admin');
+
+INSERT INTO products (title, price, categoryId, image, description, rating, discount_percentage, original_price) VALUES
+('Laptop Pro 15', 999.99, 1, 'laptop.png', 'High-performance laptop with a 15-inch display.', 4.8, 20, 1249.99),
+('Smartphone X12', 699.99, 2, 'phone.png', 'Latest smartphone with advanced camera features.', 4.5, 15, 823.52),
+('Wireless Headphones', 149.99, 3, 'headphones.png', 'Wireless headphones with noise cancellation.', 4.3, 25, 199.99),
+('Smart Watch V3', 199.99, 4, 'smartwatch.png', 'Smartwatch with fitness tracking and notifications.', 4.1, 10, 222.21),
+('Gaming Mouse', 59.99, 5, 'keyboard.png', 'Ergonomic gaming mouse with customizable buttons.', 4.6, 0, NULL),
+('Bluetooth Speaker', 89.99, 6, 'speaker.png', 'Portable Bluetooth speaker with deep bass.', 4.2, 18, 109.75),
+('4K Monitor 27"', 349.99, 1, 'monitor.png', '27-inch 4K monitor with vibrant colors.', 4.7, 12, 397.71),
+('Tablet S10', 499.99, 2, 'ipad.png', '10-inch tablet with stylus support.', 4.4, 23, 649.34),
+('Keyboard Mechanical', 129.99, 5, 'keyboard.png', 'Mechanical keyboard with RGB lighting.', 4.9, 0, NULL);
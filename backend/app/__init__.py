@@ -1,37 +1,62 @@
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, request, send_from_directory, jsonify
 from flask_cors import CORS
 import os
 import logging
 
+# Image directory (frontend/assets/images)
+IMAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'frontend', 'assets', 'images'))
+
 def create_app():
-    # Configure logging
-    logging.basicConfig(level=logging.DEBUG)
+    # Configure logging (LOG_LEVEL=INFO or WARNING in production)
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'DEBUG').upper())
     logger = logging.getLogger(__name__)
 
     app = Flask(__name__)
 
     # Enable CORS for API endpoints and static images
     CORS(app, resources={
-        r"/api/*": {"origins": "http://localhost:3000"},
+        r"/api/*": {"origins": "http://localhost:3000", "expose_headers": ["Retry-After", "X-Request-ID"]},
         r"/assets/images/*": {"origins": "http://localhost:3000"}
     })
 
-    # Define the image directory (updated to frontend/assets)
-    IMAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'frontend', 'assets', 'images'))
     logger.debug(f"Image directory set to: {IMAGE_DIR}")
 
+    # Startup timings and early request latency, reported by the readiness probe
+    from app.utils import startup
+    startup.init_app(app)
+
+    # Request IDs for logs and the slow-query buffer
+    from app.utils import query_profiler
+    query_profiler.init_app(app)
+
+    # Conditional GET support (ETag / Last-Modified / 304) for read endpoints
+    from app.utils import http_cache
+    http_cache.init_app(app)
+
+    # Per-client rate limits and per-endpoint concurrency caps (429 / 503 with Retry-After)
+    from app.utils import rate_limit
+    rate_limit.init_app(app)
+
+    # Circuit breaker fallbacks: stale catalog reads and fast 503s while the database is down
+    from app.utils import degraded_mode
+    degraded_mode.init_app(app)
+
     # Register blueprints
     from app.routes.auth import auth_bp
     from app.routes.products import products_bp
     from app.routes.cart import cart_bp
     from app.routes.orders import orders_bp
     from app.routes.staff import staff_bp
+    from app.routes.users import users_bp
+    from app.routes.health import health_bp
 
     app.register_blueprint(auth_bp, name='auth_api')
     app.register_blueprint(products_bp, name='products_api')
     app.register_blueprint(cart_bp, name='cart_api')
     app.register_blueprint(orders_bp, name='orders_api')
     app.register_blueprint(staff_bp, name='staff_api')
+    app.register_blueprint(users_bp, name='users_api')
+    app.register_blueprint(health_bp, name='health_api')
 
     # Serve static images
     @app.route('/assets/images/<path:filename>')
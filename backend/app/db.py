@@ -1,13 +1,888 @@
 import mysql.connector
+from mysql.connector import errorcode, pooling
 from dotenv import load_dotenv
+from datetime import date, datetime
+from decimal import Decimal
+import functools
+import logging
 import os
+import itertools
+import math
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from flask import g, has_request_context, request
+from app.utils import query_profiler
 
 load_dotenv()
 
-def get_db_connection():
-    return mysql.connector.connect(
-        host=os.getenv("MYSQL_HOST"),
+logger = logging.getLogger(__name__)
+
+# 'mysql' (default) or 'sqlite' for a single-node deployment without a database server
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+SQLITE_PATH = os.getenv(
+    "SQLITE_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'awe_store.db'))
+)
+SQLITE_SCHEMA = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'Script.sqlite.sql'))
+# Milliseconds a writer waits for another writer's transaction before failing
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+
+POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "10"))
+
+# Read replicas as comma-separated host[:port] entries; reads use the primary when empty
+REPLICA_HOSTS = [host.strip() for host in os.getenv("MYSQL_REPLICA_HOSTS", "").split(",") if host.strip()]
+# Seconds a replica stays out of rotation after a connection failure
+REPLICA_EJECT_SECONDS = float(os.getenv("MYSQL_REPLICA_EJECT_SECONDS", "30"))
+# Replicas further behind than this are skipped; also the assumed lag when it can't be measured
+MAX_REPLICA_LAG = float(os.getenv("MYSQL_MAX_REPLICA_LAG", "5"))
+REPLICA_LAG_CHECK_INTERVAL = 5.0
+
+# Client-side socket timeouts (seconds), the backstop for anything the server cannot interrupt
+MYSQL_CONNECT_TIMEOUT = int(os.getenv("MYSQL_CONNECT_TIMEOUT", "3"))
+MYSQL_READ_TIMEOUT = int(os.getenv("MYSQL_READ_TIMEOUT", "30"))
+MYSQL_WRITE_TIMEOUT = int(os.getenv("MYSQL_WRITE_TIMEOUT", "30"))
+
+# Per-statement deadline (ms) by endpoint; endpoints not listed get DEFAULT_QUERY_DEADLINE_MS.
+# Statements run outside a request (worker, CLI scripts) have no deadline.
+DEFAULT_QUERY_DEADLINE_MS = int(os.getenv("DEFAULT_QUERY_DEADLINE_MS", "5000"))
+QUERY_DEADLINES_MS = {
+    'get_products': 2000,
+    'get_products_batch': 1000,
+    'get_product': 1000,
+    'get_related_products': 1000,
+    'search_products': 3000,
+    'get_category_products': 2000,
+    'get_category_facets': 3000,
+    'get_single_category_facets': 3000,
+    'get_cart': 2000,
+    'get_order_history': 3000,
+    'get_order_summary': 1000,
+    'place_order': 5000,
+    'get_all_orders': 10000,
+    'bulk_update_order_status': 15000,
+    'reprice_products': 30000,
+    'get_staff_stats': 10000,
+}
+# Extra seconds the client waits past a deadline so the server's own timeout error arrives first
+DEADLINE_GRACE_SECONDS = 1
+
+# Consecutive database failures that open the circuit breaker, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("DB_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("DB_BREAKER_RESET_SECONDS", "10"))
+
+# Hot statements prepared once per pooled connection and executed by name.
+# Each string object is reused as-is so the prepared cursor recognises it.
+STATEMENTS = {
+    'all_products': 'SELECT * FROM products',
+    'product_by_id': 'SELECT * FROM products WHERE productId = %s',
+    'product_exists': 'SELECT productId FROM products WHERE productId = %s',
+    'staff_exists': 'SELECT staffId FROM staff WHERE staffId = %s',
+    'user_profile': 'SELECT userId, name, email FROM users WHERE userId = %s',
+    'order_summary': """
+        SELECT userId, orderCount, totalSpent, itemsPurchased, lastOrderId, lastOrderStatus, lastOrderAt
+        FROM user_order_summaries
+        WHERE userId = %s
+    """,
+    'cart_items': """
+        SELECT ci.cartItemId, ci.userId, ci.productId, ci.quantity, ci.addedAt,
+               p.title, p.price, p.image
+        FROM cart_items ci
+        JOIN products p ON ci.productId = p.productId
+        WHERE ci.userId = %s
+    """,
+    'user_orders': """
+        SELECT orderId, userId, total, shipping, payment, status, timestamp
+        FROM orders
+        WHERE userId = %s
+        ORDER BY timestamp DESC
+    """,
+    'order_items': """
+        SELECT oi.orderItemId, oi.orderId, oi.productId, oi.quantity, oi.price,
+               p.title, p.image
+        FROM order_items oi
+        JOIN products p ON oi.productId = p.productId
+        WHERE oi.orderId = %s
+    """,
+    'user_archived_orders': """
+        SELECT orderId, userId, total, shipping, payment, status, timestamp
+        FROM orders_archive
+        WHERE userId = %s
+        ORDER BY timestamp DESC
+    """,
+    'archived_order_items': """
+        SELECT oi.orderItemId, oi.orderId, oi.productId, oi.quantity, oi.price,
+               p.title, p.image
+        FROM order_items_archive oi
+        JOIN products p ON oi.productId = p.productId
+        WHERE oi.orderId = %s
+    """,
+}
+
+
+class MySQLDialect:
+    """SQL that differs between backends, in MySQL's spelling."""
+
+    name = 'mysql'
+    explain_prefix = 'EXPLAIN'
+
+    def inserted(self, column):
+        return f'VALUES({column})'
+
+    def upsert(self, table, columns, key_columns, updates):
+        """INSERT of one row that applies updates when a row with the same key exists.
+
+        updates maps column -> expression; '{column}' in an expression is the
+        value that was being inserted, a bare column name is the existing value.
+        """
+        new_values = {column: self.inserted(column) for column in columns}
+        assignments = ',\n    '.join(f'{column} = {expression.format(**new_values)}' for column, expression in updates.items())
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)})\n"
+            f"VALUES ({', '.join(['%s'] * len(columns))})\n"
+            f"{self._on_conflict(key_columns)}\n    {assignments}"
+        )
+
+    def _on_conflict(self, key_columns):
+        return 'ON DUPLICATE KEY UPDATE'
+
+    def update_limited(self, table, assignments, where, order_by):
+        """UPDATE of the first rows (by order_by) matching where; the last parameter is the row limit."""
+        return f'UPDATE {table} SET {assignments} WHERE {where} ORDER BY {order_by} LIMIT %s'
+
+    def translate(self, statement):
+        return statement, False
+
+
+class SQLiteDialect(MySQLDialect):
+    name = 'sqlite'
+    explain_prefix = 'EXPLAIN QUERY PLAN'
+
+    _FOR_UPDATE = re.compile(r'\s+FOR\s+UPDATE\s*$', re.IGNORECASE)
+
+    def inserted(self, column):
+        return f'excluded.{column}'
+
+    def _on_conflict(self, key_columns):
+        return f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET"
+
+    def update_limited(self, table, assignments, where, order_by):
+        return (
+            f'UPDATE {table} SET {assignments} WHERE rowid IN '
+            f'(SELECT rowid FROM {table} WHERE {where} ORDER BY {order_by} LIMIT %s)'
+        )
+
+    @functools.lru_cache(maxsize=512)
+    def translate(self, statement):
+        """Rewrite %s placeholders; returns (statement, locking).
+
+        SQLite has no row locks, so a trailing FOR UPDATE is dropped and
+        reported as locking: the caller then holds the database write lock.
+        """
+        locking = bool(self._FOR_UPDATE.search(statement))
+        if locking:
+            statement = self._FOR_UPDATE.sub('', statement)
+        return statement.replace('%s', '?'), locking
+
+
+dialect = SQLiteDialect() if DB_BACKEND == 'sqlite' else MySQLDialect()
+
+
+class DatabaseUnavailable(Exception):
+    """Raised instead of touching the database while the circuit breaker is open."""
+
+    def __init__(self, retry_after):
+        super().__init__('Database unavailable, please retry')
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Stops requests from queuing on a database that keeps failing.
+
+    After failure_threshold consecutive outage errors the breaker opens and
+    callers fail fast with DatabaseUnavailable. Once reset_seconds have
+    passed, one caller is let through as a trial (and the window restarts for
+    everyone else); its success closes the breaker, its failure keeps it open.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self.last_error = None
+
+    def retry_after(self):
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def rejecting(self):
+        """Open and not yet due for a trial: requests should not even try."""
+        return self.state == 'open' and time.monotonic() < self.opened_at + self.reset_seconds
+
+    def allow_request(self):
+        if self.state == 'closed':
+            return True
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            now = time.monotonic()
+            if now < self.opened_at + self.reset_seconds:
+                return False
+            self.opened_at = now
+            logger.info("Database circuit breaker half-open, sending a trial request")
+            return True
+
+    def record_success(self):
+        if self.state == 'closed' and self.failures == 0:
+            return
+        with self._lock:
+            if self.state == 'open':
+                logger.warning("Database circuit breaker closed")
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            if self.state == 'open':
+                self.opened_at = time.monotonic()
+            elif self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.trips += 1
+                logger.error(
+                    f"Database circuit breaker opened after {self.failures} consecutive failures "
+                    f"(retrying in {self.reset_seconds}s): {error}"
+                )
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'state': 'open' if self.rejecting() else ('half-open' if self.state == 'open' else 'closed'),
+                'consecutiveFailures': self.failures,
+                'trips': self.trips,
+                'retryAfterSeconds': round(self.retry_after(), 1) if self.state == 'open' else 0,
+                'lastError': self.last_error,
+            }
+
+
+breaker = CircuitBreaker()
+
+# Errors that mean the database is down, overloaded or past a deadline, as opposed to a bad query
+_OUTAGE_ERRORS = (mysql.connector.errors.OperationalError,) + tuple(
+    getattr(mysql.connector.errors, name) for name in ('ReadTimeoutError', 'WriteTimeoutError', 'ConnectionTimeoutError')
+    if hasattr(mysql.connector.errors, name)
+)
+_OUTAGE_ERRNOS = {
+    1205,  # ER_LOCK_WAIT_TIMEOUT
+    3024,  # ER_QUERY_TIMEOUT (MAX_EXECUTION_TIME exceeded)
+}
+_SQLITE_OUTAGE_MESSAGES = ('locked', 'interrupted', 'disk i/o')
+
+
+def _is_outage(error):
+    if isinstance(error, _OUTAGE_ERRORS):
+        return True
+    if isinstance(error, mysql.connector.errors.InterfaceError):
+        # Client errors (CR_*): can't connect, server gone away, lost connection
+        return 2000 <= (error.errno or 0) < 3000
+    if isinstance(error, mysql.connector.Error):
+        return error.errno in _OUTAGE_ERRNOS
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return any(text in message for text in _SQLITE_OUTAGE_MESSAGES)
+    return False
+
+
+def _record_failure(error):
+    if not _is_outage(error):
+        return
+    breaker.record_failure(error)
+    if has_request_context():
+        g.db_outage = True
+
+
+def _guarded(call, *args, **kwargs):
+    """Run a database call, feeding its outcome to the circuit breaker."""
+    try:
+        result = call(*args, **kwargs)
+    except Exception as e:
+        _record_failure(e)
+        raise
+    breaker.record_success()
+    return result
+
+
+def query_deadline_ms():
+    """Statement deadline for the current request's endpoint, or None outside a request."""
+    if not has_request_context() or not request.endpoint:
+        return None
+    return QUERY_DEADLINES_MS.get(request.endpoint.rsplit('.', 1)[-1], DEFAULT_QUERY_DEADLINE_MS)
+
+
+class GuardedCursor:
+    """Cursor wrapper that reports outage errors (and recoveries) to the circuit breaker."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, attr):
+        return getattr(self._cursor, attr)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def execute(self, operation, params=(), *args, **kwargs):
+        return _guarded(self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        return _guarded(self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    def fetchone(self):
+        return _guarded(self._cursor.fetchone)
+
+    def fetchmany(self, size=1):
+        return _guarded(self._cursor.fetchmany, size)
+
+    def fetchall(self):
+        return _guarded(self._cursor.fetchall)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Prepared cursors per physical connection, keyed weakly so closed connections drop out
+_prepared = weakref.WeakKeyDictionary()
+
+# (connection id, deadline) last applied to each physical connection's session
+_session_deadlines = weakref.WeakKeyDictionary()
+
+_stats_lock = threading.Lock()
+_statement_stats = {}
+
+
+def _connection_config(host=None, port=None):
+    config = dict(
+        host=host or os.getenv("MYSQL_HOST"),
         user=os.getenv("MYSQL_USER"),
         password=os.getenv("MYSQL_PASSWORD"),
-        database=os.getenv("MYSQL_DATABASE")
-    )
\ No newline at end of file
+        database=os.getenv("MYSQL_DATABASE"),
+        connection_timeout=MYSQL_CONNECT_TIMEOUT,
+        read_timeout=MYSQL_READ_TIMEOUT,
+        write_timeout=MYSQL_WRITE_TIMEOUT
+    )
+    if port:
+        config['port'] = port
+    return config
+
+
+def _make_pool(name, host=None, port=None):
+    # Session reset would deallocate the prepared statements, so
+    # Connection.close() rolls back open transactions instead
+    return pooling.MySQLConnectionPool(
+        pool_name=name,
+        pool_size=POOL_SIZE,
+        pool_reset_session=False,
+        **_connection_config(host, port)
+    )
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _make_pool('awe_store')
+    return _pool
+
+
+def _record(name, elapsed, prepared=False):
+    with _stats_lock:
+        stats = _statement_stats.setdefault(name, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'prepares': 0})
+        if prepared:
+            stats['prepares'] += 1
+            return
+        stats['calls'] += 1
+        stats['total_ms'] += elapsed * 1000
+        stats['max_ms'] = max(stats['max_ms'], elapsed * 1000)
+
+
+def statement_stats():
+    """Per-statement call counts and timings for the prepared statement cache."""
+    with _stats_lock:
+        return {
+            name: dict(stats, avg_ms=stats['total_ms'] / stats['calls'] if stats['calls'] else 0.0)
+            for name, stats in _statement_stats.items()
+        }
+
+
+class Connection:
+    """Pooled connection that also runs the named statements in STATEMENTS."""
+
+    dialect = dialect
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, attr):
+        return getattr(self._conn, attr)
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        if query_profiler.QUERY_PROFILING_ENABLED:
+            # EXPLAIN runs on the raw connection so it isn't profiled itself
+            cursor = query_profiler.ProfiledCursor(cursor, self._conn)
+        return GuardedCursor(cursor)
+
+    def apply_deadline(self):
+        """Bound this checkout's statements by the current endpoint's deadline.
+
+        The server interrupts SELECTs after MAX_EXECUTION_TIME and gives up on
+        row locks after innodb_lock_wait_timeout; the client read timeout
+        catches everything else, including a server that stopped answering.
+        """
+        raw = getattr(self._conn, '_cnx', self._conn)
+        deadline = query_deadline_ms()
+        if hasattr(raw, 'read_timeout'):
+            raw.read_timeout = MYSQL_READ_TIMEOUT if deadline is None else math.ceil(deadline / 1000) + DEADLINE_GRACE_SECONDS
+        applied = _session_deadlines.get(raw)
+        if applied == (raw.connection_id, deadline):
+            return
+        cursor = raw.cursor()
+        try:
+            if deadline is None:
+                cursor.execute('SET SESSION MAX_EXECUTION_TIME = 0, innodb_lock_wait_timeout = DEFAULT')
+            else:
+                cursor.execute(
+                    'SET SESSION MAX_EXECUTION_TIME = %s, innodb_lock_wait_timeout = %s',
+                    (deadline, max(1, math.ceil(deadline / 1000)))
+                )
+        finally:
+            cursor.close()
+        _session_deadlines[raw] = (raw.connection_id, deadline)
+
+    def _prepared_cursor(self, name):
+        raw = getattr(self._conn, '_cnx', self._conn)
+        state = _prepared.get(raw)
+        # A reconnect gives the session a new id and drops its server-side statements
+        if state is None or state['connection_id'] != raw.connection_id:
+            state = {'connection_id': raw.connection_id, 'cursors': {}}
+            _prepared[raw] = state
+        cursor = state['cursors'].get(name)
+        if cursor is None:
+            cursor = raw.cursor(prepared=True, dictionary=True)
+            state['cursors'][name] = cursor
+            _record(name, 0, prepared=True)
+        return cursor
+
+    def _execute_named(self, name, params):
+        statement = STATEMENTS[name]
+        cursor = self._prepared_cursor(name)
+        start = time.perf_counter()
+        try:
+            cursor.execute(statement, params)
+        except mysql.connector.Error as e:
+            if e.errno != errorcode.ER_UNKNOWN_STMT_HANDLER:
+                _record_failure(e)
+                raise
+            logger.warning(f"Prepared statement {name} was lost, re-preparing")
+            _prepared.pop(getattr(self._conn, '_cnx', self._conn), None)
+            cursor = self._prepared_cursor(name)
+            _guarded(cursor.execute, statement, params)
+        rows = _guarded(cursor.fetchall)
+        elapsed = time.perf_counter() - start
+        _record(name, elapsed)
+        query_profiler.record(statement, elapsed, len(rows), lambda: query_profiler.explain(self._conn, statement, params))
+        return rows
+
+    def fetch_all(self, name, params=()):
+        return self._execute_named(name, params)
+
+    def fetch_one(self, name, params=()):
+        rows = self._execute_named(name, params)
+        return rows[0] if rows else None
+
+    def commit(self):
+        _guarded(self._conn.commit)
+
+    def close(self):
+        # Return the connection to the pool without an open snapshot or locks
+        if self._conn.in_transaction:
+            self._conn.rollback()
+        self._conn.close()
+
+
+_WRITE_STATEMENT = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+
+
+def _adapt_datetime(value):
+    return value.isoformat(' ')
+
+
+def _convert_datetime(value):
+    return datetime.fromisoformat(value.decode('utf-8'))
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_converter('DATETIME', _convert_datetime)
+sqlite3.register_converter('TIMESTAMP', _convert_datetime)
+
+
+class SQLiteCursor:
+    """DB-API cursor over sqlite3 that accepts the MySQL-style statements used by the routes.
+
+    Statements go through SQLiteDialect.translate. The first write (or
+    FOR UPDATE read) of a transaction takes the write lock with BEGIN
+    IMMEDIATE, so read-modify-write sequences cannot interleave; plain reads
+    run outside a transaction and never block writers under WAL.
+    """
+
+    def __init__(self, conn, dictionary=False):
+        self._raw = conn
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+
+    def __getattr__(self, attr):
+        return getattr(self._cursor, attr)
+
+    @property
+    def with_rows(self):
+        return self._cursor.description is not None
+
+    def _begin_if_needed(self, statement, locking):
+        if not self._raw.in_transaction and (locking or _WRITE_STATEMENT.match(statement)):
+            self._raw.execute('BEGIN IMMEDIATE')
+
+    def execute(self, operation, params=()):
+        statement, locking = dialect.translate(operation)
+        _start_sqlite_deadline()
+        self._begin_if_needed(statement, locking)
+        self._cursor.execute(statement, tuple(params) if params is not None else ())
+        return None
+
+    def executemany(self, operation, seq_params):
+        statement, locking = dialect.translate(operation)
+        _start_sqlite_deadline()
+        self._begin_if_needed(statement, locking)
+        self._cursor.executemany(statement, seq_params)
+        return None
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class _SQLiteExplainer:
+    """Unprofiled cursors for the query profiler's EXPLAIN QUERY PLAN."""
+
+    explain_prefix = SQLiteDialect.explain_prefix
+
+    def __init__(self, conn):
+        self._raw = conn
+
+    def cursor(self, dictionary=False, **kwargs):
+        return SQLiteCursor(self._raw, dictionary)
+
+
+class SQLiteConnection:
+    """Same interface as Connection over this thread's sqlite3 connection.
+
+    sqlite3 caches compiled statements per connection, so the named
+    statements are reused without explicit preparation.
+    """
+
+    dialect = dialect
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, attr):
+        return getattr(self._conn, attr)
+
+    def cursor(self, dictionary=False, **kwargs):
+        cursor = SQLiteCursor(self._conn, dictionary)
+        if query_profiler.QUERY_PROFILING_ENABLED:
+            cursor = query_profiler.ProfiledCursor(cursor, _SQLiteExplainer(self._conn))
+        return GuardedCursor(cursor)
+
+    def fetch_all(self, name, params=()):
+        statement = STATEMENTS[name]
+        cursor = SQLiteCursor(self._conn, dictionary=True)
+        start = time.perf_counter()
+        _guarded(cursor.execute, statement, params)
+        rows = _guarded(cursor.fetchall)
+        cursor.close()
+        elapsed = time.perf_counter() - start
+        _record(name, elapsed)
+        query_profiler.record(statement, elapsed, len(rows),
+                              lambda: query_profiler.explain(_SQLiteExplainer(self._conn), statement, params))
+        return rows
+
+    def fetch_one(self, name, params=()):
+        rows = self.fetch_all(name, params)
+        return rows[0] if rows else None
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def commit(self):
+        _guarded(self._conn.commit)
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        # The sqlite3 connection stays open for the thread's next request
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+
+_sqlite_local = threading.local()
+
+# VM instructions between deadline checks
+SQLITE_PROGRESS_INTERVAL = 10000
+
+
+def _start_sqlite_deadline():
+    deadline = query_deadline_ms()
+    _sqlite_local.deadline = None if deadline is None else time.monotonic() + deadline / 1000
+
+
+def _sqlite_progress():
+    # A non-zero return interrupts the running statement with OperationalError('interrupted')
+    deadline = getattr(_sqlite_local, 'deadline', None)
+    return 1 if deadline is not None and time.monotonic() > deadline else 0
+
+
+def _open_sqlite():
+    directory = os.path.dirname(SQLITE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(
+        SQLITE_PATH,
+        timeout=SQLITE_BUSY_TIMEOUT / 1000,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        isolation_level=None,  # transactions are opened by SQLiteCursor
+    )
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')  # durable at checkpoints; WAL keeps it consistent
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.execute(f'PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    conn.execute('PRAGMA cache_size = -65536')      # 64 MiB page cache
+    conn.execute('PRAGMA mmap_size = 268435456')    # 256 MiB memory-mapped reads
+    conn.set_progress_handler(_sqlite_progress, SQLITE_PROGRESS_INTERVAL)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products'").fetchone() is None:
+        logger.info(f"Creating SQLite schema in {SQLITE_PATH}")
+        with open(SQLITE_SCHEMA) as f:
+            conn.executescript(f.read())
+    return conn
+
+
+def _sqlite_connection():
+    # One connection per thread; a forked worker opens its own
+    conn = getattr(_sqlite_local, 'conn', None)
+    if conn is None or _sqlite_local.pid != os.getpid():
+        conn = _open_sqlite()
+        _sqlite_local.conn = conn
+        _sqlite_local.pid = os.getpid()
+    return SQLiteConnection(conn)
+
+
+def _connect_primary():
+    try:
+        return Connection(_get_pool().get_connection())
+    except mysql.connector.errors.PoolError:
+        logger.warning("Connection pool exhausted, opening an unpooled connection")
+        return Connection(mysql.connector.connect(**_connection_config()))
+
+
+def get_db_connection():
+    """Connection to the primary; use for writes and anything that must be current.
+
+    Raises DatabaseUnavailable without connecting while the circuit breaker is open.
+    """
+    if not breaker.allow_request():
+        if has_request_context():
+            g.db_outage = True
+        raise DatabaseUnavailable(breaker.retry_after())
+    if DB_BACKEND == 'sqlite':
+        return _sqlite_connection()
+    conn = _guarded(_connect_primary)
+    _guarded(conn.apply_deadline)
+    return conn
+
+
+class Replica:
+    """A read replica with its own pool, ejection window and measured lag."""
+
+    def __init__(self, index, spec):
+        host, _, port = spec.partition(':')
+        self.host = host
+        self.port = int(port) if port else None
+        self.name = f'awe_store_replica_{index}'
+        self.pool = None
+        self.ejected_until = 0.0
+        self.lag = MAX_REPLICA_LAG
+        self.lag_checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def available(self):
+        return time.time() >= self.ejected_until
+
+    def eject(self, reason):
+        self.ejected_until = time.time() + REPLICA_EJECT_SECONDS
+        logger.warning(f"Ejecting replica {self.host}:{self.port or 3306} for {REPLICA_EJECT_SECONDS}s: {reason}")
+
+    def connect(self):
+        with self._lock:
+            if self.pool is None:
+                self.pool = _make_pool(self.name, self.host, self.port)
+        try:
+            return Connection(self.pool.get_connection())
+        except mysql.connector.errors.PoolError:
+            return Connection(mysql.connector.connect(**_connection_config(self.host, self.port)))
+
+    def refresh_lag(self, conn):
+        """Re-measure replication lag at most every REPLICA_LAG_CHECK_INTERVAL seconds."""
+        if time.time() - self.lag_checked_at < REPLICA_LAG_CHECK_INTERVAL:
+            return
+        self.lag_checked_at = time.time()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            try:
+                cursor.execute('SHOW REPLICA STATUS')
+            except mysql.connector.errors.ProgrammingError:
+                cursor.execute('SHOW SLAVE STATUS')
+            status = cursor.fetchone()
+            cursor.fetchall()
+        except mysql.connector.Error as e:
+            logger.debug(f"Could not read lag for replica {self.host}: {str(e)}")
+            self.lag = MAX_REPLICA_LAG
+            return
+        finally:
+            cursor.close()
+        if status is None:
+            # Not configured as a replica (e.g. a local stand-in): always current
+            self.lag = 0.0
+            return
+        seconds = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        # NULL means the replication threads are stopped
+        self.lag = float('inf') if seconds is None else float(seconds)
+
+
+_replicas = [] if DB_BACKEND == 'sqlite' else [Replica(index, spec) for index, spec in enumerate(REPLICA_HOSTS)]
+_replica_turn = itertools.count()
+
+
+def _last_write(version_keys):
+    if not version_keys:
+        return 0.0
+    from app.utils.http_cache import versions
+    table = versions()
+    return max(table.get(key)[1] for key in version_keys)
+
+
+def get_read_connection(*version_keys):
+    """Connection for a read that tolerates replica lag.
+
+    version_keys name the data the read depends on (the same keys as the HTTP
+    cache, e.g. 'catalog' or 'cart:<userId>'). A replica is used only when its
+    lag is shorter than the time since the last write to that data, so users
+    always read their own writes; otherwise the read goes to the primary.
+    """
+    if not _replicas:
+        return get_db_connection()
+    write_age = time.time() - _last_write(version_keys)
+    start = next(_replica_turn)
+    for offset in range(len(_replicas)):
+        replica = _replicas[(start + offset) % len(_replicas)]
+        if not replica.available():
+            continue
+        if replica.lag > MAX_REPLICA_LAG and time.time() - replica.lag_checked_at < REPLICA_LAG_CHECK_INTERVAL:
+            # Known to be too far behind until the next lag check
+            continue
+        try:
+            conn = replica.connect()
+            replica.refresh_lag(conn)
+        except mysql.connector.Error as e:
+            replica.eject(str(e))
+            continue
+        if replica.lag <= MAX_REPLICA_LAG and replica.lag < write_age:
+            try:
+                conn.apply_deadline()
+            except mysql.connector.Error as e:
+                replica.eject(str(e))
+                conn.close()
+                continue
+            return conn
+        conn.close()
+    return get_db_connection()
+
+
+def dispose_connections():
+    """Close this process's connections, e.g. in a server's master before it forks workers."""
+    global _pool
+    with _pool_lock:
+        pools = [_pool] + [replica.pool for replica in _replicas]
+        _pool = None
+        for replica in _replicas:
+            replica.pool = None
+    for pool in pools:
+        if pool is not None:
+            pool._remove_connections()
+    conn = getattr(_sqlite_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _sqlite_local.conn = None
+
+
+# Pools inherited through fork. Their sockets belong to the parent, so the child
+# must neither use nor close them; they are kept referenced and never touched.
+_inherited_pools = []
+
+
+def _after_fork_in_child():
+    global _pool, _pool_lock
+    _inherited_pools.extend(pool for pool in [_pool] + [replica.pool for replica in _replicas] if pool is not None)
+    _pool = None
+    _pool_lock = threading.Lock()
+    for replica in _replicas:
+        replica.pool = None
+        replica._lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def replica_status():
+    return [
+        {
+            'host': replica.host,
+            'port': replica.port or 3306,
+            'available': replica.available(),
+            'lagSeconds': None if replica.lag == float('inf') else replica.lag,
+        }
+        for replica in _replicas
+    ]
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from app.db import get_db_connection
+from app.utils.http_cache import bump_user
 import bcrypt
 import logging
 
@@ -73,13 +74,7 @@ def login():
 def get_user_profile(userId):
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(
-            'SELECT userId, name, email FROM users WHERE userId = %s',
-            (userId,)
-        )
-        user = cursor.fetchone()
-        cursor.close()
+        user = conn.fetch_one('user_profile', (userId,))
         conn.close()
 
         if user:
@@ -117,6 +112,7 @@ def update_user_profile(userId):
         conn.commit()
         cursor.close()
         conn.close()
+        bump_user(userId)
         logger.info(f"User profile updated for userId: {userId}")
         return jsonify({'message': 'Profile updated'}), 200
     except Exception as e:
@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify
-from app.db import get_db_connection
+from app.db import dialect, get_db_connection, get_read_connection
+from app.utils.http_cache import bump_cart
 import logging
 import base64
 from decimal import Decimal
+from datetime import datetime
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -29,18 +31,8 @@ def get_cart():
             return jsonify({'error': 'User ID required'}), 400
 
         logger.debug(f"Fetching cart for user: {user_id}")
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        query = """
-            SELECT ci.cartItemId, ci.userId, ci.productId, ci.quantity, ci.addedAt,
-                   p.title, p.price, p.image
-            FROM cart_items ci
-            JOIN products p ON ci.productId = p.productId
-            WHERE ci.userId = %s
-        """
-        cursor.execute(query, (user_id,))
-        items = cursor.fetchall()
-        cursor.close()
+        conn = get_read_connection(f'cart:{user_id}', 'catalog')
+        items = conn.fetch_all('cart_items', (user_id,))
         conn.close()
 
         items = [convert_cart_item(item) for item in items]
@@ -67,25 +59,24 @@ def add_to_cart():
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        cursor.execute('SELECT productId FROM products WHERE productId = %s', (product_id,))
-        if not cursor.fetchone():
+        if not conn.fetch_one('product_exists', (product_id,)):
             cursor.close()
             conn.close()
             logger.warning(f"Product {product_id} not found")
             return jsonify({'error': 'Product not found'}), 404
 
-        query = """
-            INSERT INTO cart_items (userId, productId, quantity)
-            VALUES (%s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-                quantity = quantity + VALUES(quantity)
-        """
+        # addedAt is when the item was last touched; cart retention expires items by it
+        query = dialect.upsert(
+            'cart_items', ['userId', 'productId', 'quantity', 'addedAt'], ['userId', 'productId'],
+            {'quantity': 'quantity + {quantity}', 'addedAt': '{addedAt}'}
+        )
         logger.debug(f"Executing query: {query} with params: {user_id}, {product_id}, {quantity}")
-        cursor.execute(query, (user_id, product_id, quantity))
+        cursor.execute(query, (user_id, product_id, quantity, datetime.now()))
         conn.commit()
 
         cursor.close()
         conn.close()
+        bump_cart(user_id)
         logger.info(f"Added/updated cart item for user {user_id}")
         return jsonify({'SUCCESS': 'Item added to cart'}), 200
     except Exception as e:
@@ -116,8 +107,8 @@ def update_cart_item(productId):
         cursor = conn.cursor()
 
         cursor.execute(
-            'UPDATE cart_items SET quantity = %s WHERE userId = %s AND productId = %s',
-            (quantity, user_id, productId)
+            'UPDATE cart_items SET quantity = %s, addedAt = %s WHERE userId = %s AND productId = %s',
+            (quantity, datetime.now(), user_id, productId)
         )
         if cursor.rowcount == 0:
             cursor.close()
@@ -128,6 +119,7 @@ def update_cart_item(productId):
         conn.commit()
         cursor.close()
         conn.close()
+        bump_cart(user_id)
         logger.info(f"Updated cart item for user {user_id}")
         return jsonify({'message': 'Cart item updated'}), 200
     except Exception as e:
@@ -163,6 +155,7 @@ def remove_cart_item(productId):
         conn.commit()
         cursor.close()
         conn.close()
+        bump_cart(user_id)
         logger.info(f"Removed cart item for user {user_id}")
         return jsonify({'message': 'Cart item removed'}), 200
     except Exception as e:
@@ -189,6 +182,7 @@ def clear_cart():
         conn.commit()
         cursor.close()
         conn.close()
+        bump_cart(user_id)
         logger.info(f"Cleared cart for user {user_id}")
         return jsonify({'SUCCESS': 'Cart cleared'}), 200
     except Exception as e:
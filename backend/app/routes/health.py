@@ -0,0 +1,24 @@
+from flask import Blueprint, jsonify
+from app.db import breaker
+from app.utils import startup
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/api/health/live', methods=['GET'])
+def liveness():
+    return jsonify({'status': 'ok'}), 200
+
+@health_bp.route('/api/health/ready', methods=['GET'])
+def readiness():
+    """200 once this worker's connections, catalog snapshot and indexes are warm; 503 until then."""
+    ready = startup.ensure_ready()
+    body = startup.metrics.snapshot()
+    body['database'] = breaker.snapshot()['state']
+    if not ready:
+        logger.warning(f"Not ready: {body['warmErrors']}")
+        return jsonify(body), 503
+    return jsonify(body), 200
@@ -1,16 +1,53 @@
-from flask import Blueprint, request, jsonify
-from app.db import get_db_connection
+from flask import Blueprint, Response, request, jsonify
+from app.db import get_db_connection, get_read_connection
 from app.utils.helper import convert_product_data
+from app.utils.order_counts import order_counts
+from app.utils.http_cache import bump_cart, bump_orders
+from app.utils.outbox import add_event, add_events
+from app.utils import order_summaries
+from app.utils.order_archive import archive_horizon, may_be_archived
+from app.utils import order_events
+from app.utils import inventory
 import logging
 import json
+import random
+import time
 from decimal import Decimal
 import base64
+from datetime import datetime
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 orders_bp = Blueprint('orders', __name__)
 
+VALID_STATUSES = ['pending', 'processing', 'shipped', 'delivered', 'cancelled']
+
+# Status moves allowed by the bulk endpoint; delivered and cancelled orders are final
+STATUS_TRANSITIONS = {
+    'pending': {'processing', 'shipped', 'cancelled'},
+    'processing': {'shipped', 'cancelled'},
+    'shipped': {'delivered'},
+    'delivered': set(),
+    'cancelled': set(),
+}
+
+MAX_BULK_ORDERS = 1000
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# A checkout that loses a deadlock over stock rows is run again, up to this many times in all
+CHECKOUT_ATTEMPTS = 3
+
+# Staff filter parameter -> indexed generated column over the shipping / payment JSON.
+# The columns hold trimmed, lower-cased values, so filters match case-insensitively.
+ORDER_JSON_FILTERS = {
+    'country': 'shipping_country',
+    'city': 'shipping_city',
+    'postcode': 'shipping_postcode',
+    'paymentMethod': 'payment_method',
+}
+
 def convert_order_item(item):
     item = dict(item)
     if 'price' in item and isinstance(item['price'], Decimal):
@@ -22,8 +59,138 @@ def convert_order_item(item):
             item['image'] = f"http://127.0.0.1:5000/assets/images/{item['image']}"
     if 'total' in item and isinstance(item['total'], Decimal):
         item['total'] = float(item['total'])
+    for field in ('shipping', 'payment'):
+        if field in item:
+            item[field] = parse_json_column(item[field])
     return item
 
+def parse_json_column(value):
+    """JSON columns come back from the driver as text; hand the API the object instead."""
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+def json_field_filters(args, alias='o.'):
+    """SQL clauses for the ORDER_JSON_FILTERS present in args."""
+    clauses = []
+    params = []
+    for arg, column in ORDER_JSON_FILTERS.items():
+        value = args.get(arg)
+        if value is None or value == '':
+            continue
+        if not isinstance(value, str):
+            raise ValueError(f'{arg} must be a string')
+        clauses.append(f'{alias}{column} = %s')
+        params.append(value.strip().lower())
+    return clauses, params
+
+def build_order_filters(args):
+    """Translate staff search query parameters into SQL clauses over orders o / users u."""
+    clauses = []
+    params = []
+    statuses = None
+
+    if args.get('status'):
+        statuses = [status.strip().lower() for status in args.get('status').split(',') if status.strip()]
+        invalid = [status for status in statuses if status not in VALID_STATUSES]
+        if invalid:
+            raise ValueError(f"Invalid status {invalid}. Must be one of {VALID_STATUSES}")
+        clauses.append(f"o.status IN ({', '.join(['%s'] * len(statuses))})")
+        params.extend(statuses)
+
+    for arg, operator in (('dateFrom', '>='), ('dateTo', '<')):
+        if args.get(arg):
+            try:
+                value = datetime.fromisoformat(args.get(arg))
+            except ValueError:
+                raise ValueError(f'{arg} must be an ISO 8601 date or timestamp')
+            clauses.append(f'o.timestamp {operator} %s')
+            params.append(value)
+
+    if args.get('email'):
+        clauses.append('u.email = %s')
+        params.append(args.get('email').strip())
+
+    for arg, operator in (('minTotal', '>='), ('maxTotal', '<=')):
+        if args.get(arg):
+            try:
+                value = float(args.get(arg))
+            except ValueError:
+                raise ValueError(f'{arg} must be a number')
+            clauses.append(f'o.total {operator} %s')
+            params.append(value)
+
+    json_clauses, json_params = json_field_filters(args)
+    clauses.extend(json_clauses)
+    params.extend(json_params)
+
+    return clauses, params, statuses
+
+def order_search_query(table, where):
+    """Staff order search over the hot table (orders) or the archive (orders_archive)."""
+    return f'''
+        SELECT o.orderId, o.userId, u.name AS customer, u.email AS customerEmail,
+               o.total, o.shipping, o.payment, o.status, o.timestamp
+        FROM {table} o
+        JOIN users u ON o.userId = u.userId
+        WHERE {where}
+    '''
+
+def encode_order_cursor(timestamp, order_id):
+    raw = f"{timestamp.isoformat()}|{order_id}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('utf-8')
+
+def decode_order_cursor(value):
+    """Return (timestamp, orderId) of the last row on the previous page, or None."""
+    if not value:
+        return None
+    try:
+        timestamp, order_id = base64.urlsafe_b64decode(value.encode('utf-8')).decode('utf-8').split('|')
+        return datetime.fromisoformat(timestamp), int(order_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+def after_status_change(changes):
+    """Run once per committed batch of status changes ({orderId, userId, from, to} dicts)."""
+    if not changes:
+        return
+    order_counts.record_status_changes(changes)
+    bump_orders(*{change['userId'] for change in changes})
+    order_events.publish_status_changes(changes)
+    logger.info(f"Applied {len(changes)} order status change(s)")
+
+def write_order(cursor, user_id, items, total, item_count, shipping_json, payment_json):
+    """Insert the order and its items, empty the cart and queue order.placed; returns the orderId."""
+    cursor.execute(
+        'INSERT INTO orders (userId, total, shipping, payment) VALUES (%s, %s, %s, %s)',
+        (user_id, total, shipping_json, payment_json)
+    )
+    order_id = cursor.lastrowid
+
+    for item in items:
+        cursor.execute(
+            'INSERT INTO order_items (orderId, productId, quantity, price) VALUES (%s, %s, %s, %s)',
+            (order_id, item['productId'], item['quantity'], item['price'])
+        )
+
+    cursor.execute('DELETE FROM cart_items WHERE userId = %s', (user_id,))
+
+    order_summaries.record_order(cursor, user_id, order_id, total, item_count)
+
+    # Follow-up work (confirmation, notifications) is delivered by worker.py
+    add_event(cursor, 'order.placed', order_id, {
+        'orderId': order_id,
+        'userId': user_id,
+        'total': float(total),
+        'itemCount': item_count,
+    })
+    return order_id
+
 @orders_bp.route('/api/checkout', methods=['POST'])
 def place_order():
     try:
@@ -41,26 +208,42 @@ def place_order():
         shipping_json = json.dumps(shipping)
         payment_json = json.dumps(payment)
 
+        item_count = sum(int(item['quantity']) for item in items)
         conn = get_db_connection()
         cursor = conn.cursor()
+        for attempt in range(1, CHECKOUT_ATTEMPTS + 1):
+            try:
+                order_id = write_order(cursor, user_id, items, total, item_count, shipping_json, payment_json)
+                # Last before the commit: the stock rows stay locked until then
+                inventory.reserve(cursor, order_id, items)
+                conn.commit()
+                break
+            except inventory.InsufficientStock as e:
+                conn.rollback()
+                cursor.close()
+                conn.close()
+                logger.warning(f"Checkout for user {user_id} rejected: {str(e)}")
+                return jsonify({'error': str(e), 'productId': e.product_id, 'available': e.available}), 409
+            except Exception as e:
+                if not inventory.is_lock_conflict(e):
+                    raise
+                conn.rollback()
+                if attempt == CHECKOUT_ATTEMPTS:
+                    cursor.close()
+                    conn.close()
+                    logger.warning(f"Checkout for user {user_id} gave up after {attempt} lock conflicts: {str(e)}")
+                    response = jsonify({'error': 'Checkout is busy, please retry'})
+                    response.headers['Retry-After'] = '1'
+                    return response, 503
+                logger.warning(f"Checkout for user {user_id} hit a lock conflict, retrying ({attempt}): {str(e)}")
+                time.sleep(random.uniform(0.01, 0.05) * attempt)
 
-        cursor.execute(
-            'INSERT INTO orders (userId, total, shipping, payment) VALUES (%s, %s, %s, %s)',
-            (user_id, total, shipping_json, payment_json)
-        )
-        order_id = cursor.lastrowid
-
-        for item in items:
-            cursor.execute(
-                'INSERT INTO order_items (orderId, productId, quantity, price) VALUES (%s, %s, %s, %s)',
-                (order_id, item['productId'], item['quantity'], item['price'])
-            )
-
-        cursor.execute('DELETE FROM cart_items WHERE userId = %s', (user_id,))
-
-        conn.commit()
         cursor.close()
         conn.close()
+        order_counts.record_new_order()
+        bump_cart(user_id)
+        bump_orders(user_id)
+        order_events.publish_order_placed(order_id, user_id, total, item_count)
         logger.info(f"Order placed for user {user_id}, orderId: {order_id}")
         return jsonify({'orderId': order_id, 'message': 'Order placed successfully'}), 201
     except Exception as e:
@@ -80,32 +263,19 @@ def get_order_history():
             return jsonify({'error': 'User ID required'}), 400
 
         logger.debug(f"Fetching order history for user: {user_id}")
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        query = """
-            SELECT orderId, userId, total, shipping, payment, status, timestamp
-            FROM orders
-            WHERE userId = %s
-            ORDER BY timestamp DESC
-        """
-        cursor.execute(query, (user_id,))
-        orders = cursor.fetchall()
+        conn = get_read_connection(f'orders:{user_id}', 'catalog')
+        orders = conn.fetch_all('user_orders', (user_id,))
+        archived = conn.fetch_all('user_archived_orders', (user_id,))
 
+        orders = [convert_order_item(order) for order in orders]
         for order in orders:
-            order = convert_order_item(order)
-            cursor.execute(
-                """
-                SELECT oi.orderItemId, oi.orderId, oi.productId, oi.quantity, oi.price,
-                       p.title, p.image
-                FROM order_items oi
-                JOIN products p ON oi.productId = p.productId
-                WHERE oi.orderId = %s
-                """,
-                (order['orderId'],)
-            )
-            order['items'] = [convert_order_item(item) for item in cursor.fetchall()]
+            order['items'] = [convert_order_item(item) for item in conn.fetch_all('order_items', (order['orderId'],))]
+        archived = [convert_order_item(order) for order in archived]
+        for order in archived:
+            order['items'] = [convert_order_item(item) for item in conn.fetch_all('archived_order_items', (order['orderId'],))]
+        if archived:
+            orders = sorted(orders + archived, key=lambda order: order['timestamp'], reverse=True)
 
-        cursor.close()
         conn.close()
 
         logger.debug(f"Retrieved {len(orders)} orders for user {user_id}")
@@ -118,6 +288,60 @@ def get_order_history():
             conn.close()
         return jsonify({'error': str(e)}), 500
 
+def event_stream(user_id=None):
+    """An SSE response of order events; 503 when this worker already holds MAX_STREAMS."""
+    events = order_events.order_events()
+    if not events.streams.acquire(blocking=False):
+        events.incr('rejected')
+        logger.warning(f"Rejecting order event stream: {order_events.MAX_STREAMS} already open")
+        response = jsonify({'error': 'Too many open event streams, please retry'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(order_events.RETRY_MS // 1000)
+        return response
+    events.incr('streamsOpened')
+    # EventSource sends Last-Event-ID on reconnect; lastEventId lets a fresh page resume
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    response = Response(order_events.stream(last_event_id, user_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(events.streams.release)
+    return response
+
+@orders_bp.route('/api/orders/events', methods=['GET'])
+def get_order_events():
+    """Stream status changes and new orders of one user as Server-Sent Events."""
+    user_id = request.headers.get('X-User-ID') or request.args.get('userId')
+    if not user_id:
+        logger.warning("No user ID provided for order events")
+        return jsonify({'error': 'User ID required'}), 400
+    logger.debug(f"Opening order event stream for user: {user_id}")
+    return event_stream(user_id)
+
+@orders_bp.route('/api/orders/events/all', methods=['GET'])
+def get_all_order_events():
+    """Stream every order event to staff as Server-Sent Events."""
+    try:
+        staff_id = request.headers.get('X-Staff-ID') or request.args.get('staffId')
+        if not staff_id:
+            logger.warning("No staff ID provided for order events")
+            return jsonify({'error': 'Staff ID required'}), 400
+
+        conn = get_db_connection()
+        staff = conn.fetch_one('staff_exists', (staff_id,))
+        # Don't hold a pooled connection for the life of the stream
+        conn.close()
+        if not staff:
+            logger.warning(f"Staff not found for staffId: {staff_id}")
+            return jsonify({'error': 'Staff not found'}), 404
+
+        logger.debug(f"Opening order event firehose for staff: {staff_id}")
+        return event_stream()
+    except Exception as e:
+        logger.error(f"Error opening order event stream: {str(e)}")
+        if 'conn' in locals():
+            conn.close()
+        return jsonify({'error': str(e)}), 500
+
 @orders_bp.route('/api/orders/<int:orderId>', methods=['GET'])
 def get_order_details(orderId):
     try:
@@ -133,37 +357,41 @@ def get_order_details(orderId):
 
         if staff_id:
             # Verify staff exists
-            cursor.execute('SELECT staffId FROM staff WHERE staffId = %s', (staff_id,))
-            staff = cursor.fetchone()
+            staff = conn.fetch_one('staff_exists', (staff_id,))
             if not staff:
                 cursor.close()
                 conn.close()
                 logger.warning(f"Staff not found for staffId: {staff_id}")
                 return jsonify({'error': 'Staff not found'}), 404
 
-            # Staff query: include customer details
-            cursor.execute(
-                """
-                SELECT o.orderId, o.userId, u.name AS customer, u.email AS customerEmail, 
-                       o.total, o.shipping, o.payment, o.status, o.timestamp
-                FROM orders o
-                JOIN users u ON o.userId = u.userId
-                WHERE o.orderId = %s
-                """,
-                (orderId,)
-            )
-            order = cursor.fetchone()
-        else:
-            # User query: restrict to user's own order
-            cursor.execute(
-                """
-                SELECT orderId, userId, total, shipping, payment, status, timestamp
-                FROM orders
-                WHERE orderId = %s AND userId = %s
-                """,
-                (orderId, user_id)
-            )
+        # Recent orders are in orders; older finished ones were moved to orders_archive
+        order = None
+        for orders_table, items_statement in (('orders', 'order_items'), ('orders_archive', 'archived_order_items')):
+            if staff_id:
+                # Staff query: include customer details
+                cursor.execute(
+                    f"""
+                    SELECT o.orderId, o.userId, u.name AS customer, u.email AS customerEmail, 
+                           o.total, o.shipping, o.payment, o.status, o.timestamp
+                    FROM {orders_table} o
+                    JOIN users u ON o.userId = u.userId
+                    WHERE o.orderId = %s
+                    """,
+                    (orderId,)
+                )
+            else:
+                # User query: restrict to user's own order
+                cursor.execute(
+                    f"""
+                    SELECT orderId, userId, total, shipping, payment, status, timestamp
+                    FROM {orders_table}
+                    WHERE orderId = %s AND userId = %s
+                    """,
+                    (orderId, user_id)
+                )
             order = cursor.fetchone()
+            if order:
+                break
 
         if not order:
             cursor.close()
@@ -172,17 +400,7 @@ def get_order_details(orderId):
             return jsonify({'error': 'Order not found'}), 404
 
         # Fetch order items
-        cursor.execute(
-            """
-            SELECT oi.orderItemId, oi.orderId, oi.productId, oi.quantity, oi.price,
-                   p.title, p.image
-            FROM order_items oi
-            JOIN products p ON oi.productId = p.productId
-            WHERE oi.orderId = %s
-            """,
-            (orderId,)
-        )
-        items = cursor.fetchall()
+        items = conn.fetch_all(items_statement, (orderId,))
         order['items'] = [convert_order_item(item) for item in items]
 
         cursor.close()
@@ -201,36 +419,101 @@ def get_order_details(orderId):
 
 @orders_bp.route('/api/orders/all', methods=['GET'])
 def get_all_orders():
+    """Staff order search.
+
+    Filters: status (comma-separated), dateFrom, dateTo, email, minTotal, maxTotal,
+    and the shipping / payment fields country, city, postcode, paymentMethod.
+    Results are ordered newest first and paged with limit plus the opaque
+    cursor returned as nextCursor.
+    """
     try:
         staff_id = request.headers.get('X-Staff-ID') or request.args.get('staffId')
         if not staff_id:
             logger.warning("No staff ID provided for fetching orders")
             return jsonify({'error': 'Staff ID required'}), 400
 
+        try:
+            clauses, params, statuses = build_order_filters(request.args)
+            limit = min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+            if limit < 1:
+                raise ValueError('limit must be at least 1')
+            page_after = decode_order_cursor(request.args.get('cursor'))
+        except ValueError as e:
+            logger.warning(f"Invalid order search parameters: {str(e)}")
+            return jsonify({'error': str(e)}), 400
+
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT staffId FROM staff WHERE staffId = %s', (staff_id,))
-        staff = cursor.fetchone()
+        staff = conn.fetch_one('staff_exists', (staff_id,))
         if not staff:
             cursor.close()
             conn.close()
             logger.warning(f"Staff not found for staffId: {staff_id}")
             return jsonify({'error': 'Staff not found'}), 404
 
-        query = '''
-            SELECT o.orderId, o.userId, u.name AS customer, o.total, o.shipping, o.payment, o.status, o.timestamp
-            FROM orders o
-            JOIN users u ON o.userId = u.userId
-            ORDER BY o.timestamp DESC
-        '''
-        cursor.execute(query)
+        filter_sql = ' AND '.join(clauses) if clauses else '1 = 1'
+        page_clauses = list(clauses)
+        page_params = list(params)
+        if page_after:
+            page_clauses.append('(o.timestamp < %s OR (o.timestamp = %s AND o.orderId < %s))')
+            page_params.extend([page_after[0], page_after[0], page_after[1]])
+        page_sql = ' AND '.join(page_clauses) if page_clauses else '1 = 1'
+
+        # Fetch one extra row to know whether another page exists
+        order_by = ' ORDER BY o.timestamp DESC, o.orderId DESC LIMIT %s'
+        cursor.execute(order_search_query('orders', page_sql) + order_by, page_params + [limit + 1])
         orders = cursor.fetchall()
+
+        # Archived orders all predate the horizon, so pages that stay newer than it are
+        # answered from the hot table alone; deeper pages merge in the archive
+        date_from = datetime.fromisoformat(request.args['dateFrom']) if request.args.get('dateFrom') else None
+        spans_archive = may_be_archived(date_from)
+        if spans_archive and (len(orders) <= limit or orders[limit]['timestamp'] < archive_horizon()):
+            cursor.execute(
+                f'''
+                SELECT * FROM ({order_search_query('orders', page_sql) + order_by}) AS hot
+                UNION ALL
+                SELECT * FROM ({order_search_query('orders_archive', page_sql) + order_by}) AS cold
+                ORDER BY timestamp DESC, orderId DESC
+                LIMIT %s
+                ''',
+                page_params + [limit + 1] + page_params + [limit + 1] + [limit + 1]
+            )
+            orders = cursor.fetchall()
+
+        next_cursor = None
+        if len(orders) > limit:
+            orders = orders[:limit]
+            next_cursor = encode_order_cursor(orders[-1]['timestamp'], orders[-1]['orderId'])
+
+        if len(clauses) == (1 if statuses else 0):
+            approximate_total = order_counts.status_total(cursor, statuses)
+        else:
+            approximate_total = order_counts.filtered_total(
+                cursor,
+                (filter_sql, tuple(str(param) for param in params)),
+                f'''
+                    SELECT COUNT(*) AS total FROM (
+                        {order_search_query('orders', filter_sql)}
+                        UNION ALL
+                        {order_search_query('orders_archive', filter_sql)}
+                    ) AS matches
+                ''' if spans_archive else f'''
+                    SELECT COUNT(*) AS total FROM ({order_search_query('orders', filter_sql)}) AS matches
+                ''',
+                params + params if spans_archive else params
+            )
         cursor.close()
         conn.close()
 
         orders = [convert_order_item(order) for order in orders]
         logger.debug(f"Retrieved {len(orders)} orders")
-        return jsonify(orders), 200
+        return jsonify({
+            'orders': orders,
+            'nextCursor': next_cursor,
+            'approximateTotal': approximate_total,
+            'limit': limit
+        }), 200
     except Exception as e:
         logger.error(f"Error fetching orders: {str(e)}")
         if 'cursor' in locals():
@@ -249,8 +532,7 @@ def update_order_status(orderId):
 
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT staffId FROM staff WHERE staffId = %s', (staff_id,))
-        staff = cursor.fetchone()
+        staff = conn.fetch_one('staff_exists', (staff_id,))
         if not staff:
             cursor.close()
             conn.close()
@@ -265,26 +547,45 @@ def update_order_status(orderId):
             conn.close()
             return jsonify({'error': 'Status is required'}), 400
 
-        valid_statuses = ['pending', 'processing', 'shipped', 'delivered', 'cancelled']
-        if status.lower() not in valid_statuses:
+        if status.lower() not in VALID_STATUSES:
             logger.warning(f"Invalid status provided: {status}")
             cursor.close()
             conn.close()
-            return jsonify({'error': f"Invalid status. Must be one of {valid_statuses}"}), 400
+            return jsonify({'error': f"Invalid status. Must be one of {VALID_STATUSES}"}), 400
 
-        cursor.execute(
-            'UPDATE orders SET status = %s WHERE orderId = %s',
-            (status.lower(), orderId)
-        )
-        if cursor.rowcount == 0:
+        cursor.execute('SELECT userId, status, total FROM orders WHERE orderId = %s FOR UPDATE', (orderId,))
+        order = cursor.fetchone()
+        if not order:
             cursor.close()
             conn.close()
             logger.warning(f"Order not found for orderId: {orderId}")
             return jsonify({'error': 'Order not found'}), 404
 
+        # Same rules as the bulk endpoint: cancelled and delivered orders are final, so stock
+        # released on cancel can't be shipped again
+        if order['status'] != status.lower() and status.lower() not in STATUS_TRANSITIONS.get(order['status'], set()):
+            cursor.close()
+            conn.close()
+            logger.warning(f"Rejected order {orderId} status change from {order['status']} to {status.lower()}")
+            return jsonify({'error': f"Cannot move order from {order['status']} to {status.lower()}",
+                            'status': order['status']}), 409
+
+        cursor.execute(
+            'UPDATE orders SET status = %s WHERE orderId = %s',
+            (status.lower(), orderId)
+        )
+        changes = []
+        if order['status'] != status.lower():
+            changes.append({'orderId': orderId, 'userId': order['userId'], 'from': order['status'],
+                            'to': status.lower(), 'total': float(order['total'] or 0)})
+            order_summaries.record_status_changes(cursor, changes)
+            inventory.record_status_changes(cursor, changes)
+            add_event(cursor, 'order.status_changed', orderId, changes[0])
+
         conn.commit()
         cursor.close()
         conn.close()
+        after_status_change(changes)
         logger.info(f"Order status updated for orderId: {orderId} to {status}")
         return jsonify({'message': 'Order status updated successfully'}), 200
     except Exception as e:
@@ -293,4 +594,143 @@ def update_order_status(orderId):
             cursor.close()
         if 'conn' in locals():
             conn.close()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@orders_bp.route('/api/orders/bulk-status', methods=['PUT'])
+def bulk_update_order_status():
+    """Move many orders to new statuses in one transaction.
+
+    Accepts either {"updates": [{"orderId": 1, "status": "shipped"}, ...]} or
+    {"filter": {"status": "processing", "before": "<ISO timestamp>"}, "status": "shipped"}.
+    The filter may also narrow by country, city, postcode and paymentMethod. A filter
+    updates at most MAX_BULK_ORDERS orders per request; hasMore says whether more still
+    match, in which case the same request should be sent again.
+    """
+    try:
+        staff_id = request.headers.get('X-Staff-ID') or request.args.get('staffId')
+        if not staff_id:
+            logger.warning("No staff ID provided for bulk order status update")
+            return jsonify({'error': 'Staff ID required'}), 400
+
+        data = request.get_json() or {}
+        updates = data.get('updates')
+        order_filter = data.get('filter')
+
+        if bool(updates) == bool(order_filter):
+            logger.warning("Bulk status update needs exactly one of updates or filter")
+            return jsonify({'error': 'Provide either updates or filter'}), 400
+
+        requested = {}
+        if updates:
+            if not isinstance(updates, list) or len(updates) > MAX_BULK_ORDERS:
+                return jsonify({'error': f'updates must be a list of at most {MAX_BULK_ORDERS} entries'}), 400
+            for update in updates:
+                try:
+                    order_id = int(update.get('orderId'))
+                except (AttributeError, TypeError, ValueError):
+                    return jsonify({'error': f'Invalid orderId in update: {update}'}), 400
+                target = str(update.get('status') or '').lower()
+                if target not in VALID_STATUSES:
+                    return jsonify({'error': f"Invalid status. Must be one of {VALID_STATUSES}"}), 400
+                requested[order_id] = target
+        else:
+            from_status = str(order_filter.get('status') or '').lower()
+            target = str(data.get('status') or '').lower()
+            if from_status not in VALID_STATUSES or target not in VALID_STATUSES:
+                return jsonify({'error': f"Invalid status. Must be one of {VALID_STATUSES}"}), 400
+            # Every matched order would be refused, and re-sending the request would never finish
+            if target not in STATUS_TRANSITIONS[from_status]:
+                return jsonify({'error': f"Cannot move orders from {from_status} to {target}"}), 400
+            before = order_filter.get('before')
+            try:
+                before = datetime.fromisoformat(before) if before else datetime.now()
+            except (TypeError, ValueError):
+                return jsonify({'error': 'before must be an ISO 8601 timestamp'}), 400
+            try:
+                json_clauses, json_params = json_field_filters(order_filter, alias='')
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+        conn = get_db_connection()
+        cursor = conn.cursor(dictionary=True)
+        if not conn.fetch_one('staff_exists', (staff_id,)):
+            cursor.close()
+            conn.close()
+            logger.warning(f"Staff not found for staffId: {staff_id}")
+            return jsonify({'error': 'Staff not found'}), 404
+
+        # Lock the affected rows so the transition checks below hold until commit
+        if updates:
+            order_ids = list(requested)
+            placeholders = ', '.join(['%s'] * len(order_ids))
+            cursor.execute(
+                f'SELECT orderId, userId, status, total FROM orders WHERE orderId IN ({placeholders}) FOR UPDATE',
+                order_ids
+            )
+        else:
+            where = ' AND '.join(['status = %s', 'timestamp < %s'] + json_clauses)
+            cursor.execute(
+                f"""
+                SELECT orderId, userId, status, total FROM orders
+                WHERE {where}
+                ORDER BY orderId
+                LIMIT %s
+                FOR UPDATE
+                """,
+                # One extra row tells whether more orders match than this request updates
+                [from_status, before] + json_params + [MAX_BULK_ORDERS + 1]
+            )
+        rows = cursor.fetchall()
+        has_more = len(rows) > MAX_BULK_ORDERS
+        rows = rows[:MAX_BULK_ORDERS]
+        current = {row['orderId']: row['status'] for row in rows}
+        owners = {row['orderId']: row['userId'] for row in rows}
+        totals = {row['orderId']: float(row['total'] or 0) for row in rows}
+        if order_filter:
+            requested = {order_id: target for order_id in current}
+
+        results = []
+        changes = []
+        by_target = {}
+        for order_id, target in requested.items():
+            status = current.get(order_id)
+            if status is None:
+                results.append({'orderId': order_id, 'status': target, 'result': 'not_found'})
+            elif status == target:
+                results.append({'orderId': order_id, 'status': target, 'result': 'unchanged'})
+            elif target not in STATUS_TRANSITIONS.get(status, set()):
+                results.append({'orderId': order_id, 'status': status, 'result': 'invalid_transition',
+                                'error': f"Cannot move order from {status} to {target}"})
+            else:
+                by_target.setdefault(target, []).append(order_id)
+                changes.append({'orderId': order_id, 'userId': owners[order_id], 'from': status,
+                                'to': target, 'total': totals[order_id]})
+                results.append({'orderId': order_id, 'status': target, 'result': 'updated'})
+
+        # One set-based UPDATE per target status
+        for target, order_ids in by_target.items():
+            placeholders = ', '.join(['%s'] * len(order_ids))
+            cursor.execute(
+                f'UPDATE orders SET status = %s WHERE orderId IN ({placeholders})',
+                [target] + order_ids
+            )
+        order_summaries.record_status_changes(cursor, changes)
+        inventory.record_status_changes(cursor, changes)
+        add_events(cursor, 'order.status_changed', [(change['orderId'], change) for change in changes])
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        after_status_change(changes)
+        logger.info(f"Bulk status update by staff {staff_id}: {len(changes)} of {len(requested)} orders updated")
+        return jsonify({'updated': len(changes), 'results': results, 'hasMore': has_more}), 200
+    except Exception as e:
+        logger.error(f"Error in bulk order status update: {str(e)}")
+        if 'conn' in locals():
+            conn.rollback()
+        if 'cursor' in locals():
+            cursor.close()
+        if 'conn' in locals():
+            conn.close()
+        return jsonify({'error': str(e)}), 500
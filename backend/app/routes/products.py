@@ -1,5 +1,13 @@
-from flask import Blueprint, request, jsonify
-from app.db import get_db_connection
+from flask import Blueprint, Response, request, jsonify
+from app.db import get_db_connection, get_read_connection
+from app.utils.catalog_snapshot import catalog_snapshot
+from app.utils.facets import catalog_facets
+from app.utils import inventory
+from app.utils.http_cache import bump_catalog, versions
+from app.utils.product_cache import product_cache
+from app.utils.recommendations import TOP_K, related_products
+from app.utils.repricing import parse_rules, reprice
+from app.utils.search_cache import normalize_query, search_cache
 import logging
 from decimal import Decimal
 import os
@@ -9,6 +17,15 @@ logger = logging.getLogger(__name__)
 
 products_bp = Blueprint('products', __name__)
 
+# Sort keys accepted by the category listing, mapped to their ORDER BY columns
+CATEGORY_SORTS = {
+    'price': 'price',
+    'rating': 'rating',
+    'discount': 'discount_percentage',
+}
+# Most ids resolved by one multi-get request
+MAX_BATCH_IDS = 500
+
 def convert_product_data(product):
     """Convert bytes and Decimal fields to JSON-serializable formats and adjust image paths."""
     product = dict(product)
@@ -23,15 +40,72 @@ def convert_product_data(product):
         product['description'] = 'No description available.'
     return product
 
+def parse_product_ids(values):
+    """Validate a list of ids (ints or numeric strings), dropping repeats but keeping order."""
+    ids = []
+    seen = set()
+    for value in values:
+        if isinstance(value, str):
+            value = value.strip()
+            if not value:
+                continue
+        product_id = int(value)
+        if product_id not in seen:
+            seen.add(product_id)
+            ids.append(product_id)
+    return ids
+
+def get_products_by_ids(product_ids):
+    """Converted products for the ids, in the order requested; unknown ids are skipped.
+
+    Served from the shared catalog snapshot when there is one. Otherwise ids
+    cached under the current catalog version are served without a query and
+    the rest are loaded with a single IN query.
+    """
+    snapshot = catalog_snapshot.current()
+    if snapshot is not None:
+        return snapshot.products(product_ids)
+    catalog_version = versions().get('catalog')[0]
+    found, missing = product_cache.get_many(product_ids, catalog_version)
+    if missing:
+        conn = get_read_connection('catalog')
+        if len(missing) == 1:
+            rows = [row for row in [conn.fetch_one('product_by_id', (missing[0],))] if row]
+        else:
+            cursor = conn.cursor(dictionary=True)
+            placeholders = ', '.join(['%s'] * len(missing))
+            cursor.execute(f'SELECT * FROM products WHERE productId IN ({placeholders})', missing)
+            rows = cursor.fetchall()
+            cursor.close()
+        conn.close()
+        loaded = [convert_product_data(product) for product in rows]
+        product_cache.put_many(loaded, catalog_version)
+        found.update((product['productId'], product) for product in loaded)
+    return [found[product_id] for product_id in product_ids if product_id in found]
+
 @products_bp.route('/api/products', methods=['GET'])
 def get_products():
+    """All products, or only those listed in ?ids=1,2,3 (in that order)."""
     try:
+        if 'ids' in request.args:
+            try:
+                product_ids = parse_product_ids(request.args['ids'].split(','))
+            except ValueError:
+                return jsonify({'error': 'ids must be a comma-separated list of product IDs'}), 400
+            if len(product_ids) > MAX_BATCH_IDS:
+                return jsonify({'error': f'At most {MAX_BATCH_IDS} ids per request'}), 400
+            products = get_products_by_ids(product_ids)
+            logger.debug(f"Resolved {len(products)} of {len(product_ids)} requested products")
+            return jsonify(products), 200
+
+        snapshot = catalog_snapshot.current()
+        if snapshot is not None:
+            logger.debug(f"Serving {snapshot.count} products from catalog snapshot {snapshot.version}")
+            return Response(snapshot.listing(), status=200, mimetype='application/json')
+
         logger.debug("Fetching all products")
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM products')
-        products = cursor.fetchall()
-        cursor.close()
+        conn = get_read_connection('catalog')
+        products = conn.fetch_all('all_products')
         conn.close()
         products = [convert_product_data(product) for product in products]
         logger.debug(f"Retrieved {len(products)} products: {products}")
@@ -40,18 +114,34 @@ def get_products():
         logger.error(f"Error fetching products: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@products_bp.route('/api/products/batch', methods=['POST'])
+def get_products_batch():
+    """Same as GET /api/products?ids=..., for id lists too long for a URL: {"ids": [1, 2, 3]}."""
+    try:
+        data = request.get_json(silent=True) or {}
+        ids = data.get('ids')
+        if not isinstance(ids, list):
+            return jsonify({'error': 'ids must be a list of product IDs'}), 400
+        try:
+            product_ids = parse_product_ids(ids)
+        except (ValueError, TypeError):
+            return jsonify({'error': 'ids must be a list of product IDs'}), 400
+        if len(product_ids) > MAX_BATCH_IDS:
+            return jsonify({'error': f'At most {MAX_BATCH_IDS} ids per request'}), 400
+        products = get_products_by_ids(product_ids)
+        logger.debug(f"Resolved {len(products)} of {len(product_ids)} requested products")
+        return jsonify(products), 200
+    except Exception as e:
+        logger.error(f"Error fetching product batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @products_bp.route('/api/products/<int:productId>', methods=['GET'])
 def get_product(productId):
     try:
         logger.debug(f"Fetching product with ID {productId}")
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM products WHERE productId = %s', (productId,))
-        product = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        if product:
-            product = convert_product_data(product)
+        products = get_products_by_ids([productId])
+        if products:
+            product = products[0]
             logger.debug(f"Found product: {product}")
             return jsonify(product), 200
         logger.warning(f"Product with ID {productId} not found")
@@ -71,8 +161,7 @@ def add_product():
 
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT staffId FROM staff WHERE staffId = %s', (staff_id,))
-        staff = cursor.fetchone()
+        staff = conn.fetch_one('staff_exists', (staff_id,))
         if not staff:
             cursor.close()
             conn.close()
@@ -144,6 +233,9 @@ def add_product():
 
         cursor.close()
         conn.close()
+        bump_catalog()
+        # Build the next snapshot now so readers in every worker find it ready
+        catalog_snapshot.current()
         logger.info(f"Product created with productId: {product_id}")
         return jsonify({'productId': product_id, 'message': 'Product added successfully'}), 201
     except Exception as e:
@@ -154,34 +246,274 @@ def add_product():
             conn.close()
         return jsonify({'error': str(e)}), 500
 
+@products_bp.route('/api/products/reprice', methods=['POST'])
+def reprice_products():
+    """Apply discount / markup rules across the catalog in one transaction.
+
+    Body: {"rules": [{"match": {"categoryIds": [1], "minPrice": 100}, "action": "discount", "percent": 20}],
+    "dryRun": true}. A dry run (the default) only reports the changes.
+    """
+    try:
+        staff_id = request.headers.get('X-Staff-ID') or request.args.get('staffId')
+        if not staff_id:
+            logger.warning("No staff ID provided for repricing")
+            return jsonify({'error': 'Staff ID required'}), 400
+
+        conn = get_db_connection()
+        staff = conn.fetch_one('staff_exists', (staff_id,))
+        conn.close()
+        if not staff:
+            logger.warning(f"Staff not found for staffId: {staff_id}")
+            return jsonify({'error': 'Staff not found'}), 404
+
+        data = request.get_json(silent=True) or {}
+        try:
+            rules = parse_rules(data.get('rules'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        dry_run = data.get('dryRun', True)
+        if not isinstance(dry_run, bool):
+            return jsonify({'error': 'dryRun must be true or false'}), 400
+
+        result = reprice(rules, dry_run=dry_run)
+        logger.info(f"Staff {staff_id} repricing ({'dry run' if dry_run else 'applied'}): {result['changed']} products changed")
+        return jsonify(result), 200
+    except Exception as e:
+        logger.error(f"Error repricing products: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@products_bp.route('/api/products/<int:productId>/stock', methods=['GET', 'PUT'])
+def product_stock(productId):
+    """Stock of a product for staff. PUT {"stock": n} sets the units available to sell,
+    {"adjust": n} adds (or removes) units, and {"stock": null} stops tracking it."""
+    try:
+        staff_id = request.headers.get('X-Staff-ID') or request.args.get('staffId')
+        if not staff_id:
+            logger.warning("No staff ID provided for product stock")
+            return jsonify({'error': 'Staff ID required'}), 400
+
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        staff = conn.fetch_one('staff_exists', (staff_id,))
+        if not staff:
+            cursor.close()
+            conn.close()
+            logger.warning(f"Staff not found for staffId: {staff_id}")
+            return jsonify({'error': 'Staff not found'}), 404
+
+        cursor.execute('SELECT productId FROM products WHERE productId = %s', (productId,))
+        if not cursor.fetchall():
+            cursor.close()
+            conn.close()
+            return jsonify({'error': 'Product not found'}), 404
+
+        if request.method == 'PUT':
+            data = request.get_json(silent=True) or {}
+            if ('stock' in data) == ('adjust' in data):
+                cursor.close()
+                conn.close()
+                return jsonify({'error': 'Provide either stock or adjust'}), 400
+            value = data.get('stock', data.get('adjust'))
+            if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+                cursor.close()
+                conn.close()
+                return jsonify({'error': 'stock and adjust must be whole numbers'}), 400
+            try:
+                if 'adjust' in data:
+                    if value is None:
+                        raise ValueError('stock and adjust must be whole numbers')
+                    value = inventory.adjust_stock(cursor, productId, value)
+                else:
+                    if value is not None and value < 0:
+                        raise ValueError('Stock cannot be negative')
+                    inventory.set_stock(cursor, productId, value)
+            except ValueError as e:
+                conn.rollback()
+                cursor.close()
+                conn.close()
+                return jsonify({'error': str(e)}), 400
+            conn.commit()
+            logger.info(f"Staff {staff_id} set stock of product {productId} to {value}")
+
+        stock = inventory.get_stock(cursor, productId)
+        cursor.close()
+        conn.close()
+        return jsonify(stock), 200
+    except Exception as e:
+        logger.error(f"Error updating product stock: {str(e)}")
+        if 'cursor' in locals():
+            cursor.close()
+        if 'conn' in locals():
+            conn.close()
+        return jsonify({'error': str(e)}), 500
+
+@products_bp.route('/api/products/<int:productId>/related', methods=['GET'])
+def get_related_products(productId):
+    """Products most often bought together with this one, best first.
+
+    Served from the precomputed co-occurrence table (build_recommendations.py),
+    so the lookup costs the same however many orders there are.
+    """
+    try:
+        try:
+            limit = int(request.args.get('limit', 8))
+            if limit < 1 or limit > TOP_K:
+                raise ValueError
+        except ValueError:
+            return jsonify({'error': f'limit must be between 1 and {TOP_K}'}), 400
+
+        related = related_products.lookup(productId, limit)
+        if not related:
+            return jsonify([]), 200
+
+        conn = get_read_connection('catalog')
+        cursor = conn.cursor(dictionary=True)
+        placeholders = ', '.join(['%s'] * len(related))
+        cursor.execute(
+            f'SELECT * FROM products WHERE productId IN ({placeholders})',
+            [related_id for related_id, _ in related]
+        )
+        by_id = {product['productId']: product for product in cursor.fetchall()}
+        cursor.close()
+        conn.close()
+
+        products = []
+        for related_id, count in related:
+            if related_id in by_id:
+                product = convert_product_data(by_id[related_id])
+                product['coPurchaseCount'] = count
+                products.append(product)
+        logger.debug(f"Found {len(products)} related products for {productId}")
+        return jsonify(products), 200
+    except Exception as e:
+        logger.error(f"Error fetching related products for {productId}: {str(e)}")
+        if 'cursor' in locals():
+            cursor.close()
+        if 'conn' in locals():
+            conn.close()
+        return jsonify({'error': str(e)}), 500
+
 @products_bp.route('/api/search', methods=['GET'])
 def search_products():
+    """Products whose title or description contains every search term.
+
+    Optional limit/offset page the results. Responses are cached by normalized
+    query and page until the catalog changes.
+    """
     try:
         search_query = request.args.get('q', '').strip()
         logger.debug(f"Searching products with query: {search_query}")
         if not search_query:
             return jsonify({'error': 'Search query is required'}), 400
 
-        conn = get_db_connection()
+        try:
+            limit = int(request.args['limit']) if request.args.get('limit') else None
+            offset = int(request.args.get('offset', 0))
+            if (limit is not None and limit < 1) or offset < 0:
+                raise ValueError
+        except ValueError:
+            return jsonify({'error': 'limit must be a positive integer and offset non-negative'}), 400
+
+        terms = normalize_query(search_query)
+        cache_key = (' '.join(terms), limit, offset)
+        # Read the version before querying so a concurrent catalog change can't be cached as current
+        catalog_version = versions().get('catalog')[0]
+        body = search_cache.get(cache_key, catalog_version)
+        if body is not None:
+            logger.debug(f"Search cache hit for {cache_key}")
+            return Response(body, status=200, mimetype='application/json')
+
+        snapshot = catalog_snapshot.current()
+        if snapshot is not None and snapshot.can_search(terms):
+            rows = snapshot.search_rows(terms)
+            rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            body = snapshot.products_json(rows)
+            logger.debug(f"Found {len(rows)} products in catalog snapshot {snapshot.version}")
+            search_cache.put(cache_key, catalog_version, body, empty=not rows)
+            return Response(body, status=200, mimetype='application/json')
+
+        conn = get_read_connection('catalog')
         cursor = conn.cursor(dictionary=True)
-        query = """
-            SELECT * FROM products 
-            WHERE (title LIKE %s OR (description IS NOT NULL AND description LIKE %s))
+        term_clause = '(title LIKE %s OR (description IS NOT NULL AND description LIKE %s))'
+        query = f"""
+            SELECT * FROM products
+            WHERE {' AND '.join([term_clause] * len(terms))}
+            ORDER BY productId
         """
-        like_pattern = f'%{search_query}%'
-        logger.debug(f"Executing query: {query} with params: {like_pattern}")
-        cursor.execute(query, (like_pattern, like_pattern))
+        params = []
+        for term in terms:
+            like_pattern = f'%{term}%'
+            params.extend([like_pattern, like_pattern])
+        if limit is not None:
+            query += ' LIMIT %s OFFSET %s'
+            params.extend([limit, offset])
+        logger.debug(f"Executing query: {query} with params: {params}")
+        cursor.execute(query, params)
         products = cursor.fetchall()
         cursor.close()
         conn.close()
+        if limit is None:
+            products = products[offset:]
 
         if not products:
             logger.debug("No products found for the search query")
-            return jsonify([]), 200
+        products = [convert_product_data(product) for product in products]
+        logger.debug(f"Found {len(products)} products")
+        response = jsonify(products)
+        search_cache.put(cache_key, catalog_version, response.get_data(), empty=not products)
+        return response, 200
+    except Exception as e:
+        logger.error(f"Error searching products: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@products_bp.route('/api/categories/<int:categoryId>/products', methods=['GET'])
+def get_category_products(categoryId):
+    try:
+        sort = request.args.get('sort', 'price')
+        order = request.args.get('order', 'asc').lower()
+        if sort not in CATEGORY_SORTS or order not in ('asc', 'desc'):
+            logger.warning(f"Invalid category sort: {sort} {order}")
+            return jsonify({'error': f"sort must be one of {list(CATEGORY_SORTS)} and order asc or desc"}), 400
+
+        logger.debug(f"Fetching products for category {categoryId} sorted by {sort} {order}")
+        snapshot = catalog_snapshot.current()
+        if snapshot is not None:
+            body = snapshot.products_json(snapshot.category_rows(categoryId, sort, order))
+            return Response(body, status=200, mimetype='application/json')
+
+        conn = get_read_connection('catalog')
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            f'SELECT * FROM products WHERE categoryId = %s ORDER BY {CATEGORY_SORTS[sort]} {order.upper()}, productId',
+            (categoryId,)
+        )
+        products = cursor.fetchall()
+        cursor.close()
+        conn.close()
 
         products = [convert_product_data(product) for product in products]
-        logger.debug(f"Found {len(products)} products: {products}")
+        logger.debug(f"Retrieved {len(products)} products for category {categoryId}")
         return jsonify(products), 200
     except Exception as e:
-        logger.error(f"Error searching products: {str(e)}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        logger.error(f"Error fetching products for category {categoryId}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@products_bp.route('/api/categories/facets', methods=['GET'])
+def get_category_facets():
+    try:
+        return jsonify(catalog_facets.all_categories()), 200
+    except Exception as e:
+        logger.error(f"Error fetching category facets: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@products_bp.route('/api/categories/<int:categoryId>/facets', methods=['GET'])
+def get_single_category_facets(categoryId):
+    try:
+        facets = catalog_facets.category(categoryId)
+        if facets is None:
+            logger.warning(f"Category {categoryId} not found")
+            return jsonify({'error': 'Category not found'}), 404
+        return jsonify(facets), 200
+    except Exception as e:
+        logger.error(f"Error fetching facets for category {categoryId}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
@@ -1,8 +1,12 @@
 from flask import Blueprint, request, jsonify
-from app.db import get_db_connection
+from app.db import breaker, get_db_connection, replica_status, statement_stats
+from app.utils import degraded_mode, order_events, query_profiler, rate_limit, startup
+from app.utils.catalog_snapshot import catalog_snapshot
+from app.utils.product_cache import product_cache
+from app.utils.search_cache import search_cache
 import bcrypt
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -227,14 +231,14 @@ def get_staff_stats():
         cursor.execute('SELECT COUNT(*) as total_staff FROM staff')
         total_staff = cursor.fetchone()['total_staff']
         
-        cursor.execute('SELECT COUNT(*) as admin_count FROM staff WHERE role = "admin"')
+        cursor.execute("SELECT COUNT(*) as admin_count FROM staff WHERE role = 'admin'")
         admin_count = cursor.fetchone()['admin_count']
         
         cursor.execute('''
             SELECT COUNT(*) as recent_staff 
             FROM staff 
-            WHERE created_at >= DATE_SUB(NOW(), INTERVAL 30 DAY)
-        ''')
+            WHERE created_at >= %s
+        ''', (datetime.now() - timedelta(days=30),))
         recent_staff = cursor.fetchone()['recent_staff']
         
         cursor.close()
@@ -248,4 +252,57 @@ def get_staff_stats():
         }), 200
     except Exception as e:
         logger.error(f"Error fetching staff stats: {str(e)}")
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@staff_bp.route('/api/staff/db-stats', methods=['GET'])
+def get_db_stats():
+    staff_id = request.headers.get('X-Staff-ID')
+    if not staff_id:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify({
+        'statements': statement_stats(),
+        'replicas': replica_status(),
+        'breaker': breaker.snapshot()
+    }), 200
+
+@staff_bp.route('/api/staff/metrics', methods=['GET'])
+def get_metrics():
+    staff_id = request.headers.get('X-Staff-ID')
+    if not staff_id:
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify({
+        'admission': rate_limit.metrics.snapshot(),
+        'searchCache': search_cache.snapshot(),
+        'productCache': product_cache.snapshot(),
+        'staleCatalog': degraded_mode.stale_cache.snapshot(),
+        'catalogSnapshot': catalog_snapshot.snapshot(),
+        'startup': startup.metrics.snapshot(),
+        'orderEvents': order_events.order_events().snapshot()
+    }), 200
+
+@staff_bp.route('/api/staff/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """Statements ranked by total time (or ?sort=avgMs|maxMs|calls|maxPerRequest) and recent slow executions."""
+    staff_id = request.headers.get('X-Staff-ID')
+    if not staff_id:
+        return jsonify({'error': 'Unauthorized'}), 401
+    sort = request.args.get('sort', 'totalMs')
+    if sort not in ('totalMs', 'avgMs', 'maxMs', 'calls', 'rows', 'maxPerRequest', 'slowCalls'):
+        return jsonify({'error': 'Invalid sort'}), 400
+    try:
+        limit = min(int(request.args.get('limit', 20)), 200)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    return jsonify({
+        'thresholdMs': query_profiler.profile.slow_ms,
+        'statements': query_profiler.profile.top(limit, sort),
+        'slowQueries': query_profiler.profile.slow_queries()
+    }), 200
+
+@staff_bp.route('/api/staff/slow-queries', methods=['DELETE'])
+def reset_slow_queries():
+    staff_id = request.headers.get('X-Staff-ID')
+    if not staff_id:
+        return jsonify({'error': 'Unauthorized'}), 401
+    query_profiler.profile.reset()
+    return jsonify({'message': 'Query profile reset'}), 200
@@ -0,0 +1,32 @@
+from flask import Blueprint, jsonify
+from app.db import get_read_connection
+import logging
+from decimal import Decimal
+
+logging.basicConfig(level=logging.DEBUG)
+logger = logging.getLogger(__name__)
+
+users_bp = Blueprint('users', __name__)
+
+@users_bp.route('/api/users/<int:userId>/order-summary', methods=['GET'])
+def get_order_summary(userId):
+    """Order count, spend and items bought; totalSpent and itemsPurchased leave out cancelled orders."""
+    try:
+        conn = get_read_connection(f'orders:{userId}')
+        summary = conn.fetch_one('order_summary', (userId,))
+        conn.close()
+
+        if not summary:
+            summary = {
+                'userId': userId, 'orderCount': 0, 'totalSpent': 0.0, 'itemsPurchased': 0,
+                'lastOrderId': None, 'lastOrderStatus': None, 'lastOrderAt': None
+            }
+        summary = dict(summary)
+        if isinstance(summary['totalSpent'], (Decimal, float)):
+            # SQLite keeps DECIMAL columns as binary floats
+            summary['totalSpent'] = round(float(summary['totalSpent']), 2)
+        logger.debug(f"Order summary for userId {userId}: {summary}")
+        return jsonify(summary), 200
+    except Exception as e:
+        logger.error(f"Error fetching order summary for userId {userId}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,107 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from app.db import get_db_connection
+from app.utils.http_cache import bump_cart
+
+logger = logging.getLogger(__name__)
+
+# Cart items not added or changed for this long are deleted
+CART_RETENTION_DAYS = int(os.getenv('CART_RETENTION_DAYS', '30'))
+# Copy expired items to cart_items_archive (for abandoned-cart analytics) before deleting them
+CART_RETENTION_ARCHIVE = os.getenv('CART_RETENTION_ARCHIVE', 'false').lower() == 'true'
+CART_RETENTION_BATCH_SIZE = 500
+# Pause between batches so the job never holds locks for long stretches
+CART_RETENTION_PAUSE_SECONDS = 0.1
+
+CART_ITEM_COLUMNS = 'cartItemId, userId, productId, quantity, addedAt'
+
+
+def cutoff_for(older_than_days=None):
+    days = CART_RETENTION_DAYS if older_than_days is None else older_than_days
+    if days < 1:
+        raise ValueError('Cart items must be kept for at least one day')
+    return datetime.now() - timedelta(days=days)
+
+
+def count_expired(cutoff):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT COUNT(*) FROM cart_items WHERE addedAt < %s', (cutoff,))
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def expire_batch(cutoff, after_id=0, batch_size=CART_RETENTION_BATCH_SIZE, archive=CART_RETENTION_ARCHIVE):
+    """Delete one batch of cart items last touched before cutoff, walking the primary key from after_id.
+
+    The ids are found with a plain (non-locking) read; only the rows being
+    deleted are locked, and the age is checked again as they are, so an item
+    touched in the meantime is kept. Returns (last id scanned or None when
+    the walk is done, rows deleted, userIds affected).
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT cartItemId, userId FROM cart_items
+            WHERE cartItemId > %s AND addedAt < %s
+            ORDER BY cartItemId
+            LIMIT %s
+            """,
+            (after_id, cutoff, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            conn.commit()
+            return None, 0, set()
+
+        item_ids = [row[0] for row in rows]
+        placeholders = ', '.join(['%s'] * len(item_ids))
+        if archive:
+            cursor.execute(
+                f'INSERT INTO cart_items_archive ({CART_ITEM_COLUMNS}) '
+                f'SELECT {CART_ITEM_COLUMNS} FROM cart_items WHERE cartItemId IN ({placeholders}) AND addedAt < %s',
+                item_ids + [cutoff]
+            )
+        cursor.execute(
+            f'DELETE FROM cart_items WHERE cartItemId IN ({placeholders}) AND addedAt < %s',
+            item_ids + [cutoff]
+        )
+        deleted = cursor.rowcount
+        conn.commit()
+        last_id = item_ids[-1] if len(item_ids) == batch_size else None
+        return last_id, deleted, {row[1] for row in rows}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def expire_carts(older_than_days=None, batch_size=CART_RETENTION_BATCH_SIZE, pause=CART_RETENTION_PAUSE_SECONDS,
+                 max_batches=None, archive=CART_RETENTION_ARCHIVE):
+    """Delete cart items older than older_than_days (default CART_RETENTION_DAYS) in batches.
+
+    Returns the number of rows deleted.
+    """
+    cutoff = cutoff_for(older_than_days)
+    deleted = 0
+    batches = 0
+    last_id = 0
+    while last_id is not None and (max_batches is None or batches < max_batches):
+        last_id, count, user_ids = expire_batch(cutoff, last_id, batch_size, archive)
+        if user_ids:
+            bump_cart(*user_ids)
+        deleted += count
+        batches += 1
+        if count:
+            logger.info(f"Deleted {count} cart items last touched before {cutoff:%Y-%m-%d} ({deleted} so far)")
+        if last_id is not None:
+            time.sleep(pause)
+    logger.info(f"Cart retention: {deleted} expired cart items deleted{' and archived' if archive else ''} "
+                f"in {batches} batches")
+    return deleted
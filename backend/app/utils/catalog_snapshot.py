@@ -0,0 +1,298 @@
+import fcntl
+import glob
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+import numpy as np
+from flask import json
+from app.db import get_db_connection
+from app.utils.http_cache import versions
+
+logger = logging.getLogger(__name__)
+
+CATALOG_SNAPSHOT_ENABLED = os.getenv('CATALOG_SNAPSHOT_ENABLED', 'true').lower() != 'false'
+CATALOG_SNAPSHOT_DIR = os.getenv(
+    'CATALOG_SNAPSHOT_DIR',
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'catalog'))
+)
+# Snapshot files kept on disk; older ones are unlinked (workers still mapping them are unaffected)
+KEEP_SNAPSHOTS = 2
+
+_MAGIC = b'AWECAT01'
+_HEADER = struct.Struct('<8sQddQ')  # magic, catalog version, version-table epoch, built_at, product count
+_SECTION = struct.Struct('<QQ')     # offset, length
+
+# Category listing orders, one row permutation per (sort, order); same keys as CATEGORY_SORTS
+SORTS = ('price', 'rating', 'discount')
+SECTIONS = (
+    'ids',              # int64[n]   productId, ascending
+    'offsets',          # int64[n+1] product i is body[offsets[i]:offsets[i+1] - 1]
+    'body',             # the JSON array of every converted product
+    'text_offsets',     # int64[n+1] product i is text[text_offsets[i]:text_offsets[i+1]]
+    'text',             # casefolded "title \0 description \1" per product, for search
+    'categories',       # int64[k]   category ids, ascending
+    'category_starts',  # int64[k+1] category j is rows[category_starts[j]:category_starts[j+1]]
+) + tuple(f'{sort}_{order}' for sort in SORTS for order in ('asc', 'desc'))  # int64[n] rows by category, key
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def snapshot_path(epoch, version, directory=CATALOG_SNAPSHOT_DIR):
+    return os.path.join(directory, f'catalog-{int(epoch):x}-{version}.bin')
+
+
+def _sort_key(values):
+    # NULLs sort first ascending and last descending, as in MySQL and SQLite
+    return np.array([-np.inf if value is None else float(value) for value in values], dtype=np.float64)
+
+
+def write_snapshot(path, rows, version, epoch, convert):
+    """Serialize raw product rows (ordered by productId) into a snapshot file, atomically."""
+    count = len(rows)
+    ids = np.array([row['productId'] for row in rows], dtype=np.int64)
+
+    body = bytearray(b'[')
+    offsets = []
+    text = bytearray()
+    text_offsets = []
+    for row in rows:
+        offsets.append(len(body))
+        body += json.dumps(convert(row), separators=(',', ':'), sort_keys=True).encode('utf-8') + b','
+        text_offsets.append(len(text))
+        searchable = f"{row['title'] or ''}\0{row['description'] or ''}".casefold()
+        text += searchable.encode('utf-8') + b'\1'
+    if count:
+        body[-1:] = b']'
+    else:
+        body += b']'
+    offsets.append(len(body))
+    text_offsets.append(len(text))
+
+    category_ids = np.array([-1 if row['categoryId'] is None else row['categoryId'] for row in rows], dtype=np.int64)
+    categories = np.unique(category_ids)
+    sections = {
+        'ids': ids,
+        'offsets': np.array(offsets, dtype=np.int64),
+        'body': bytes(body),
+        'text_offsets': np.array(text_offsets, dtype=np.int64),
+        'text': bytes(text),
+        'categories': categories,
+        'category_starts': np.append(np.searchsorted(np.sort(category_ids), categories), count),
+    }
+    columns = {'price': 'price', 'rating': 'rating', 'discount': 'discount_percentage'}
+    for sort, column in columns.items():
+        key = _sort_key([row[column] for row in rows])
+        # Within a category: by key, ties by productId ascending in both directions
+        sections[f'{sort}_asc'] = np.lexsort((ids, key, category_ids)).astype(np.int64)
+        sections[f'{sort}_desc'] = np.lexsort((ids, -key, category_ids)).astype(np.int64)
+
+    table_offset = _HEADER.size
+    offset = _align(table_offset + len(SECTIONS) * _SECTION.size)
+    layout = []
+    for name in SECTIONS:
+        data = sections[name]
+        data = data.astype('<i8').tobytes() if isinstance(data, np.ndarray) else data
+        layout.append((name, offset, data))
+        offset = _align(offset + len(data))
+
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.catalog-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, version, epoch, time.time(), count))
+            for _, section_offset, data in layout:
+                f.write(_SECTION.pack(section_offset, len(data)))
+            for _, section_offset, data in layout:
+                f.seek(section_offset)
+                f.write(data)
+            f.truncate(offset)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+class CatalogSnapshot:
+    """A read-only, memory-mapped snapshot file.
+
+    Index arrays are NumPy views straight onto the mapping, so every worker
+    process shares the same page-cache pages instead of its own copy.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.version, self.epoch, self.built_at, self.count = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            raise ValueError(f'{path} is not a catalog snapshot')
+        self._sections = {}
+        for index, name in enumerate(SECTIONS):
+            self._sections[name] = _SECTION.unpack_from(self._map, _HEADER.size + index * _SECTION.size)
+        self.ids = self._array('ids')
+        self._offsets = self._array('offsets')
+        self._text_offsets = self._array('text_offsets')
+        self._categories = self._array('categories')
+        self._category_starts = self._array('category_starts')
+        self._orders = {name: self._array(name) for name in SECTIONS if name.endswith(('_asc', '_desc'))}
+
+    def _array(self, name):
+        offset, length = self._sections[name]
+        return np.frombuffer(self._map, dtype='<i8', count=length // 8, offset=offset)
+
+    @property
+    def size(self):
+        return len(self._map)
+
+    def listing(self):
+        """The JSON array of every product, as served by GET /api/products."""
+        offset, length = self._sections['body']
+        return self._map[offset:offset + length]
+
+    def _product(self, row):
+        offset = self._sections['body'][0]
+        return self._map[offset + self._offsets[row]:offset + self._offsets[row + 1] - 1]
+
+    def products_json(self, rows):
+        return b'[' + b','.join(self._product(row) for row in rows) + b']'
+
+    def rows_for_ids(self, product_ids):
+        """Rows of the given ids in the order given; unknown ids are skipped."""
+        if not len(self.ids):
+            return []
+        requested = np.asarray(product_ids, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.ids, requested), len(self.ids) - 1)
+        return [int(row) for row in rows[self.ids[rows] == requested]]
+
+    def products(self, product_ids):
+        return [json.loads(self._product(row)) for row in self.rows_for_ids(product_ids)]
+
+    def category_rows(self, category_id, sort, order):
+        index = int(np.searchsorted(self._categories, category_id))
+        if index >= len(self._categories) or self._categories[index] != category_id:
+            return []
+        rows = self._orders[f'{sort}_{order}']
+        return rows[self._category_starts[index]:self._category_starts[index + 1]]
+
+    @staticmethod
+    def can_search(terms):
+        # LIKE wildcards in a term have to go to the database
+        return not any('%' in term or '_' in term for term in terms)
+
+    def search_rows(self, terms):
+        """Rows (productId order) whose title or description contains every casefolded term."""
+        text_start, text_length = self._sections['text']
+        matches = None
+        # Longer terms tend to be rarer and shrink the candidate set fastest
+        for term in sorted(terms, key=len, reverse=True):
+            pattern = re.compile(re.escape(term.encode('utf-8')))
+            positions = np.fromiter(
+                (match.start() - text_start for match in pattern.finditer(self._map, text_start, text_start + text_length)),
+                dtype=np.int64
+            )
+            rows = np.unique(np.searchsorted(self._text_offsets, positions, side='right') - 1)
+            matches = rows if matches is None else np.intersect1d(matches, rows, assume_unique=True)
+            if not len(matches):
+                return []
+        return [int(row) for row in matches]
+
+
+def build(directory=CATALOG_SNAPSHOT_DIR):
+    """Write a snapshot of the current catalog; returns its path.
+
+    The catalog version is read before the products, so the file is never
+    labelled newer than its contents.
+    """
+    # Imported here: the routes import this module
+    from app.routes.products import convert_product_data
+
+    table = versions()
+    version = table.get('catalog')[0]
+    start = time.perf_counter()
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute('SELECT * FROM products ORDER BY productId')
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+    path = snapshot_path(table.epoch, version, directory)
+    write_snapshot(path, rows, version, table.epoch, convert_product_data)
+    logger.info(f"Wrote catalog snapshot {os.path.basename(path)} ({len(rows)} products, "
+                f"{os.path.getsize(path)} bytes) in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    snapshots = sorted(glob.glob(os.path.join(directory, 'catalog-*.bin')), key=os.path.getmtime, reverse=True)
+    for old in snapshots[KEEP_SNAPSHOTS:]:
+        try:
+            os.unlink(old)
+        except FileNotFoundError:
+            pass
+    return path
+
+
+class SnapshotStore:
+    """This process's mapping of the snapshot for the current catalog version.
+
+    The first process to see a new catalog version builds the file (under a
+    file lock, so it is built once); the others map it. Swapping is a single
+    reference assignment, so readers always see one complete snapshot.
+    """
+
+    def __init__(self, directory=CATALOG_SNAPSHOT_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._stats = {'builds': 0, 'swaps': 0, 'failures': 0}
+
+    def current(self):
+        """The snapshot for the current catalog version, or None when unavailable."""
+        if not CATALOG_SNAPSHOT_ENABLED:
+            return None
+        table = versions()
+        version = table.get('catalog')[0]
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version >= version and snapshot.epoch == table.epoch:
+            return snapshot
+        try:
+            return self._swap(table, version)
+        except Exception as e:
+            self._stats['failures'] += 1
+            logger.warning(f"Catalog snapshot unavailable, falling back to the database: {str(e)}")
+            return None
+
+    def _swap(self, table, version):
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.version >= version and snapshot.epoch == table.epoch:
+                return snapshot
+            os.makedirs(self.directory, exist_ok=True)
+            path = snapshot_path(table.epoch, version, self.directory)
+            if not os.path.exists(path):
+                with open(os.path.join(self.directory, '.build.lock'), 'a') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    if not os.path.exists(path):
+                        path = build(self.directory)
+                        self._stats['builds'] += 1
+            self._snapshot = CatalogSnapshot(path)
+            self._stats['swaps'] += 1
+            logger.debug(f"Mapped catalog snapshot {os.path.basename(path)}")
+            return self._snapshot
+
+    def snapshot(self):
+        stats = dict(self._stats)
+        current = self._snapshot
+        stats['enabled'] = CATALOG_SNAPSHOT_ENABLED
+        stats['version'] = current.version if current else None
+        stats['products'] = current.count if current else 0
+        stats['bytes'] = current.size if current else 0
+        return stats
+
+
+catalog_snapshot = SnapshotStore()
@@ -0,0 +1,153 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import g, jsonify, make_response, request
+from app.db import breaker
+
+logger = logging.getLogger(__name__)
+
+# Last good catalog responses kept for serving while the database is unavailable
+STALE_CACHE_MAX_BYTES = int(os.getenv('STALE_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# Public catalog reads that may be answered from the stale copy
+STALE_ENDPOINTS = {
+    'get_products',
+    'get_product',
+    'get_related_products',
+    'search_products',
+    'get_category_products',
+    'get_category_facets',
+    'get_single_category_facets',
+}
+
+# Endpoints that never touch the database and keep working during an outage
+DB_FREE_ENDPOINTS = {
+    'get_db_stats',
+    'get_metrics',
+    'get_slow_queries',
+    'reset_slow_queries',
+    'liveness',
+    'readiness',
+    'get_order_events',
+}
+
+
+class StaleCache:
+    """LRU of the last successful response per catalog URL, bounded by total body size."""
+
+    def __init__(self, max_bytes=STALE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._stats = {'served': 0, 'misses': 0, 'rejected': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['served'] += 1
+            return entry
+
+    def put(self, key, body, mimetype):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (body, mimetype, time.time())
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        body, _, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def incr(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['maxBytes'] = self.max_bytes
+        return stats
+
+
+stale_cache = StaleCache()
+
+
+def _endpoint_name():
+    return request.endpoint.rsplit('.', 1)[-1] if request.endpoint else None
+
+
+def _serves_stale():
+    return request.method == 'GET' and _endpoint_name() in STALE_ENDPOINTS
+
+
+def _stale_response():
+    entry = stale_cache.get(request.full_path)
+    if entry is None:
+        return None
+    body, mimetype, stored_at = entry
+    response = make_response(body, 200)
+    response.mimetype = mimetype
+    response.headers['X-Cache'] = 'stale'
+    response.headers['Age'] = str(int(time.time() - stored_at))
+    response.headers['Cache-Control'] = 'no-store'
+    # Keep http_cache from labelling the old body with the current ETag
+    request.environ.pop('awe.cache_validators', None)
+    g.served_stale = True
+    logger.warning(f"Database unavailable, serving stale {request.full_path} ({response.headers['Age']}s old)")
+    return response
+
+
+def _unavailable():
+    stale_cache.incr('rejected')
+    response = jsonify({'error': 'Database unavailable, please retry'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(max(1, math.ceil(breaker.retry_after())))
+    return response
+
+
+def before_request():
+    """While the breaker is open, answer catalog reads from the stale copy and everything else with 503."""
+    if not request.path.startswith('/api/') or _endpoint_name() in DB_FREE_ENDPOINTS:
+        return None
+    if not breaker.rejecting():
+        return None
+    if _serves_stale():
+        response = _stale_response()
+        if response is not None:
+            return response
+    return _unavailable()
+
+
+def after_request(response):
+    if g.get('served_stale'):
+        return response
+    if _serves_stale() and response.status_code == 200:
+        stale_cache.put(request.full_path, response.get_data(), response.mimetype)
+        return response
+    if response.status_code >= 500 and g.get('db_outage'):
+        # The view hit a timeout or the breaker tripped mid-request
+        if _serves_stale():
+            stale = _stale_response()
+            if stale is not None:
+                return stale
+        return _unavailable()
+    return response
+
+
+def init_app(app):
+    app.before_request(before_request)
+    app.after_request(after_request)
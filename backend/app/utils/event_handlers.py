@@ -0,0 +1,21 @@
+import logging
+from app.utils.outbox import handler
+
+logger = logging.getLogger(__name__)
+
+
+@handler('order.placed')
+def send_order_confirmations(events):
+    # No mail provider is configured yet; log what would be sent
+    for event in events:
+        payload = event['payload']
+        logger.info(f"Order confirmation for order {payload['orderId']} to user {payload['userId']} "
+                    f"({payload['itemCount']} items, total {payload['total']})")
+
+
+@handler('order.status_changed')
+def send_status_notifications(events):
+    for event in events:
+        payload = event['payload']
+        logger.info(f"Order {payload['orderId']} for user {payload['userId']} moved from "
+                    f"{payload['from']} to {payload['to']}")
@@ -0,0 +1,120 @@
+import logging
+import threading
+import numpy as np
+from app.db import get_db_connection
+from app.utils.http_cache import versions
+
+logger = logging.getLogger(__name__)
+
+# Upper edges of the price buckets; the last bucket is open-ended
+PRICE_BUCKET_EDGES = np.array([50.0, 100.0, 250.0, 500.0, 1000.0])
+# Ratings are bucketed by whole star: [0,1), [1,2), ..., [4,5]
+RATING_BUCKETS = 5
+# categoryId used for products without a category
+UNCATEGORIZED = -1
+
+
+class CatalogFacets:
+    """Per-category product counts, price buckets and rating distributions.
+
+    The catalog is read into NumPy arrays and the facet matrices are built
+    with vectorized bucketing. The arrays are tagged with the catalog version
+    they were read at; once any worker bumps it, the next read in this
+    process rebuilds them, so serving facets otherwise never touches the
+    products table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held while rebuilding so concurrent requests wait for one rebuild instead of each running their own
+        self._load_lock = threading.Lock()
+        self._version = None
+        self._category_index = {}
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._price_hist = np.zeros((0, len(PRICE_BUCKET_EDGES) + 1), dtype=np.int64)
+        self._rating_hist = np.zeros((0, RATING_BUCKETS), dtype=np.int64)
+        self._min_price = np.zeros(0)
+        self._max_price = np.zeros(0)
+
+    def _build(self, category_ids, prices, ratings):
+        categories, rows = np.unique(category_ids, return_inverse=True)
+        price_buckets = np.digitize(prices, PRICE_BUCKET_EDGES)
+        rating_buckets = np.clip(ratings.astype(np.int64), 0, RATING_BUCKETS - 1)
+
+        counts = np.bincount(rows, minlength=len(categories)).astype(np.int64)
+        price_hist = np.zeros((len(categories), len(PRICE_BUCKET_EDGES) + 1), dtype=np.int64)
+        np.add.at(price_hist, (rows, price_buckets), 1)
+        rating_hist = np.zeros((len(categories), RATING_BUCKETS), dtype=np.int64)
+        np.add.at(rating_hist, (rows, rating_buckets), 1)
+        min_price = np.full(len(categories), np.inf)
+        np.minimum.at(min_price, rows, prices)
+        max_price = np.full(len(categories), -np.inf)
+        np.maximum.at(max_price, rows, prices)
+
+        self._category_index = {int(category): row for row, category in enumerate(categories)}
+        self._counts = counts
+        self._price_hist = price_hist
+        self._rating_hist = rating_hist
+        self._min_price = min_price
+        self._max_price = max_price
+
+    def load(self):
+        """(Re)build every facet from the products table."""
+        # Read the version before querying so a concurrent catalog change can't be tagged as current
+        version = versions().get('catalog')[0]
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT categoryId, price, rating FROM products')
+        rows = cursor.fetchall()
+        cursor.close()
+        conn.close()
+
+        category_ids = np.array([UNCATEGORIZED if row[0] is None else row[0] for row in rows], dtype=np.int64)
+        prices = np.array([float(row[1] or 0) for row in rows], dtype=np.float64)
+        ratings = np.array([float(row[2] or 0) for row in rows], dtype=np.float64)
+        with self._lock:
+            self._build(category_ids, prices, ratings)
+            self._version = version
+        logger.info(f"Built catalog facets for {len(rows)} products in {len(self._category_index)} categories")
+
+    def ensure_loaded(self):
+        """Rebuild the facets if the catalog has changed in any worker since they were read."""
+        if self._version == versions().get('catalog')[0]:
+            return
+        with self._load_lock:
+            if self._version != versions().get('catalog')[0]:
+                self.load()
+
+    def _category_facets(self, category, row):
+        edges = [0.0] + PRICE_BUCKET_EDGES.tolist() + [None]
+        return {
+            'categoryId': None if category == UNCATEGORIZED else category,
+            'count': int(self._counts[row]),
+            'minPrice': float(self._min_price[row]) if self._counts[row] else None,
+            'maxPrice': float(self._max_price[row]) if self._counts[row] else None,
+            'priceBuckets': [
+                {'min': edges[i], 'max': edges[i + 1], 'count': int(count)}
+                for i, count in enumerate(self._price_hist[row])
+            ],
+            'ratings': [
+                {'min': stars, 'max': stars + 1, 'count': int(count)}
+                for stars, count in enumerate(self._rating_hist[row])
+            ],
+        }
+
+    def all_categories(self):
+        self.ensure_loaded()
+        with self._lock:
+            return [self._category_facets(category, row)
+                    for category, row in sorted(self._category_index.items())]
+
+    def category(self, category_id):
+        self.ensure_loaded()
+        with self._lock:
+            row = self._category_index.get(category_id)
+            if row is None:
+                return None
+            return self._category_facets(category_id, row)
+
+
+catalog_facets = CatalogFacets()
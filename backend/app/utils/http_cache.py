@@ -0,0 +1,179 @@
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+from email.utils import formatdate
+from flask import make_response, request
+
+logger = logging.getLogger(__name__)
+
+VERSIONS_FILE = os.getenv(
+    'HTTP_CACHE_VERSIONS_FILE',
+    os.path.join(tempfile.gettempdir(), 'awe_store_versions.bin')
+)
+VERSION_SLOTS = 65536
+
+# Public catalog responses may be stored by browsers and the CDN but must be revalidated
+CATALOG_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+
+_HEADER = struct.Struct('<8sdd')  # magic, epoch (random per file), created_at
+_SLOT = struct.Struct('<Qd')      # version counter, last modified (unix time)
+_MAGIC = b'AWEVER01'
+
+
+class VersionTable:
+    """Data version counters shared by every process through a memory-mapped file.
+
+    Keys hash into a fixed number of slots; a collision only makes two keys
+    invalidate together, it can never make a stale response look fresh.
+    """
+
+    def __init__(self, path=VERSIONS_FILE, slots=VERSION_SLOTS):
+        self.path = path
+        self.slots = slots
+        size = _HEADER.size + slots * _SLOT.size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            header = os.pread(fd, _HEADER.size, 0)
+            if os.fstat(fd).st_size != size or not header.startswith(_MAGIC):
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+                epoch = float(int.from_bytes(os.urandom(6), 'big'))
+                os.pwrite(fd, _HEADER.pack(_MAGIC, epoch, time.time()), 0)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        _, self.epoch, self.created_at = _HEADER.unpack_from(self._map, 0)
+        self._lock_path = path + '.lock'
+
+    def _offset(self, key):
+        return _HEADER.size + (zlib.crc32(key.encode('utf-8')) % self.slots) * _SLOT.size
+
+    def get(self, key):
+        """Return (version, last_modified) for a key."""
+        version, modified = _SLOT.unpack_from(self._map, self._offset(key))
+        return version, modified or self.created_at
+
+    def bump(self, *keys):
+        offsets = sorted({self._offset(key) for key in keys})
+        now = time.time()
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            for offset in offsets:
+                version, _ = _SLOT.unpack_from(self._map, offset)
+                _SLOT.pack_into(self._map, offset, version + 1, now)
+
+
+_versions = None
+
+
+def versions():
+    global _versions
+    if _versions is None:
+        _versions = VersionTable()
+    return _versions
+
+
+def bump_catalog():
+    versions().bump('catalog')
+
+
+def bump_cart(*user_ids):
+    versions().bump(*[f'cart:{user_id}' for user_id in user_ids])
+
+
+def bump_orders(*user_ids):
+    versions().bump(*[f'orders:{user_id}' for user_id in user_ids])
+
+
+def bump_user(user_id):
+    versions().bump(f'user:{user_id}')
+
+
+def _request_user_id():
+    return request.headers.get('X-User-ID') or request.args.get('userId')
+
+
+# Endpoint name -> (version keys for the request, public?). Returning None skips caching.
+CACHEABLE_ENDPOINTS = {
+    'get_products': (lambda: ['catalog'], True),
+    'get_product': (lambda: ['catalog'], True),
+    'search_products': (lambda: ['catalog'], True),
+    'get_category_products': (lambda: ['catalog'], True),
+    'get_category_facets': (lambda: ['catalog'], True),
+    'get_single_category_facets': (lambda: ['catalog'], True),
+    'get_cart': (lambda: _request_user_id() and [f'cart:{_request_user_id()}', 'catalog'], False),
+    'get_order_history': (lambda: _request_user_id() and [f'orders:{_request_user_id()}', 'catalog'], False),
+    'get_user_profile': (lambda: [f"user:{request.view_args['userId']}"], False),
+    'get_order_summary': (lambda: [f"orders:{request.view_args['userId']}"], False),
+}
+
+
+def _validators():
+    """Compute (etag, last_modified, public) for the current request, or None."""
+    if request.method != 'GET' or not request.endpoint:
+        return None
+    entry = CACHEABLE_ENDPOINTS.get(request.endpoint.rsplit('.', 1)[-1])
+    if not entry:
+        return None
+    keys = entry[0]()
+    if not keys:
+        return None
+    table = versions()
+    parts = []
+    last_modified = 0.0
+    for key in keys:
+        version, modified = table.get(key)
+        parts.append(f'{key}={version}')
+        last_modified = max(last_modified, modified)
+    digest = zlib.crc32(';'.join(parts).encode('utf-8'))
+    etag = f'{int(table.epoch):x}-{digest:08x}'
+    return etag, last_modified, entry[1]
+
+
+def _apply_headers(response, etag, last_modified, public):
+    response.set_etag(etag, weak=True)
+    response.headers['Last-Modified'] = formatdate(last_modified, usegmt=True)
+    response.headers['Cache-Control'] = CATALOG_CACHE_CONTROL if public else PRIVATE_CACHE_CONTROL
+    if not public:
+        response.vary.add('X-User-ID')
+    return response
+
+
+def before_request():
+    """Answer conditional GETs with 304 before the view runs any query."""
+    validators = _validators()
+    if not validators:
+        return None
+    etag, last_modified, public = validators
+    request.environ['awe.cache_validators'] = validators
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since:
+        fresh = int(last_modified) <= request.if_modified_since.timestamp()
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    response = make_response('', 304)
+    logger.debug(f"Not modified: {request.path} ({etag})")
+    return _apply_headers(response, etag, last_modified, public)
+
+
+def after_request(response):
+    validators = request.environ.get('awe.cache_validators')
+    if validators and response.status_code == 200:
+        _apply_headers(response, *validators)
+    return response
+
+
+def init_app(app):
+    app.before_request(before_request)
+    app.after_request(after_request)
@@ -0,0 +1,337 @@
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from app.db import get_db_connection
+from app.utils import order_summaries
+from app.utils.outbox import add_events
+
+logger = logging.getLogger(__name__)
+
+# Counter rows per tracked product. Concurrent checkouts of one product lock
+# different rows, so they only wait for each other when they pick the same slot.
+INVENTORY_SLOTS = int(os.getenv('INVENTORY_SLOTS', '8'))
+# Stock held by a pending order is given back, and the order cancelled, once
+# the reservation is this old (0 = holds never expire)
+RESERVATION_TTL_MINUTES = int(os.getenv('INVENTORY_RESERVATION_TTL_MINUTES', str(48 * 60)))
+EXPIRY_BATCH_SIZE = 100
+# Pause between expiry batches so the job never holds locks for long stretches
+EXPIRY_PAUSE_SECONDS = 0.1
+# Stock of orders in these statuses has left the warehouse and is not given back on cancel
+SHIPPED_STATUSES = ('shipped', 'delivered')
+# MySQL errors after which the transaction can simply be run again
+LOCK_CONFLICT_ERRNOS = {
+    1205,  # ER_LOCK_WAIT_TIMEOUT
+    1213,  # ER_LOCK_DEADLOCK
+}
+
+
+class InsufficientStock(Exception):
+    """Raised by reserve() when a tracked product cannot cover the quantity ordered."""
+
+    def __init__(self, product_id, requested, available):
+        super().__init__(f'Only {available} of product {product_id} in stock, {requested} requested')
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+
+
+def is_lock_conflict(error):
+    """True for a deadlock or lock wait timeout: the caller should roll back and retry the transaction."""
+    return getattr(error, 'errno', None) in LOCK_CONFLICT_ERRNOS
+
+
+def _tuples(rows):
+    # The callers' cursors may be dictionary cursors
+    return [tuple(row.values()) if isinstance(row, dict) else tuple(row) for row in rows]
+
+
+def _quantities(items):
+    wanted = {}
+    for item in items:
+        quantity = int(item['quantity'])
+        if quantity > 0:
+            product_id = int(item['productId'])
+            wanted[product_id] = wanted.get(product_id, 0) + quantity
+    return wanted
+
+
+def _slot_levels(cursor, product_ids):
+    """{productId: {slot: available}} for the products whose stock is tracked, read without locking.
+
+    Products not in it are unlimited.
+    """
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    cursor.execute(
+        f'SELECT productId, slot, available FROM inventory_slots WHERE productId IN ({placeholders})',
+        list(product_ids)
+    )
+    levels = {}
+    for product_id, slot, available in _tuples(cursor.fetchall()):
+        levels.setdefault(product_id, {})[slot] = available
+    return levels
+
+
+def _take_from_slots(cursor, picks):
+    """One UPDATE taking each (productId, slot, quantity); returns how many slots had enough."""
+    cases = ' '.join(['WHEN productId = %s AND slot = %s THEN %s'] * len(picks))
+    conditions = ' OR '.join(['(productId = %s AND slot = %s AND available >= %s)'] * len(picks))
+    params = [value for pick in picks for value in pick] * 2
+    cursor.execute(
+        f'UPDATE inventory_slots SET available = available - CASE {cases} END WHERE {conditions}',
+        params
+    )
+    return cursor.rowcount
+
+
+def _reserve_across_slots(cursor, wanted):
+    """Slow path: lock every slot of each product and take the quantity from as many as needed."""
+    picks = []
+    for product_id in sorted(wanted):
+        cursor.execute(
+            'SELECT slot, available FROM inventory_slots WHERE productId = %s ORDER BY slot FOR UPDATE',
+            (product_id,)
+        )
+        slots = _tuples(cursor.fetchall())
+        available = sum(count for _, count in slots)
+        remaining = wanted[product_id]
+        if available < remaining:
+            raise InsufficientStock(product_id, remaining, available)
+        for slot, count in sorted(slots, key=lambda entry: -entry[1]):
+            if remaining == 0:
+                break
+            take = min(count, remaining)
+            if take > 0:
+                picks.append((product_id, slot, take))
+                remaining -= take
+    _take_from_slots(cursor, picks)
+    return picks
+
+
+def reserve(cursor, order_id, items, ttl_minutes=None):
+    """Hold stock for an order's line items in the caller's transaction.
+
+    Each tracked product is taken from one randomly chosen slot that had
+    enough stock when read, all in a single UPDATE. If some product has no
+    such slot, or a chosen slot has run short by the time of the UPDATE,
+    the products are taken across all of their slots instead, which raises
+    InsufficientStock when the total is not there. Call it as late in the
+    transaction as possible: the slot rows stay locked until commit.
+    Returns the (productId, slot, quantity) holds.
+    """
+    wanted = _quantities(items)
+    if not wanted:
+        return []
+    levels = _slot_levels(cursor, list(wanted))
+    if not levels:
+        return []
+    wanted = {product_id: wanted[product_id] for product_id in levels}
+    picks = []
+    for product_id, slots in levels.items():
+        enough = [slot for slot, available in slots.items() if available >= wanted[product_id]]
+        if not enough:
+            picks = None
+            break
+        picks.append((product_id, random.choice(enough), wanted[product_id]))
+
+    if picks is not None:
+        # Sorted, so concurrent checkouts lock rows in primary key order, as the slow path does
+        picks.sort()
+        cursor.execute('SAVEPOINT inventory_reserve')
+        if _take_from_slots(cursor, picks) != len(picks):
+            # A slot ran short since it was read. InnoDB keeps the row locks of the
+            # rolled-back UPDATE, so the slow path below now locks out of order and
+            # may deadlock with another checkout; callers retry on is_lock_conflict().
+            cursor.execute('ROLLBACK TO SAVEPOINT inventory_reserve')
+            picks = None
+    if picks is None:
+        picks = _reserve_across_slots(cursor, wanted)
+
+    ttl = RESERVATION_TTL_MINUTES if ttl_minutes is None else ttl_minutes
+    expires_at = datetime.now() + timedelta(minutes=ttl) if ttl else None
+    cursor.executemany(
+        'INSERT INTO inventory_reservations (orderId, productId, slot, quantity, expiresAt) VALUES (%s, %s, %s, %s, %s)',
+        [(order_id, product_id, slot, quantity, expires_at) for product_id, slot, quantity in picks]
+    )
+    return picks
+
+
+def release(cursor, order_ids):
+    """Give the stock held for these orders back to the slots it came from. Returns units released."""
+    if not order_ids:
+        return 0
+    placeholders = ', '.join(['%s'] * len(order_ids))
+    cursor.execute(
+        f"""
+        SELECT productId, slot, SUM(quantity) FROM inventory_reservations
+        WHERE orderId IN ({placeholders}) AND status IN ('held', 'committed')
+        GROUP BY productId, slot
+        ORDER BY productId, slot
+        """,
+        list(order_ids)
+    )
+    returned = _tuples(cursor.fetchall())
+    if not returned:
+        return 0
+    cases = ' '.join(['WHEN productId = %s AND slot = %s THEN %s'] * len(returned))
+    conditions = ' OR '.join(['(productId = %s AND slot = %s)'] * len(returned))
+    cursor.execute(
+        f'UPDATE inventory_slots SET available = available + CASE {cases} END WHERE {conditions}',
+        [value for entry in returned for value in entry] + [value for entry in returned for value in entry[:2]]
+    )
+    cursor.execute(
+        f"UPDATE inventory_reservations SET status = 'released' "
+        f"WHERE orderId IN ({placeholders}) AND status IN ('held', 'committed')",
+        list(order_ids)
+    )
+    return sum(int(quantity) for _, _, quantity in returned)
+
+
+def commit(cursor, order_ids):
+    """Stop the holds of these orders from expiring; the stock stays taken."""
+    if not order_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(order_ids))
+    cursor.execute(
+        f"UPDATE inventory_reservations SET status = 'committed' WHERE orderId IN ({placeholders}) AND status = 'held'",
+        list(order_ids)
+    )
+
+
+def record_status_changes(cursor, changes):
+    """Apply committed-with-the-caller status changes ({orderId, userId, from, to, total}) to the holds.
+
+    Cancelling before shipping gives the stock back; any other move out of
+    pending means the order is being fulfilled, so its hold no longer
+    expires. Cancelled orders are final (see STATUS_TRANSITIONS in the
+    order routes), so released stock is never needed again.
+    """
+    release(cursor, [change['orderId'] for change in changes
+                     if change['to'] == 'cancelled' and change['from'] not in SHIPPED_STATUSES])
+    commit(cursor, [change['orderId'] for change in changes
+                    if change['from'] == 'pending' and change['to'] != 'cancelled'])
+
+
+def set_stock(cursor, product_id, stock, slots=None):
+    """Set the units of a product available to sell, spread evenly over its slots.
+
+    None stops tracking the product (it can then be sold without limit).
+    Units held by open orders are not included in stock.
+    """
+    cursor.execute('SELECT slot FROM inventory_slots WHERE productId = %s ORDER BY slot FOR UPDATE', (product_id,))
+    existing = len(cursor.fetchall())
+    cursor.execute('DELETE FROM inventory_slots WHERE productId = %s', (product_id,))
+    if stock is None:
+        return
+    # Keep the slot count of a tracked product so releases find the slots their holds came from
+    slots = slots or existing or INVENTORY_SLOTS
+    share, extra = divmod(stock, slots)
+    cursor.executemany(
+        'INSERT INTO inventory_slots (productId, slot, available) VALUES (%s, %s, %s)',
+        [(product_id, slot, share + (1 if slot < extra else 0)) for slot in range(slots)]
+    )
+
+
+def adjust_stock(cursor, product_id, delta):
+    """Add delta units (negative to remove) to a tracked product; returns the new stock."""
+    cursor.execute('SELECT available FROM inventory_slots WHERE productId = %s ORDER BY slot FOR UPDATE', (product_id,))
+    slots = _tuples(cursor.fetchall())
+    if not slots:
+        raise ValueError('Stock is not tracked for this product; set stock first')
+    stock = sum(count for count, in slots) + delta
+    if stock < 0:
+        raise ValueError('Stock cannot be negative')
+    set_stock(cursor, product_id, stock)
+    return stock
+
+
+def get_stock(cursor, product_id):
+    cursor.execute('SELECT slot, available FROM inventory_slots WHERE productId = %s ORDER BY slot', (product_id,))
+    slots = _tuples(cursor.fetchall())
+    cursor.execute(
+        "SELECT COALESCE(SUM(quantity), 0) FROM inventory_reservations WHERE productId = %s AND status = 'held'",
+        (product_id,)
+    )
+    held = _tuples(cursor.fetchall())[0][0]
+    return {
+        'productId': product_id,
+        'tracked': bool(slots),
+        'available': sum(count for _, count in slots) if slots else None,
+        'held': int(held),
+        'slots': [count for _, count in slots],
+    }
+
+
+def expire_batch(now, batch_size=EXPIRY_BATCH_SIZE):
+    """Cancel one batch of pending orders whose holds expired before now, giving their stock back.
+
+    Returns (orders whose holds were due, status changes made).
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            """
+            SELECT DISTINCT orderId FROM inventory_reservations
+            WHERE status = 'held' AND expiresAt < %s
+            ORDER BY orderId
+            LIMIT %s
+            """,
+            (now, batch_size)
+        )
+        order_ids = [row['orderId'] for row in cursor.fetchall()]
+        if not order_ids:
+            conn.commit()
+            return 0, []
+
+        placeholders = ', '.join(['%s'] * len(order_ids))
+        cursor.execute(
+            f'SELECT orderId, userId, status, total FROM orders WHERE orderId IN ({placeholders}) FOR UPDATE',
+            order_ids
+        )
+        orders = {row['orderId']: row for row in cursor.fetchall()}
+        changes = [
+            {'orderId': order_id, 'userId': order['userId'], 'from': 'pending', 'to': 'cancelled',
+             'total': float(order['total'] or 0), 'reason': 'reservation_expired'}
+            for order_id, order in orders.items() if order['status'] == 'pending'
+        ]
+        cancelled = [change['orderId'] for change in changes]
+        if cancelled:
+            cursor.execute(
+                f"UPDATE orders SET status = 'cancelled' WHERE orderId IN ({', '.join(['%s'] * len(cancelled))})",
+                cancelled
+            )
+            order_summaries.record_status_changes(cursor, changes)
+            add_events(cursor, 'order.status_changed', [(change['orderId'], change) for change in changes])
+        # Holds of deleted or already cancelled orders go back too; orders being fulfilled keep theirs
+        release(cursor, cancelled + [order_id for order_id in order_ids
+                                     if order_id not in orders or orders[order_id]['status'] == 'cancelled'])
+        commit(cursor, [order_id for order_id, order in orders.items()
+                        if order['status'] not in ('pending', 'cancelled')])
+        conn.commit()
+        return len(order_ids), changes
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def expire_reservations(batch_size=EXPIRY_BATCH_SIZE, pause=EXPIRY_PAUSE_SECONDS):
+    """Cancel every pending order whose hold has expired, in batches. Returns the number cancelled."""
+    if not RESERVATION_TTL_MINUTES:
+        return 0
+    # Imported here: the routes import this module
+    from app.routes.orders import after_status_change
+
+    now = datetime.now()
+    cancelled = 0
+    while True:
+        due, changes = expire_batch(now, batch_size)
+        if not due:
+            break
+        if changes:
+            after_status_change(changes)
+            cancelled += len(changes)
+            logger.info(f"Cancelled {len(changes)} orders with expired stock reservations ({cancelled} so far)")
+        time.sleep(pause)
+    return cancelled
@@ -0,0 +1,97 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from app.db import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Finished orders older than this move from orders/order_items to the archive tables
+ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', '365'))
+ARCHIVE_BATCH_SIZE = 500
+# Pause between batches so the job never holds locks for long stretches
+ARCHIVE_PAUSE_SECONDS = 0.1
+# Only orders that can no longer change status are archived
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled')
+
+ORDER_COLUMNS = 'orderId, userId, total, shipping, payment, status, timestamp'
+ORDER_ITEM_COLUMNS = 'orderItemId, orderId, productId, quantity, price'
+
+
+def archive_horizon():
+    """Every archived order is older than this, so newer data only lives in orders."""
+    return datetime.now() - timedelta(days=ARCHIVE_AFTER_DAYS)
+
+
+def may_be_archived(date_from):
+    """Whether a query for orders at or after date_from (None = all time) can match archived rows."""
+    return date_from is None or date_from < archive_horizon()
+
+
+def archive_batch(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move one batch of finished orders placed before cutoff, with their items, in one transaction.
+
+    Returns the number of orders moved.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        status_placeholders = ', '.join(['%s'] * len(ARCHIVABLE_STATUSES))
+        cursor.execute(
+            f"""
+            SELECT orderId FROM orders
+            WHERE timestamp < %s AND status IN ({status_placeholders})
+            ORDER BY timestamp, orderId
+            LIMIT %s
+            FOR UPDATE
+            """,
+            (cutoff,) + ARCHIVABLE_STATUSES + (batch_size,)
+        )
+        order_ids = [row[0] for row in cursor.fetchall()]
+        if not order_ids:
+            conn.commit()
+            return 0
+
+        placeholders = ', '.join(['%s'] * len(order_ids))
+        cursor.execute(
+            f'INSERT INTO orders_archive ({ORDER_COLUMNS}) '
+            f'SELECT {ORDER_COLUMNS} FROM orders WHERE orderId IN ({placeholders})',
+            order_ids
+        )
+        cursor.execute(
+            f'INSERT INTO order_items_archive ({ORDER_ITEM_COLUMNS}) '
+            f'SELECT {ORDER_ITEM_COLUMNS} FROM order_items WHERE orderId IN ({placeholders})',
+            order_ids
+        )
+        cursor.execute(f'DELETE FROM order_items WHERE orderId IN ({placeholders})', order_ids)
+        # Finished orders' stock holds are settled (committed or released)
+        cursor.execute(f'DELETE FROM inventory_reservations WHERE orderId IN ({placeholders})', order_ids)
+        cursor.execute(f'DELETE FROM orders WHERE orderId IN ({placeholders})', order_ids)
+        conn.commit()
+        return len(order_ids)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def archive(older_than_days=None, batch_size=ARCHIVE_BATCH_SIZE, pause=ARCHIVE_PAUSE_SECONDS, max_batches=None):
+    """Archive finished orders older than older_than_days (default ARCHIVE_AFTER_DAYS) in batches.
+
+    Returns the number of orders moved.
+    """
+    days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    if days < ARCHIVE_AFTER_DAYS:
+        # Queries skip the archive for anything newer than ARCHIVE_AFTER_DAYS
+        raise ValueError(f'Orders newer than ORDER_ARCHIVE_AFTER_DAYS ({ARCHIVE_AFTER_DAYS}) cannot be archived')
+    cutoff = datetime.now() - timedelta(days=days)
+    moved = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(cutoff, batch_size)
+        if count == 0:
+            break
+        moved += count
+        batches += 1
+        logger.info(f"Archived {count} orders placed before {cutoff:%Y-%m-%d} ({moved} so far)")
+        time.sleep(pause)
+    return moved
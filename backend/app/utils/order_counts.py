@@ -0,0 +1,81 @@
+import threading
+import time
+
+# Per-status counts are reloaded from the database at most this often (seconds)
+STATUS_COUNTS_TTL = 300
+# Counts for other filter combinations are cached for a shorter period
+FILTER_COUNTS_TTL = 60
+MAX_FILTER_COUNTS = 256
+
+
+class OrderCounts:
+    """Approximate order totals for the staff order search.
+
+    Per-status counts are loaded with one grouped query, then kept current by
+    place_order and status changes. Counts for other filter combinations are
+    cached briefly by filter signature so paging never re-runs COUNT(*).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status_counts = None
+        self._loaded_at = 0.0
+        self._filter_counts = {}
+
+    def _load_status_counts(self, cursor):
+        cursor.execute('SELECT status, COUNT(*) AS total FROM orders GROUP BY status')
+        counts = {row['status']: int(row['total']) for row in cursor.fetchall()}
+        cursor.execute('SELECT status, COUNT(*) AS total FROM orders_archive GROUP BY status')
+        for row in cursor.fetchall():
+            counts[row['status']] = counts.get(row['status'], 0) + int(row['total'])
+        with self._lock:
+            self._status_counts = counts
+            self._loaded_at = time.time()
+
+    def status_total(self, cursor, statuses=None):
+        """Total orders in the given statuses (all statuses when None)."""
+        with self._lock:
+            stale = self._status_counts is None or time.time() - self._loaded_at > STATUS_COUNTS_TTL
+        if stale:
+            self._load_status_counts(cursor)
+        with self._lock:
+            if statuses is None:
+                return sum(self._status_counts.values())
+            return sum(self._status_counts.get(status, 0) for status in statuses)
+
+    def filtered_total(self, cursor, key, count_query, params):
+        """Cached COUNT(*) for a filter combination, re-run at most once per TTL."""
+        now = time.time()
+        with self._lock:
+            cached = self._filter_counts.get(key)
+            if cached and now - cached[1] <= FILTER_COUNTS_TTL:
+                return cached[0]
+        cursor.execute(count_query, params)
+        total = int(cursor.fetchone()['total'])
+        with self._lock:
+            if len(self._filter_counts) >= MAX_FILTER_COUNTS:
+                self._filter_counts.clear()
+            self._filter_counts[key] = (total, now)
+        return total
+
+    def record_new_order(self, status='pending'):
+        with self._lock:
+            if self._status_counts is not None:
+                self._status_counts[status] = self._status_counts.get(status, 0) + 1
+            self._filter_counts.clear()
+
+    def record_status_changes(self, changes):
+        """Apply a batch of {orderId, from, to} changes; unknown origins force a reload."""
+        with self._lock:
+            self._filter_counts.clear()
+            if self._status_counts is None:
+                return
+            for change in changes:
+                if change.get('from') is None:
+                    self._status_counts = None
+                    return
+                self._status_counts[change['from']] = self._status_counts.get(change['from'], 0) - 1
+                self._status_counts[change['to']] = self._status_counts.get(change['to'], 0) + 1
+
+
+order_counts = OrderCounts()
@@ -0,0 +1,317 @@
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# 'memory' delivers events to streams in the publishing process only;
+# 'shared' relays them through a file mapped by every worker on the host.
+# Under a pre-forking server (gunicorn, uWSGI) the default is 'shared': with
+# 'memory', a stream would miss every change handled by another worker.
+ORDER_EVENTS_BACKEND = os.getenv(
+    'ORDER_EVENTS_BACKEND',
+    'shared' if any(server in sys.modules for server in ('gunicorn', 'uwsgi')) else 'memory'
+)
+ORDER_EVENTS_FILE = os.getenv(
+    'ORDER_EVENTS_FILE',
+    os.path.join(tempfile.gettempdir(), 'awe_store_order_events.bin')
+)
+# Events kept for clients resuming with Last-Event-ID; older ids get a reset
+EVENT_HISTORY = int(os.getenv('ORDER_EVENTS_HISTORY', '1024'))
+# Open streams per worker process; each holds a server thread while connected
+MAX_STREAMS = int(os.getenv('ORDER_EVENTS_MAX_STREAMS', '100'))
+# A comment line is sent after this long without an event so proxies keep the connection
+HEARTBEAT_SECONDS = 15.0
+# Streams are closed after this long; EventSource reconnects with its Last-Event-ID
+MAX_STREAM_SECONDS = 300.0
+# Reconnect delay suggested to EventSource clients
+RETRY_MS = 3000
+# How often each worker copies new events out of the shared file
+SHARED_POLL_SECONDS = 0.25
+
+_HEADER = struct.Struct('<8sdQ')  # magic, epoch (random per file), last sequence number
+_SLOT = struct.Struct('<QI')      # sequence number, payload length
+_MAGIC = b'AWEEVT01'
+SLOT_BYTES = 512
+
+
+def _new_epoch():
+    return float(int.from_bytes(os.urandom(6), 'big'))
+
+
+class EventHub:
+    """Recent order events of this process, numbered and waited on by its streams.
+
+    Sequence numbers only grow within an epoch; a client resuming from another
+    epoch (a restart, or a recreated shared file) or from an event that has
+    already left the history cannot be caught up and is told to reload.
+    """
+
+    def __init__(self, history=EVENT_HISTORY, epoch=None, last_seq=0):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=history)
+        self.epoch = _new_epoch() if epoch is None else epoch
+        self.last_seq = last_seq
+        # Events after this sequence number are all in _events (or still to come)
+        self._floor = last_seq
+
+    def add(self, seq, event):
+        with self._cond:
+            if seq <= self.last_seq:
+                return
+            if seq != self.last_seq + 1:
+                # The shared file was overwritten before this process copied it
+                self._events.clear()
+                self._floor = seq - 1
+            self._events.append((seq, event))
+            self.last_seq = seq
+            if len(self._events) == self._events.maxlen:
+                self._floor = self._events[0][0] - 1
+            self._cond.notify_all()
+
+    def publish(self, events):
+        with self._cond:
+            for event in events:
+                self.add(self.last_seq + 1, event)
+
+    def since(self, seq, timeout):
+        """Events after seq, waiting up to timeout for one; returns (events, lost)."""
+        with self._cond:
+            if seq == self.last_seq:
+                self._cond.wait(timeout)
+            if seq < self._floor or seq > self.last_seq:
+                return [], True
+            return [(event_seq, event) for event_seq, event in self._events if event_seq > seq], False
+
+    def event_id(self, seq):
+        return f'{int(self.epoch):x}-{seq}'
+
+    def parse_event_id(self, value):
+        """The sequence number of a Last-Event-ID from this epoch, else None."""
+        try:
+            epoch, seq = (value or '').split('-')
+            if int(epoch, 16) != int(self.epoch):
+                return None
+            return int(seq)
+        except ValueError:
+            return None
+
+
+class SharedEventLog:
+    """A ring of recent events in a memory-mapped file, appended to by every worker.
+
+    Each worker runs a thread that copies new entries into its own EventHub,
+    so a status change handled by one worker reaches streams held by the others.
+    """
+
+    def __init__(self, path=ORDER_EVENTS_FILE, slots=EVENT_HISTORY):
+        self.slots = slots
+        size = _HEADER.size + slots * SLOT_BYTES
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            header = os.pread(fd, _HEADER.size, 0)
+            if os.fstat(fd).st_size != size or not header.startswith(_MAGIC):
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+                os.pwrite(fd, _HEADER.pack(_MAGIC, _new_epoch(), 0), 0)
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        _, self.epoch, _ = _HEADER.unpack_from(self._map, 0)
+        self._lock_file = open(path + '.lock', 'a')
+        self._thread_lock = threading.Lock()
+
+    def _offset(self, seq):
+        return _HEADER.size + (seq % self.slots) * SLOT_BYTES
+
+    def append(self, events):
+        payloads = []
+        for event in events:
+            payload = json.dumps(event, separators=(',', ':')).encode('utf-8')
+            if len(payload) > SLOT_BYTES - _SLOT.size:
+                logger.warning(f"Dropping {event.get('type')} event of {len(payload)} bytes from the shared log")
+                continue
+            payloads.append(payload)
+        with self._thread_lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                _, _, seq = _HEADER.unpack_from(self._map, 0)
+                for payload in payloads:
+                    seq += 1
+                    offset = self._offset(seq)
+                    _SLOT.pack_into(self._map, offset, seq, len(payload))
+                    self._map[offset + _SLOT.size:offset + _SLOT.size + len(payload)] = payload
+                _HEADER.pack_into(self._map, 0, _MAGIC, self.epoch, seq)
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def last_seq(self):
+        return _HEADER.unpack_from(self._map, 0)[2]
+
+    def read_after(self, seq):
+        """[(seq, event)] still in the ring after seq, oldest first."""
+        with self._thread_lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_SH)
+            try:
+                last = self.last_seq()
+                events = []
+                for event_seq in range(max(seq, last - self.slots) + 1, last + 1):
+                    offset = self._offset(event_seq)
+                    stored_seq, length = _SLOT.unpack_from(self._map, offset)
+                    if stored_seq == event_seq:
+                        events.append((event_seq, json.loads(self._map[offset + _SLOT.size:offset + _SLOT.size + length])))
+                return events
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+
+class OrderEvents:
+    """Publishes order events to this process's streams, through the shared log when configured."""
+
+    def __init__(self, backend=ORDER_EVENTS_BACKEND):
+        self._log = SharedEventLog() if backend == 'shared' else None
+        if self._log is None:
+            self.hub = EventHub()
+        else:
+            # Start from the ring's contents so clients resuming on this worker are caught up
+            self.hub = EventHub(epoch=self._log.epoch, last_seq=max(self._log.last_seq() - self._log.slots, 0))
+            self._sync()
+            threading.Thread(target=self._poll, name='order-events-relay', daemon=True).start()
+        self.streams = threading.BoundedSemaphore(MAX_STREAMS)
+        self._stats_lock = threading.Lock()
+        self._stats = {'published': 0, 'streamsOpened': 0, 'rejected': 0, 'resets': 0}
+
+    def _sync(self):
+        for seq, event in self._log.read_after(self.hub.last_seq):
+            self.hub.add(seq, event)
+
+    def _poll(self):
+        while True:
+            time.sleep(SHARED_POLL_SECONDS)
+            try:
+                if self._log.last_seq() != self.hub.last_seq:
+                    self._sync()
+            except Exception as e:
+                logger.error(f"Order event relay failed: {str(e)}")
+
+    def publish(self, events):
+        if not events:
+            return
+        now = time.time()
+        events = [dict(event, at=now) for event in events]
+        try:
+            if self._log is None:
+                self.hub.publish(events)
+            else:
+                self._log.append(events)
+                self._sync()
+            with self._stats_lock:
+                self._stats['published'] += len(events)
+        except Exception as e:
+            # Streams are a convenience: a failure here must not fail the request that changed the order
+            logger.error(f"Failed to publish {len(events)} order event(s): {str(e)}")
+
+    def incr(self, stat):
+        with self._stats_lock:
+            self._stats[stat] += 1
+
+    def snapshot(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['backend'] = 'shared' if self._log is not None else 'memory'
+        stats['openStreams'] = MAX_STREAMS - self.streams._value
+        stats['maxStreams'] = MAX_STREAMS
+        stats['lastEventId'] = self.hub.event_id(self.hub.last_seq)
+        return stats
+
+
+_order_events = None
+_order_events_lock = threading.Lock()
+
+
+def order_events():
+    global _order_events
+    if _order_events is None:
+        with _order_events_lock:
+            if _order_events is None:
+                _order_events = OrderEvents()
+    return _order_events
+
+
+def _after_fork_in_child():
+    # The relay thread and the stream semaphore don't survive a fork
+    global _order_events, _order_events_lock
+    _order_events = None
+    _order_events_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def publish_status_changes(changes):
+    order_events().publish([
+        {'type': 'order.status_changed', 'orderId': change['orderId'], 'userId': change['userId'],
+         'from': change['from'], 'status': change['to']}
+        for change in changes
+    ])
+
+
+def publish_order_placed(order_id, user_id, total, item_count):
+    order_events().publish([
+        {'type': 'order.placed', 'orderId': order_id, 'userId': user_id, 'status': 'pending',
+         'total': float(total), 'itemCount': item_count}
+    ])
+
+
+def _format(event_id, event_type, data):
+    return f'id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+def stream(last_event_id, user_id=None, max_seconds=None):
+    """Yield SSE frames for one client: everything, or only user_id's orders.
+
+    Resumes after last_event_id when the history still covers it; otherwise
+    the first frame is a `reset` event telling the client to reload its orders.
+    """
+    events = order_events()
+    hub = events.hub
+    yield f'retry: {RETRY_MS}\n\n'
+
+    seq = hub.parse_event_id(last_event_id) if last_event_id else hub.last_seq
+    if seq is None:
+        seq = hub.last_seq
+        events.incr('resets')
+        yield _format(hub.event_id(seq), 'reset', {})
+
+    deadline = time.monotonic() + (MAX_STREAM_SECONDS if max_seconds is None else max_seconds)
+    last_sent = time.monotonic()
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        batch, lost = hub.since(seq, min(HEARTBEAT_SECONDS, remaining))
+        if lost:
+            seq = hub.last_seq
+            events.incr('resets')
+            last_sent = time.monotonic()
+            yield _format(hub.event_id(seq), 'reset', {})
+            continue
+        for event_seq, event in batch:
+            seq = event_seq
+            if user_id is not None and str(event['userId']) != str(user_id):
+                continue
+            last_sent = time.monotonic()
+            yield _format(hub.event_id(event_seq), event['type'], event)
+        if time.monotonic() - last_sent >= HEARTBEAT_SECONDS:
+            last_sent = time.monotonic()
+            yield ': heartbeat\n\n'
@@ -0,0 +1,162 @@
+import logging
+from datetime import datetime
+from decimal import Decimal
+from app.db import dialect, get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Users per rebuild batch
+REBUILD_BATCH_SIZE = 500
+
+_COLUMNS = ['userId', 'orderCount', 'totalSpent', 'itemsPurchased', 'lastOrderId', 'lastOrderStatus', 'lastOrderAt']
+
+_UPSERT = dialect.upsert('user_order_summaries', _COLUMNS, ['userId'], {
+    'orderCount': '{orderCount}',
+    'totalSpent': '{totalSpent}',
+    'itemsPurchased': '{itemsPurchased}',
+    'lastOrderId': '{lastOrderId}',
+    'lastOrderStatus': '{lastOrderStatus}',
+    'lastOrderAt': '{lastOrderAt}',
+})
+
+_RECORD_ORDER = dialect.upsert('user_order_summaries', _COLUMNS, ['userId'], {
+    'orderCount': 'orderCount + 1',
+    'totalSpent': 'totalSpent + {totalSpent}',
+    'itemsPurchased': 'itemsPurchased + {itemsPurchased}',
+    'lastOrderId': '{lastOrderId}',
+    'lastOrderStatus': '{lastOrderStatus}',
+    'lastOrderAt': '{lastOrderAt}',
+})
+
+
+def record_order(cursor, user_id, order_id, total, item_count, placed_at=None):
+    """Fold a new order into the user's summary inside the checkout transaction."""
+    cursor.execute(
+        _RECORD_ORDER,
+        (user_id, 1, total, item_count, order_id, 'pending', placed_at or datetime.now())
+    )
+
+
+def record_status_changes(cursor, changes):
+    """Apply committed-with-the-caller status changes ({orderId, userId, from, to, total}).
+
+    Cancelled orders stop counting towards totalSpent and itemsPurchased;
+    un-cancelling adds them back.
+    """
+    by_target = {}
+    flips = []
+    for change in changes:
+        by_target.setdefault(change['to'], []).append(change['orderId'])
+        if (change['to'] == 'cancelled') != (change['from'] == 'cancelled'):
+            flips.append(change)
+
+    deltas = {}
+    if flips:
+        placeholders = ', '.join(['%s'] * len(flips))
+        cursor.execute(
+            f'SELECT orderId, SUM(quantity) FROM order_items WHERE orderId IN ({placeholders}) GROUP BY orderId',
+            [change['orderId'] for change in flips]
+        )
+        # The caller's cursor may be a dictionary cursor
+        quantities = {row[0]: row[1] for row in
+                      (tuple(row.values()) if isinstance(row, dict) else row for row in cursor.fetchall())}
+        for change in flips:
+            sign = -1 if change['to'] == 'cancelled' else 1
+            spent, items = deltas.get(change['userId'], (Decimal('0'), 0))
+            deltas[change['userId']] = (
+                spent + sign * Decimal(str(change['total'])),
+                items + sign * int(quantities.get(change['orderId']) or 0),
+            )
+
+    # lastOrderId is unique per user, so one UPDATE per target status covers the batch
+    for status, order_ids in by_target.items():
+        placeholders = ', '.join(['%s'] * len(order_ids))
+        cursor.execute(
+            f'UPDATE user_order_summaries SET lastOrderStatus = %s WHERE lastOrderId IN ({placeholders})',
+            [status] + order_ids
+        )
+    if deltas:
+        cursor.executemany(
+            'UPDATE user_order_summaries SET totalSpent = totalSpent + %s, itemsPurchased = itemsPurchased + %s '
+            'WHERE userId = %s',
+            [(spent, items, user_id) for user_id, (spent, items) in deltas.items()]
+        )
+
+
+def rebuild(user_id=None, batch_size=REBUILD_BATCH_SIZE):
+    """Recompute summaries from orders/order_items and their archives, one user-id range per transaction.
+
+    Returns the number of summaries written.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    if user_id is not None:
+        low = high = int(user_id)
+    else:
+        cursor.execute(
+            'SELECT MIN(userId) AS low, MAX(userId) AS high FROM '
+            '(SELECT userId FROM orders UNION ALL SELECT userId FROM orders_archive) AS all_orders'
+        )
+        bounds = cursor.fetchone()
+        if bounds['low'] is None:
+            cursor.close()
+            conn.close()
+            return 0
+        low, high = bounds['low'], bounds['high']
+
+    written = 0
+    start = low
+    while start <= high:
+        end = min(start + batch_size - 1, high)
+        cursor.execute(
+            """
+            SELECT a.userId, a.orderCount, a.totalSpent, a.itemsPurchased,
+                   l.orderId AS lastOrderId, l.status AS lastOrderStatus, l.timestamp AS lastOrderAt
+            FROM (
+                SELECT o.userId,
+                       COUNT(*) AS orderCount,
+                       COALESCE(SUM(CASE WHEN o.status <> 'cancelled' THEN o.total ELSE 0 END), 0) AS totalSpent,
+                       COALESCE(SUM(CASE WHEN o.status <> 'cancelled' THEN oi.quantity ELSE 0 END), 0) AS itemsPurchased,
+                       MAX(o.orderId) AS lastOrderId
+                FROM (
+                    SELECT orderId, userId, total, status FROM orders WHERE userId BETWEEN %s AND %s
+                    UNION ALL
+                    SELECT orderId, userId, total, status FROM orders_archive WHERE userId BETWEEN %s AND %s
+                ) o
+                LEFT JOIN (
+                    SELECT i.orderId, SUM(i.quantity) AS quantity
+                    FROM order_items i JOIN orders bo ON bo.orderId = i.orderId
+                    WHERE bo.userId BETWEEN %s AND %s
+                    GROUP BY i.orderId
+                    UNION ALL
+                    SELECT i.orderId, SUM(i.quantity) AS quantity
+                    FROM order_items_archive i JOIN orders_archive bo ON bo.orderId = i.orderId
+                    WHERE bo.userId BETWEEN %s AND %s
+                    GROUP BY i.orderId
+                ) oi ON oi.orderId = o.orderId
+                GROUP BY o.userId
+            ) a
+            JOIN (
+                SELECT orderId, status, timestamp FROM orders WHERE userId BETWEEN %s AND %s
+                UNION ALL
+                SELECT orderId, status, timestamp FROM orders_archive WHERE userId BETWEEN %s AND %s
+            ) l ON l.orderId = a.lastOrderId
+            """,
+            # Every subquery is limited to the batch's users, so each batch reads only their orders and items
+            (start, end) * 6
+        )
+        rows = cursor.fetchall()
+        if rows:
+            cursor.executemany(_UPSERT, [
+                (row['userId'], row['orderCount'], row['totalSpent'], row['itemsPurchased'],
+                 row['lastOrderId'], row['lastOrderStatus'], row['lastOrderAt'])
+                for row in rows
+            ])
+        conn.commit()
+        written += len(rows)
+        logger.info(f"Rebuilt order summaries for users {start}-{end} ({len(rows)} users)")
+        start = end + 1
+
+    cursor.close()
+    conn.close()
+    return written
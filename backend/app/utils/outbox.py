@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from app.db import dialect, get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# How long a worker owns a claimed batch before another worker may retry it
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 8
+# Retry delay doubles per attempt: 5s, 10s, 20s, ... capped at one hour
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 3600
+# Delivered events are deleted once processed this long ago (0 = keep them); dead ones are kept
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', '7'))
+PURGE_BATCH_SIZE = 1000
+# Pause between purge batches so the job never holds locks for long stretches
+PURGE_PAUSE_SECONDS = 0.1
+
+_handlers = {}
+
+
+def add_event(cursor, event_type, aggregate_id, payload):
+    """Queue an event using the caller's cursor so it commits with the caller's transaction."""
+    add_events(cursor, event_type, [(aggregate_id, payload)])
+
+
+def add_events(cursor, event_type, events):
+    """Queue many (aggregate_id, payload) events of one type with a single multi-row INSERT."""
+    if not events:
+        return
+    now = datetime.now()
+    cursor.executemany(
+        'INSERT INTO outbox_events (eventType, aggregateId, payload, availableAt) VALUES (%s, %s, %s, %s)',
+        [(event_type, aggregate_id, json.dumps(payload), now) for aggregate_id, payload in events]
+    )
+
+
+def handler(event_type):
+    """Register fn(events) for an event type; it receives a list of event dicts per batch.
+
+    Delivery is at-least-once, so handlers must tolerate seeing an event twice.
+    """
+    def register(fn):
+        _handlers.setdefault(event_type, []).append(fn)
+        return fn
+    return register
+
+
+def _retry_delay(attempts):
+    return min(RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)), RETRY_MAX_SECONDS)
+
+
+def claim_batch(batch_size, worker_id):
+    """Lease up to batch_size due events to this worker and return them oldest first."""
+    now = datetime.now()
+    conn = get_db_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            dialect.update_limited(
+                'outbox_events',
+                'lockedBy = %s, lockedUntil = %s',
+                "status = 'pending' AND availableAt <= %s AND (lockedUntil IS NULL OR lockedUntil < %s)",
+                'eventId'
+            ),
+            (worker_id, now + timedelta(seconds=LEASE_SECONDS), now, now, batch_size)
+        )
+        conn.commit()
+        cursor.execute(
+            """
+            SELECT eventId, eventType, aggregateId, payload, attempts, createdAt
+            FROM outbox_events
+            WHERE lockedBy = %s AND status = 'pending'
+            ORDER BY eventId
+            """,
+            (worker_id,)
+        )
+        events = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    for event in events:
+        if isinstance(event['payload'], (str, bytes, bytearray)):
+            event['payload'] = json.loads(event['payload'])
+    return events
+
+
+def _finish(done_ids, failures):
+    """Mark delivered events done and reschedule (or dead-letter) failed ones."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        if done_ids:
+            placeholders = ', '.join(['%s'] * len(done_ids))
+            cursor.execute(
+                f"""
+                UPDATE outbox_events
+                SET status = 'done', processedAt = %s, lockedBy = NULL, lockedUntil = NULL
+                WHERE eventId IN ({placeholders})
+                """,
+                [datetime.now()] + list(done_ids)
+            )
+        for event, error in failures:
+            attempts = event['attempts'] + 1
+            status = 'dead' if attempts >= MAX_ATTEMPTS else 'pending'
+            cursor.execute(
+                """
+                UPDATE outbox_events
+                SET status = %s, attempts = %s, lastError = %s, availableAt = %s,
+                    lockedBy = NULL, lockedUntil = NULL
+                WHERE eventId = %s
+                """,
+                (status, attempts, error[:2000], datetime.now() + timedelta(seconds=_retry_delay(attempts)),
+                 event['eventId'])
+            )
+            if status == 'dead':
+                logger.error(f"Outbox event {event['eventId']} ({event['eventType']}) gave up after {attempts} attempts: {error}")
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def process_batch(batch_size=100, worker_id=None):
+    """Claim, dispatch and settle one batch. Returns the number of events claimed."""
+    worker_id = worker_id or default_worker_id()
+    events = claim_batch(batch_size, worker_id)
+    if not events:
+        return 0
+
+    by_type = {}
+    for event in events:
+        by_type.setdefault(event['eventType'], []).append(event)
+
+    done_ids = []
+    failures = []
+    for event_type, typed_events in by_type.items():
+        try:
+            for fn in _handlers.get(event_type, []):
+                fn(typed_events)
+            done_ids.extend(event['eventId'] for event in typed_events)
+        except Exception as e:
+            logger.warning(f"Handler for {event_type} failed on {len(typed_events)} event(s): {str(e)}")
+            failures.extend((event, str(e)) for event in typed_events)
+
+    _finish(done_ids, failures)
+    logger.debug(f"Outbox batch: {len(done_ids)} delivered, {len(failures)} failed")
+    return len(events)
+
+
+def purge_batch(cutoff, batch_size=PURGE_BATCH_SIZE):
+    """Delete up to batch_size events delivered before cutoff, oldest first. Returns rows deleted."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT eventId FROM outbox_events
+            WHERE status = 'done' AND processedAt < %s
+            ORDER BY processedAt
+            LIMIT %s
+            """,
+            (cutoff, batch_size)
+        )
+        event_ids = [row[0] for row in cursor.fetchall()]
+        if not event_ids:
+            conn.commit()
+            return 0
+        placeholders = ', '.join(['%s'] * len(event_ids))
+        cursor.execute(
+            f"DELETE FROM outbox_events WHERE eventId IN ({placeholders}) AND status = 'done'",
+            event_ids
+        )
+        deleted = cursor.rowcount
+        conn.commit()
+        return deleted
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def purge_done(older_than_days=None, batch_size=PURGE_BATCH_SIZE, pause=PURGE_PAUSE_SECONDS):
+    """Delete delivered events older than older_than_days (default OUTBOX_RETENTION_DAYS) in batches.
+
+    Returns the number of rows deleted.
+    """
+    days = OUTBOX_RETENTION_DAYS if older_than_days is None else older_than_days
+    if not days:
+        return 0
+    cutoff = datetime.now() - timedelta(days=days)
+    deleted = 0
+    while True:
+        count = purge_batch(cutoff, batch_size)
+        deleted += count
+        if count < batch_size:
+            break
+        time.sleep(pause)
+    if deleted:
+        logger.info(f"Purged {deleted} delivered outbox events processed before {cutoff:%Y-%m-%d}")
+    return deleted
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
@@ -0,0 +1,60 @@
+import os
+import threading
+from collections import OrderedDict
+
+PRODUCT_CACHE_MAX_ENTRIES = int(os.getenv('PRODUCT_CACHE_MAX_ENTRIES', '10000'))
+
+
+class ProductCache:
+    """Per-process LRU of converted product rows for id lookups.
+
+    The whole cache belongs to one catalog version and is dropped as soon as a
+    lookup arrives under a newer one.
+    """
+
+    def __init__(self, max_entries=PRODUCT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get_many(self, product_ids, catalog_version):
+        """Return ({productId: product} for cached ids, [ids still to load])."""
+        found = {}
+        missing = []
+        with self._lock:
+            if catalog_version != self._version:
+                self._entries.clear()
+                self._version = catalog_version
+            for product_id in product_ids:
+                product = self._entries.get(product_id)
+                if product is None:
+                    missing.append(product_id)
+                else:
+                    self._entries.move_to_end(product_id)
+                    found[product_id] = product
+            self._stats['hits'] += len(found)
+            self._stats['misses'] += len(missing)
+        return found, missing
+
+    def put_many(self, products, catalog_version):
+        with self._lock:
+            if catalog_version != self._version:
+                return
+            for product in products:
+                self._entries[product['productId']] = product
+                self._entries.move_to_end(product['productId'])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hitRate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+product_cache = ProductCache()
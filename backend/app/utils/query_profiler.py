@@ -0,0 +1,236 @@
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from flask import g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+QUERY_PROFILING_ENABLED = os.getenv('QUERY_PROFILING_ENABLED', 'true').lower() != 'false'
+# Statements slower than this get their EXPLAIN plan captured
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv('SLOW_QUERY_BUFFER_SIZE', '100'))
+# Distinct normalized statements tracked; new ones beyond this are counted under 'other'
+MAX_STATEMENTS = 1000
+
+_EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s|\?')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(statement):
+    """Collapse literals, placeholders and IN lists so one query shape is one entry.
+
+    "... WHERE productId IN (%s, %s, %s)" and the same query with 40 ids both
+    become "... WHERE productId IN (...)".
+    """
+    if isinstance(statement, (bytes, bytearray)):
+        statement = statement.decode('utf-8', 'replace')
+    statement = _STRING.sub('?', statement)
+    statement = _PLACEHOLDER.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _IN_LIST.sub('(...)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+
+class QueryProfile:
+    """Aggregate timings per normalized statement plus a ring buffer of slow executions."""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS, buffer_size=SLOW_QUERY_BUFFER_SIZE):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._statements = {}
+        self._slow = deque(maxlen=buffer_size)
+
+    def record(self, statement, elapsed, rows, explain=None, per_request=1):
+        """Add one execution; explain() is called for the plan when it was slow."""
+        normalized = normalize(statement)
+        elapsed_ms = elapsed * 1000
+        route = request.endpoint if has_request_context() else None
+        with self._lock:
+            key = normalized if normalized in self._statements or len(self._statements) < MAX_STATEMENTS else 'other'
+            stats = self._statements.setdefault(key, {
+                'statement': key, 'calls': 0, 'totalMs': 0.0, 'maxMs': 0.0,
+                'rows': 0, 'maxPerRequest': 0, 'slowCalls': 0, 'routes': {},
+            })
+            stats['calls'] += 1
+            stats['totalMs'] += elapsed_ms
+            stats['maxMs'] = max(stats['maxMs'], elapsed_ms)
+            stats['rows'] += max(rows or 0, 0)
+            # Many executions of one shape in a single request usually means N+1
+            stats['maxPerRequest'] = max(stats['maxPerRequest'], per_request)
+            if route:
+                stats['routes'][route] = stats['routes'].get(route, 0) + 1
+            slow = elapsed_ms >= self.slow_ms
+            if slow:
+                stats['slowCalls'] += 1
+        if not slow:
+            return
+
+        plan = None
+        if explain and normalized.upper().startswith(_EXPLAINABLE):
+            try:
+                plan = explain()
+            except Exception as e:
+                plan = [{'error': str(e)}]
+        entry = {
+            'statement': normalized,
+            'durationMs': round(elapsed_ms, 3),
+            'rows': rows,
+            'route': route,
+            'requestId': g.get('request_id') if has_request_context() else None,
+            'at': time.time(),
+            'explain': plan,
+        }
+        with self._lock:
+            self._slow.append(entry)
+        logger.warning(
+            f"Slow query ({elapsed_ms:.1f} ms, {rows} rows, route {route}, request {entry['requestId']}): "
+            f"{normalized} | EXPLAIN {plan}"
+        )
+
+    def top(self, limit=20, sort='totalMs'):
+        with self._lock:
+            statements = [dict(stats, routes=dict(stats['routes'])) for stats in self._statements.values()]
+        for stats in statements:
+            stats['avgMs'] = stats['totalMs'] / stats['calls'] if stats['calls'] else 0.0
+        statements.sort(key=lambda stats: stats[sort], reverse=True)
+        return statements[:limit]
+
+    def slow_queries(self):
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._slow.clear()
+
+
+profile = QueryProfile()
+
+
+def count_in_request(normalized):
+    """How many times this statement shape has run in the current request, including now."""
+    if not has_request_context():
+        return 1
+    counts = g.setdefault('query_counts', {})
+    counts[normalized] = counts.get(normalized, 0) + 1
+    return counts[normalized]
+
+
+def explain(connection, statement, params):
+    """EXPLAIN rows for a statement, run on a separate cursor of the same connection."""
+    prefix = getattr(connection, 'explain_prefix', 'EXPLAIN')
+    cursor = connection.cursor(dictionary=True)
+    try:
+        cursor.execute(f'{prefix} {statement}', params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def record(statement, elapsed, rows, explain=None):
+    if not QUERY_PROFILING_ENABLED:
+        return
+    profile.record(statement, elapsed, rows, explain, count_in_request(normalize(statement)))
+
+
+class ProfiledCursor:
+    """Cursor wrapper that times each statement, including fetching its rows.
+
+    A statement is recorded once its rows are fetched, the next statement
+    starts, or the cursor closes, so unbuffered row counts are known.
+    """
+
+    def __init__(self, cursor, explain_connection):
+        self._cursor = cursor
+        self._explain_connection = explain_connection
+        self._pending = None
+
+    def __getattr__(self, attr):
+        return getattr(self._cursor, attr)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _flush(self):
+        if self._pending is None:
+            return
+        statement, params, elapsed, rows = self._pending
+        self._pending = None
+        if rows is None:
+            rows = self._cursor.rowcount
+        record(statement, elapsed, rows, lambda: explain(self._explain_connection, statement, params))
+
+    def execute(self, operation, params=(), *args, **kwargs):
+        self._flush()
+        start = time.perf_counter()
+        result = self._cursor.execute(operation, params, *args, **kwargs)
+        self._pending = [operation, params, time.perf_counter() - start, None]
+        with_rows = getattr(self._cursor, 'with_rows', None)
+        if with_rows is None:
+            with_rows = self._cursor.description is not None
+        if not with_rows:
+            self._flush()
+        return result
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._flush()
+        start = time.perf_counter()
+        result = self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        # A batch has no single parameter set to EXPLAIN with
+        record(operation, time.perf_counter() - start, self._cursor.rowcount)
+        return result
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        result = getattr(self._cursor, method)(*args)
+        if self._pending is not None:
+            self._pending[2] += time.perf_counter() - start
+        return result
+
+    def fetchone(self):
+        row = self._fetch('fetchone')
+        if row is None:
+            self._flush()
+        return row
+
+    def fetchmany(self, size=1):
+        return self._fetch('fetchmany', size)
+
+    def fetchall(self):
+        rows = self._fetch('fetchall')
+        if self._pending is not None:
+            self._pending[3] = self._cursor.rowcount if self._cursor.rowcount >= 0 else len(rows)
+        self._flush()
+        return rows
+
+    def close(self):
+        # Close first so any unread rows are consumed before EXPLAIN runs
+        result = self._cursor.close()
+        self._flush()
+        return result
+
+
+def before_request():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+
+def after_request(response):
+    request_id = g.get('request_id')
+    if request_id:
+        response.headers['X-Request-ID'] = request_id
+    return response
+
+
+def init_app(app):
+    app.before_request(before_request)
+    app.after_request(after_request)
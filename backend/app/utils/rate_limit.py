@@ -0,0 +1,223 @@
+import fcntl
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+from flask import g, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITS_ENABLED = os.getenv('RATE_LIMITS_ENABLED', 'true').lower() != 'false'
+# 'memory' keeps buckets per process; 'shared' keeps them in a file mapped by every worker
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_STATE_FILE = os.getenv(
+    'RATE_LIMIT_STATE_FILE',
+    os.path.join(tempfile.gettempdir(), 'awe_store_rate_limits.bin')
+)
+SHARED_SLOTS = 65536
+# Buckets kept per process by the memory backend; the least recently used are dropped beyond this
+MEMORY_BUCKETS = 100000
+
+# rate/burst: per-client token bucket (tokens per second, bucket size), keyed by ip, user or staff.
+# route_rate/route_burst: one bucket shared by every client of the class.
+# concurrency: requests of the class allowed in flight per worker process.
+# ip_rate/ip_burst: for user or staff keys, which the client sends and could change on every
+# request, the per-IP bucket also applied (defaults to rate/burst). Keep it looser than the
+# per-id limit so customers behind one NAT are not throttled together.
+Limit = namedtuple('Limit', 'key rate burst route_rate route_burst concurrency ip_rate ip_burst',
+                   defaults=(None, None))
+
+LIMITS = {
+    'auth': Limit('ip', 0.2, 5, 20, 40, 4),            # bcrypt on every attempt
+    'search': Limit('ip', 5, 20, 200, 400, 8),         # LIKE scan over products
+    'checkout': Limit('user', 0.5, 5, 50, 100, 8, ip_rate=2, ip_burst=20),
+    'staff_orders': Limit('staff', 2, 10, 20, 40, 4, ip_rate=5, ip_burst=25),  # order search and bulk updates
+}
+
+ENDPOINT_CLASSES = {
+    'signup': 'auth',
+    'login': 'auth',
+    'staff_login': 'auth',
+    'search_products': 'search',
+    'place_order': 'checkout',
+    'get_all_orders': 'staff_orders',
+    'bulk_update_order_status': 'staff_orders',
+}
+
+
+class MemoryBuckets:
+    """Token buckets for a single process, dropping the least recently used beyond max_buckets."""
+
+    def __init__(self, max_buckets=MEMORY_BUCKETS):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+        self.max_buckets = max_buckets
+
+    def take(self, key, rate, burst):
+        """Take one token; returns seconds until one is available (0 when allowed)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / rate
+
+
+class SharedBuckets:
+    """Token buckets in a memory-mapped file so every worker enforces the same limits.
+
+    Keys hash into fixed slots; when two keys collide the newer one resets the
+    slot, which can only make a limit more lenient, never stricter.
+    """
+
+    _SLOT = struct.Struct('<Qdd')  # key hash, tokens, updated (wall clock)
+
+    def __init__(self, path=RATE_LIMIT_STATE_FILE, slots=SHARED_SLOTS):
+        self.slots = slots
+        size = slots * self._SLOT.size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._lock_file = open(path + '.lock', 'a')
+        self._thread_lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        key_hash = zlib.crc32(key.encode('utf-8')) + 1
+        offset = (key_hash % self.slots) * self._SLOT.size
+        now = time.time()
+        with self._thread_lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                stored_hash, tokens, updated = self._SLOT.unpack_from(self._map, offset)
+                if stored_hash != key_hash:
+                    tokens, updated = burst, now
+                tokens = min(burst, tokens + max(now - updated, 0) * rate)
+                allowed = tokens >= 1
+                self._SLOT.pack_into(self._map, offset, key_hash, tokens - 1 if allowed else tokens, now)
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        return 0.0 if allowed else (1 - tokens) / rate
+
+
+class AdmissionMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def incr(self, endpoint_class, outcome):
+        with self._lock:
+            stats = self._counts.setdefault(endpoint_class, {'admitted': 0, 'rate_limited': 0, 'shed': 0})
+            stats[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {name: dict(stats) for name, stats in self._counts.items()}
+        for name, semaphore in _in_flight.items():
+            result.setdefault(name, {'admitted': 0, 'rate_limited': 0, 'shed': 0})
+            result[name]['inFlight'] = LIMITS[name].concurrency - semaphore._value
+        return result
+
+
+_buckets = None
+_in_flight = {name: threading.BoundedSemaphore(limit.concurrency) for name, limit in LIMITS.items()}
+metrics = AdmissionMetrics()
+
+
+def buckets():
+    global _buckets
+    if _buckets is None:
+        _buckets = SharedBuckets() if RATE_LIMIT_BACKEND == 'shared' else MemoryBuckets()
+    return _buckets
+
+
+def _after_fork_in_child():
+    # flock() locks belong to the open file, which a forked child shares with its parent
+    global _buckets
+    _buckets = None
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _client_key(key_type):
+    if key_type == 'user':
+        user_id = request.headers.get('X-User-ID') or request.args.get('userId')
+        if not user_id and request.is_json:
+            user_id = (request.get_json(silent=True) or {}).get('userId')
+        if user_id:
+            return f'user:{user_id}'
+    elif key_type == 'staff':
+        staff_id = request.headers.get('X-Staff-ID') or request.args.get('staffId')
+        if staff_id:
+            return f'staff:{staff_id}'
+    return _ip_key()
+
+
+def _ip_key():
+    return f'ip:{request.remote_addr}'
+
+
+def _reject(status, retry_after, message):
+    response = jsonify({'error': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def before_request():
+    """Reject over-limit clients with 429 and saturated endpoint classes with 503."""
+    if not RATE_LIMITS_ENABLED or not request.endpoint:
+        return None
+    endpoint_class = ENDPOINT_CLASSES.get(request.endpoint.rsplit('.', 1)[-1])
+    if not endpoint_class:
+        return None
+    limit = LIMITS[endpoint_class]
+
+    table = buckets()
+    client_keys = [(_client_key(limit.key), limit.rate, limit.burst)]
+    if client_keys[0][0] != _ip_key():
+        # First, so a client rotating ids is stopped before it creates a bucket per id
+        client_keys.insert(0, (_ip_key(), limit.ip_rate or limit.rate, limit.ip_burst or limit.burst))
+    for client_key, rate, burst in client_keys:
+        wait = table.take(f'{endpoint_class}:{client_key}', rate, burst)
+        if wait:
+            metrics.incr(endpoint_class, 'rate_limited')
+            logger.warning(f"Rate limited {endpoint_class} for {client_key}")
+            return _reject(429, wait, 'Too many requests')
+    wait = table.take(f'{endpoint_class}:*', limit.route_rate, limit.route_burst)
+    if wait:
+        metrics.incr(endpoint_class, 'shed')
+        logger.warning(f"Shedding {endpoint_class}: route-wide rate exceeded")
+        return _reject(503, wait, 'Service busy, please retry')
+
+    if not _in_flight[endpoint_class].acquire(blocking=False):
+        metrics.incr(endpoint_class, 'shed')
+        logger.warning(f"Shedding {endpoint_class}: {limit.concurrency} requests already in flight")
+        return _reject(503, 1, 'Service busy, please retry')
+    g.admission_class = endpoint_class
+    metrics.incr(endpoint_class, 'admitted')
+    return None
+
+
+def teardown_request(exc):
+    endpoint_class = g.pop('admission_class', None)
+    if endpoint_class:
+        _in_flight[endpoint_class].release()
+
+
+def init_app(app):
+    app.before_request(before_request)
+    app.teardown_request(teardown_request)
@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from app.db import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATIONS_DIR = os.getenv(
+    'RECOMMENDATIONS_DIR',
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'recommendations'))
+)
+TOP_K = 20
+# Width of the orderId range read per query while building
+READ_CHUNK_ORDERS = 50000
+# Orders younger than this are left for the next run, so transactions still
+# committing with lower orderIds are not skipped by the watermark
+SETTLE_SECONDS = 60
+
+PAIRS_FILE = 'pairs.npz'
+TOPK_IDS_FILE = 'topk_ids.npy'
+TOPK_COUNTS_FILE = 'topk_counts.npy'
+META_FILE = 'meta.json'
+
+
+def pair_counts(order_ids, product_ids):
+    """Co-occurrence counts of product pairs bought in the same order.
+
+    Returns (first, second, count) arrays with first < second, i.e. the upper
+    triangle of the sparse product x product matrix in COO form.
+    """
+    if len(order_ids) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    # One row per distinct (order, product), sorted by order then product
+    rows = np.unique(np.stack([order_ids, product_ids], axis=1), axis=0)
+    orders, products = rows[:, 0], rows[:, 1]
+
+    _, starts, sizes = np.unique(orders, return_index=True, return_counts=True)
+    ends = np.repeat(starts + sizes, sizes)
+    # Each item pairs with every later item of the same order
+    later = ends - np.arange(len(products)) - 1
+    total = int(later.sum())
+    if total == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    left = np.repeat(np.arange(len(products)), later)
+    run_starts = np.repeat(np.cumsum(later) - later, later)
+    right = left + 1 + (np.arange(total) - run_starts)
+
+    stride = int(products.max()) + 1
+    keys, counts = np.unique(products[left] * stride + products[right], return_counts=True)
+    return keys // stride, keys % stride, counts.astype(np.int64)
+
+
+def merge_pairs(first_a, second_a, count_a, first_b, second_b, count_b):
+    """Sum two COO pair lists."""
+    first = np.concatenate([first_a, first_b])
+    second = np.concatenate([second_a, second_b])
+    counts = np.concatenate([count_a, count_b])
+    if len(first) == 0:
+        return first, second, counts
+    stride = int(max(first.max(), second.max())) + 1
+    keys, inverse = np.unique(first * stride + second, return_inverse=True)
+    summed = np.bincount(inverse, weights=counts, minlength=len(keys)).astype(np.int64)
+    return keys // stride, keys % stride, summed
+
+
+def top_k(first, second, counts, k=TOP_K):
+    """Dense (max productId + 1, k) tables of related product ids (-1 padded) and counts."""
+    size = int(max(first.max(), second.max())) + 1 if len(first) else 1
+    ids = np.full((size, k), -1, dtype=np.int32)
+    scores = np.zeros((size, k), dtype=np.int32)
+    if len(first) == 0:
+        return ids, scores
+    # Both directions of every pair, ordered by source then count descending
+    source = np.concatenate([first, second])
+    target = np.concatenate([second, first])
+    weight = np.concatenate([counts, counts])
+    order = np.lexsort((target, -weight, source))
+    source, target, weight = source[order], target[order], weight[order]
+    _, starts, sizes = np.unique(source, return_index=True, return_counts=True)
+    rank = np.arange(len(source)) - np.repeat(starts, sizes)
+    keep = rank < k
+    ids[source[keep], rank[keep]] = target[keep]
+    scores[source[keep], rank[keep]] = weight[keep]
+    return ids, scores
+
+
+def _read_order_items(after_order_id, up_to_order_id):
+    """(orderId, productId) arrays for orders in (after_order_id, up_to_order_id]."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    order_chunks, product_chunks = [], []
+    start = after_order_id
+    while start < up_to_order_id:
+        end = min(start + READ_CHUNK_ORDERS, up_to_order_id)
+        cursor.execute(
+            'SELECT orderId, productId FROM order_items '
+            'WHERE orderId > %s AND orderId <= %s AND productId IS NOT NULL '
+            'UNION ALL '
+            'SELECT orderId, productId FROM order_items_archive '
+            'WHERE orderId > %s AND orderId <= %s AND productId IS NOT NULL',
+            (start, end, start, end)
+        )
+        rows = cursor.fetchall()
+        if rows:
+            chunk = np.array(rows, dtype=np.int64)
+            order_chunks.append(chunk[:, 0])
+            product_chunks.append(chunk[:, 1])
+        start = end
+    cursor.close()
+    conn.close()
+    if not order_chunks:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(order_chunks), np.concatenate(product_chunks)
+
+
+def _settled_order_id():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        'SELECT MAX(orderId) FROM '
+        '(SELECT MAX(orderId) AS orderId FROM orders WHERE timestamp < %s '
+        'UNION ALL SELECT MAX(orderId) FROM orders_archive) AS latest',
+        (datetime.now() - timedelta(seconds=SETTLE_SECONDS),)
+    )
+    (order_id,) = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return order_id or 0
+
+
+def _load_meta(directory):
+    try:
+        with open(os.path.join(directory, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'watermark': 0}
+
+
+def _write_atomic(directory, name, writer):
+    tmp = os.path.join(directory, f'.{name}.tmp')
+    with open(tmp, 'wb') as f:
+        writer(f)
+    os.replace(tmp, os.path.join(directory, name))
+
+
+def build(full=False, directory=RECOMMENDATIONS_DIR):
+    """Fold orders placed since the last run into the pair counts and rewrite the top-K tables.
+
+    With full=True the counts are rebuilt from every order. Returns the new watermark.
+    """
+    os.makedirs(directory, exist_ok=True)
+    meta = {'watermark': 0} if full else _load_meta(directory)
+    first = second = counts = np.zeros(0, dtype=np.int64)
+    pairs_path = os.path.join(directory, PAIRS_FILE)
+    if not full and os.path.exists(pairs_path):
+        with np.load(pairs_path) as stored:
+            first, second, counts = stored['first'], stored['second'], stored['counts']
+
+    watermark = meta['watermark']
+    up_to = _settled_order_id()
+    if up_to <= watermark and not full:
+        logger.info(f"Recommendations already current at order {watermark}")
+        return watermark
+
+    new_first, new_second, new_counts = pair_counts(*_read_order_items(watermark, up_to))
+    first, second, counts = merge_pairs(first, second, counts, new_first, new_second, new_counts)
+    ids, scores = top_k(first, second, counts)
+
+    _write_atomic(directory, PAIRS_FILE, lambda f: np.savez(f, first=first, second=second, counts=counts))
+    _write_atomic(directory, TOPK_COUNTS_FILE, lambda f: np.save(f, scores))
+    # The ids table is swapped last; readers reload when it changes
+    _write_atomic(directory, TOPK_IDS_FILE, lambda f: np.save(f, ids))
+    meta = {'watermark': up_to, 'pairs': int(len(first)), 'builtAt': datetime.now().isoformat()}
+    _write_atomic(directory, META_FILE, lambda f: f.write(json.dumps(meta).encode('utf-8')))
+    logger.info(f"Recommendations built through order {up_to}: {len(new_counts)} new pair counts, {len(first)} pairs total")
+    return up_to
+
+
+class RelatedProducts:
+    """Serves top-K lookups from the memory-mapped tables written by build()."""
+
+    def __init__(self, directory=RECOMMENDATIONS_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._ids = None
+        self._scores = None
+
+    def _refresh(self):
+        ids_path = os.path.join(self.directory, TOPK_IDS_FILE)
+        try:
+            mtime = os.stat(ids_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            self._ids = np.load(ids_path, mmap_mode='r')
+            self._scores = np.load(os.path.join(self.directory, TOPK_COUNTS_FILE), mmap_mode='r')
+            self._mtime = mtime
+
+    def lookup(self, product_id, limit=TOP_K):
+        """[(productId, coPurchaseCount)] for the product, best first."""
+        self._refresh()
+        ids, scores = self._ids, self._scores
+        if ids is None or product_id < 0 or product_id >= ids.shape[0]:
+            return []
+        row_ids = ids[product_id, :limit]
+        row_scores = scores[product_id, :limit]
+        return [(int(i), int(s)) for i, s in zip(row_ids, row_scores) if i >= 0]
+
+
+related_products = RelatedProducts()
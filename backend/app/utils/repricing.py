@@ -0,0 +1,237 @@
+import logging
+from collections import namedtuple
+from decimal import Decimal
+import numpy as np
+from app.db import get_db_connection
+from app.utils.catalog_snapshot import catalog_snapshot
+from app.utils.facets import UNCATEGORIZED
+from app.utils.http_cache import bump_catalog
+
+logger = logging.getLogger(__name__)
+
+# Products written per UPDATE statement
+REPRICE_CHUNK_SIZE = 500
+# Changed rows listed in a response; the counts always cover every change
+MAX_DIFF_ROWS = 1000
+
+ACTIONS = ('discount', 'markup', 'clear_discount')
+
+# Prices are held in integer cents; an original_price of 0 (or NULL) means "not discounted"
+CatalogPrices = namedtuple('CatalogPrices', 'product_ids category_ids price discount original')
+
+
+def _number_list(values, field):
+    if not isinstance(values, list) or not values:
+        raise ValueError(f'{field} must be a non-empty list of integers')
+    try:
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a non-empty list of integers')
+
+
+def _price_bound(value, field):
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a number')
+    if value < 0:
+        raise ValueError(f'{field} cannot be negative')
+    return int(round(value * 100))
+
+
+def parse_rules(rules):
+    """Validate the rules of a repricing request.
+
+    Each rule is {"match": {...}, "action": "discount"|"markup"|"clear_discount", "percent": n}.
+    match may narrow by categoryIds, productIds and a minPrice/maxPrice band
+    on the current price; an empty match selects the whole catalog.
+    """
+    if not isinstance(rules, list) or not rules:
+        raise ValueError('rules must be a non-empty list')
+    parsed = []
+    for position, rule in enumerate(rules, start=1):
+        if not isinstance(rule, dict):
+            raise ValueError(f'rule {position} must be an object')
+        match = rule.get('match') or {}
+        if not isinstance(match, dict):
+            raise ValueError(f'rule {position}: match must be an object')
+        action = rule.get('action')
+        if action not in ACTIONS:
+            raise ValueError(f'rule {position}: action must be one of {list(ACTIONS)}')
+
+        percent = rule.get('percent')
+        if action == 'discount':
+            if isinstance(percent, bool) or not isinstance(percent, int) or not 0 < percent < 100:
+                raise ValueError(f'rule {position}: discount percent must be a whole number between 1 and 99')
+        elif action == 'markup':
+            try:
+                percent = float(percent)
+            except (TypeError, ValueError):
+                raise ValueError(f'rule {position}: markup percent must be a number')
+            if percent <= -100:
+                raise ValueError(f'rule {position}: markup percent must be greater than -100')
+
+        min_price = _price_bound(match.get('minPrice'), 'minPrice')
+        max_price = _price_bound(match.get('maxPrice'), 'maxPrice')
+        if min_price is not None and max_price is not None and min_price > max_price:
+            raise ValueError(f'rule {position}: minPrice cannot be greater than maxPrice')
+
+        parsed.append({
+            'action': action,
+            'percent': percent,
+            'category_ids': _number_list(match['categoryIds'], 'categoryIds') if 'categoryIds' in match else None,
+            'product_ids': _number_list(match['productIds'], 'productIds') if 'productIds' in match else None,
+            'min_price': min_price,
+            'max_price': max_price,
+        })
+    return parsed
+
+
+def _cents(value):
+    return int(round(float(value) * 100)) if value is not None else 0
+
+
+def load_prices(cursor, lock=False):
+    """Read the pricing columns of every product into NumPy arrays."""
+    cursor.execute(
+        'SELECT productId, categoryId, price, discount_percentage, original_price FROM products ORDER BY productId'
+        + (' FOR UPDATE' if lock else '')
+    )
+    rows = cursor.fetchall()
+    return CatalogPrices(
+        product_ids=np.array([row[0] for row in rows], dtype=np.int64),
+        category_ids=np.array([UNCATEGORIZED if row[1] is None else row[1] for row in rows], dtype=np.int64),
+        price=np.array([_cents(row[2]) for row in rows], dtype=np.int64),
+        discount=np.array([int(row[3] or 0) for row in rows], dtype=np.int64),
+        original=np.array([_cents(row[4]) for row in rows], dtype=np.int64),
+    )
+
+
+def evaluate(catalog, rules):
+    """Apply the rules in order over the whole catalog; returns the new CatalogPrices.
+
+    Discounts are taken off the list price (original_price when the product
+    is already discounted), so two discount rules don't compound. A discount
+    never raises a price: products already selling below the new discounted
+    price keep their current price and discount. Markups move the selling
+    price and the list price together.
+    """
+    price = catalog.price.copy()
+    discount = catalog.discount.copy()
+    original = catalog.original.copy()
+    for rule in rules:
+        mask = np.ones(len(price), dtype=bool)
+        if rule['category_ids'] is not None:
+            mask &= np.isin(catalog.category_ids, rule['category_ids'])
+        if rule['product_ids'] is not None:
+            mask &= np.isin(catalog.product_ids, rule['product_ids'])
+        if rule['min_price'] is not None:
+            mask &= price >= rule['min_price']
+        if rule['max_price'] is not None:
+            mask &= price <= rule['max_price']
+
+        list_price = np.where(original > 0, original, price)
+        if rule['action'] == 'discount':
+            discounted = np.rint(list_price * (100 - rule['percent']) / 100).astype(np.int64)
+            mask &= discounted < price
+            price = np.where(mask, discounted, price)
+            original = np.where(mask, list_price, original)
+            discount = np.where(mask, rule['percent'], discount)
+        elif rule['action'] == 'markup':
+            factor = 1 + rule['percent'] / 100
+            price = np.where(mask, np.rint(price * factor).astype(np.int64), price)
+            original = np.where(mask & (original > 0), np.rint(original * factor).astype(np.int64), original)
+        else:
+            price = np.where(mask, list_price, price)
+            original = np.where(mask, 0, original)
+            discount = np.where(mask, 0, discount)
+    return CatalogPrices(catalog.product_ids, catalog.category_ids, price, discount, original)
+
+
+def changed_rows(before, after):
+    """Indexes of products whose price, discount or list price differ."""
+    return np.flatnonzero(
+        (before.price != after.price) | (before.discount != after.discount) | (before.original != after.original)
+    )
+
+
+def _money(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def _update_chunk(cursor, product_ids, prices, discounts, originals):
+    cases = ' '.join(['WHEN %s THEN %s'] * len(product_ids))
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    params = []
+    for values in (prices, discounts, originals):
+        for product_id, value in zip(product_ids, values):
+            params.extend([product_id, value])
+    params.extend(product_ids)
+    cursor.execute(
+        f"""
+        UPDATE products SET
+            price = CASE productId {cases} END,
+            discount_percentage = CASE productId {cases} END,
+            original_price = CASE productId {cases} END
+        WHERE productId IN ({placeholders})
+        """,
+        params
+    )
+
+
+def _diff_entry(before, after, row):
+    def money_or_none(cents):
+        return float(_money(cents)) if cents else None
+    return {
+        'productId': int(before.product_ids[row]),
+        'price': [float(_money(before.price[row])), float(_money(after.price[row]))],
+        'discountPercentage': [int(before.discount[row]), int(after.discount[row])],
+        'originalPrice': [money_or_none(before.original[row]), money_or_none(after.original[row])],
+    }
+
+
+def reprice(rules, dry_run=True, chunk_size=REPRICE_CHUNK_SIZE):
+    """Evaluate parsed rules over the catalog and, unless dry_run, write the changes.
+
+    The catalog is read under lock and every changed product is written in
+    chunked UPDATEs inside one transaction; caches are invalidated once,
+    after the commit. Returns the counts and [before, after] of changed rows.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        before = load_prices(cursor, lock=not dry_run)
+        after = evaluate(before, rules)
+        rows = changed_rows(before, after)
+
+        if not dry_run and len(rows):
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                _update_chunk(
+                    cursor,
+                    [int(product_id) for product_id in after.product_ids[chunk]],
+                    [_money(cents) for cents in after.price[chunk]],
+                    [int(discount) for discount in after.discount[chunk]],
+                    [_money(cents) if cents else None for cents in after.original[chunk]],
+                )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    if not dry_run and len(rows):
+        bump_catalog()
+        catalog_snapshot.current()
+        logger.info(f"Repriced {len(rows)} of {len(before.product_ids)} products")
+
+    price_change = (after.price[rows] - before.price[rows]).sum() if len(rows) else 0
+    return {
+        'dryRun': dry_run,
+        'products': len(before.product_ids),
+        'changed': len(rows),
+        'priceChangeTotal': float(_money(price_change)),
+        'changes': [_diff_entry(before, after, row) for row in rows[:MAX_DIFF_ROWS]],
+        'truncated': len(rows) > MAX_DIFF_ROWS,
+    }
@@ -0,0 +1,75 @@
+import os
+import threading
+from collections import OrderedDict
+
+SEARCH_CACHE_MAX_BYTES = int(os.getenv('SEARCH_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+# Cache queries that matched nothing, so repeated misspellings don't rescan products
+SEARCH_CACHE_NEGATIVE = os.getenv('SEARCH_CACHE_NEGATIVE', 'true').lower() != 'false'
+
+
+def normalize_query(query):
+    """Case-fold, trim and sort the search terms: 'Pro  Laptop' and 'laptop pro' share an entry."""
+    return sorted(set(query.casefold().split()))
+
+
+class SearchCache:
+    """LRU of serialized search responses, bounded by total body size.
+
+    Each entry remembers the catalog version it was computed under and is
+    ignored once the catalog changes.
+    """
+
+    def __init__(self, max_bytes=SEARCH_CACHE_MAX_BYTES, cache_negative=SEARCH_CACHE_NEGATIVE):
+        self.max_bytes = max_bytes
+        self.cache_negative = cache_negative
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._stats = {'hits': 0, 'negativeHits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key, catalog_version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != catalog_version:
+                if entry is not None:
+                    self._remove(key)
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['negativeHits' if entry[2] else 'hits'] += 1
+            return entry[1]
+
+    def put(self, key, catalog_version, body, empty=False):
+        if empty and not self.cache_negative or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (catalog_version, body, empty)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def _remove(self, key):
+        _, body, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['maxBytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['negativeHits'] + stats['misses']
+        stats['hitRate'] = (stats['hits'] + stats['negativeHits']) / lookups if lookups else 0.0
+        return stats
+
+
+search_cache = SearchCache()
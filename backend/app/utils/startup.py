@@ -0,0 +1,170 @@
+import logging
+import os
+import threading
+import time
+from flask import g, request
+from app.db import dispose_connections, get_db_connection
+from app.utils.catalog_snapshot import catalog_snapshot
+from app.utils.facets import catalog_facets
+from app.utils.recommendations import related_products
+
+logger = logging.getLogger(__name__)
+
+# Requests per process whose latency is tracked after startup
+FIRST_REQUESTS_TRACKED = 100
+# Seconds between warm-up retries triggered by the readiness probe
+WARM_RETRY_SECONDS = 5.0
+
+
+def _warm_database():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT 1')
+    cursor.fetchall()
+    cursor.close()
+    conn.close()
+
+
+def _warm_catalog_snapshot():
+    snapshot = catalog_snapshot.current()
+    if snapshot is None:
+        return
+    # Run the search and category paths once: the first np.unique call imports numpy.ma (~25 ms)
+    snapshot.search_rows(['warm'])
+    snapshot.category_rows(0, 'price', 'asc')
+
+
+def _warm_catalog_facets():
+    catalog_facets.ensure_loaded()
+
+
+def _warm_related_products():
+    related_products.lookup(0, 1)
+
+
+# (name, fn) run in order; the catalog is read once into the shared snapshot before the facets
+WARM_STEPS = [
+    ('database', _warm_database),
+    ('catalogSnapshot', _warm_catalog_snapshot),
+    ('catalogFacets', _warm_catalog_facets),
+    ('relatedProducts', _warm_related_products),
+]
+
+
+class StartupMetrics:
+    """Startup phase timings, warm-up state and early request latency for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pid = os.getpid()
+        self.phases = {}
+        self.warm_errors = {}
+        self.ready = False
+        self.warmed_at = 0.0
+        self._requests = []
+        self._first_request = None
+
+    def record_phase(self, name, seconds):
+        with self._lock:
+            self.phases[name] = round(seconds * 1000, 1)
+        logger.info(f"Startup {name}: {seconds * 1000:.1f} ms (pid {os.getpid()})")
+
+    def record_request(self, endpoint, seconds):
+        if len(self._requests) >= FIRST_REQUESTS_TRACKED:
+            return
+        with self._lock:
+            if len(self._requests) >= FIRST_REQUESTS_TRACKED:
+                return
+            if self._first_request is None:
+                self._first_request = {'endpoint': endpoint, 'ms': round(seconds * 1000, 2)}
+                logger.info(f"First request in pid {os.getpid()}: {endpoint} in {seconds * 1000:.1f} ms")
+            self._requests.append(seconds * 1000)
+
+    def reset_for_child(self):
+        """A forked worker keeps the parent's startup phases but measures its own requests."""
+        self._lock = threading.Lock()
+        self.pid = os.getpid()
+        self._requests = []
+        self._first_request = None
+
+    def snapshot(self):
+        with self._lock:
+            requests = sorted(self._requests)
+            return {
+                'pid': self.pid,
+                'ready': self.ready,
+                'phasesMs': dict(self.phases),
+                'warmErrors': dict(self.warm_errors),
+                'firstRequest': self._first_request,
+                'earlyRequests': {
+                    'count': len(requests),
+                    'p50Ms': round(requests[len(requests) // 2], 2) if requests else None,
+                    'maxMs': round(requests[-1], 2) if requests else None,
+                },
+            }
+
+
+metrics = StartupMetrics()
+_warm_lock = threading.Lock()
+
+
+def warm():
+    """Run every warm-up step; the process is ready once all of them have succeeded."""
+    with _warm_lock:
+        errors = {}
+        start = time.perf_counter()
+        for name, fn in WARM_STEPS:
+            step_start = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                errors[name] = str(e)
+                logger.error(f"Warm-up step {name} failed: {str(e)}")
+                continue
+            metrics.record_phase(f'warm.{name}', time.perf_counter() - step_start)
+        metrics.record_phase('warm', time.perf_counter() - start)
+        metrics.warm_errors = errors
+        metrics.warmed_at = time.monotonic()
+        metrics.ready = not errors
+    return metrics.ready
+
+
+def ensure_ready():
+    """Readiness check; retries a failed warm-up at most every WARM_RETRY_SECONDS."""
+    if not metrics.ready and time.monotonic() - metrics.warmed_at >= WARM_RETRY_SECONDS:
+        warm()
+    return metrics.ready
+
+
+def before_fork():
+    """In the server's master, after preloading: drop connections the workers must not share."""
+    dispose_connections()
+
+
+def after_fork():
+    """In each forked worker: measure its own requests and open its own connection pool."""
+    metrics.reset_for_child()
+    start = time.perf_counter()
+    try:
+        _warm_database()
+    except Exception as e:
+        metrics.ready = False
+        metrics.warm_errors['database'] = str(e)
+        logger.error(f"Worker {os.getpid()} could not connect to the database: {str(e)}")
+    metrics.record_phase('postFork', time.perf_counter() - start)
+
+
+def before_request():
+    g.request_started = time.perf_counter()
+
+
+def after_request(response):
+    started = g.get('request_started')
+    if started is not None:
+        metrics.record_request(request.endpoint or '-', time.perf_counter() - started)
+    return response
+
+
+def init_app(app):
+    app.before_request(before_request)
+    app.after_request(after_request)
@@ -0,0 +1,22 @@
+import argparse
+import logging
+from app.utils.order_archive import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_PAUSE_SECONDS, archive
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move finished orders into orders_archive / order_items_archive.')
+    parser.add_argument('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS,
+                        help=f'archive orders placed before this many days ago (minimum {ARCHIVE_AFTER_DAYS})')
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='orders per transaction')
+    parser.add_argument('--pause', type=float, default=ARCHIVE_PAUSE_SECONDS, help='seconds to sleep between batches')
+    parser.add_argument('--max-batches', type=int, help='stop after this many batches')
+    args = parser.parse_args()
+
+    moved = archive(args.older_than_days, args.batch_size, args.pause, args.max_batches)
+    print(f"Archived {moved} orders")
+
+
+if __name__ == '__main__':
+    main()
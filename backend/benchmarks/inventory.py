@@ -0,0 +1,130 @@
+"""Checkout throughput on one hot product: a single stock row versus sharded counter slots.
+
+Creates a scratch product in the database in .env, gives it plenty of
+stock, then has concurrent threads reserve one unit per transaction through
+inventory.reserve(), exactly as place_order does, and commit. This is run
+once with the stock in a single row (every checkout waits for the previous
+one's row lock until it commits) and once per slot count given. The scratch
+product and its reservations are deleted afterwards.
+
+Row locks only exist on MySQL. Under DB_BACKEND=sqlite every writer takes the
+database lock, so all layouts measure the same. So far it has only been run
+on SQLite; the slot layout still needs measuring on MySQL, where it matters.
+Checkouts that lose a deadlock once stock runs short are retried, as
+place_order does, and counted under `retries`.
+
+    cd backend && python -m benchmarks.inventory [threads] [slots ...]
+"""
+import logging
+import sys
+import threading
+import time
+from app.db import get_db_connection
+from app.utils import inventory
+
+CHECKOUTS_PER_THREAD = 200
+STOCK = 10 ** 7
+
+
+def create_product():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        'INSERT INTO products (title, price, categoryId, description) VALUES (%s, %s, %s, %s)',
+        ('Inventory benchmark product', 1, None, 'Scratch row for benchmarks/inventory.py')
+    )
+    product_id = cursor.lastrowid
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return product_id
+
+
+def reset_stock(product_id, slots):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM inventory_reservations WHERE productId = %s', (product_id,))
+    inventory.set_stock(cursor, product_id, None)
+    inventory.set_stock(cursor, product_id, STOCK, slots=slots)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def drop_product(product_id):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('DELETE FROM inventory_reservations WHERE productId = %s', (product_id,))
+    cursor.execute('DELETE FROM inventory_slots WHERE productId = %s', (product_id,))
+    cursor.execute('DELETE FROM products WHERE productId = %s', (product_id,))
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def checkout_loop(product_id, thread_index, latencies, errors, retries):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    items = [{'productId': product_id, 'quantity': 1}]
+    for n in range(CHECKOUTS_PER_THREAD):
+        # Negative order ids keep the scratch reservations apart from real orders
+        order_id = -(thread_index * CHECKOUTS_PER_THREAD + n + 1)
+        start = time.perf_counter()
+        while True:
+            try:
+                inventory.reserve(cursor, order_id, items)
+                conn.commit()
+                latencies.append(time.perf_counter() - start)
+                break
+            except Exception as e:
+                conn.rollback()
+                if not inventory.is_lock_conflict(e):
+                    errors.append(str(e))
+                    break
+                retries.append(order_id)
+    cursor.close()
+    conn.close()
+
+
+def run(product_id, threads):
+    latencies = []
+    errors = []
+    retries = []
+    workers = [
+        threading.Thread(target=checkout_loop, args=(product_id, index, latencies, errors, retries))
+        for index in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'throughput': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2] * 1000 if latencies else 0,
+        'p99': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0,
+        'errors': len(errors),
+        'retries': len(retries),
+    }
+
+
+def main():
+    logging.disable(logging.WARNING)
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    layouts = [1] + ([int(arg) for arg in sys.argv[2:]] or [inventory.INVENTORY_SLOTS])
+    product_id = create_product()
+    try:
+        print(f"{threads} threads x {CHECKOUTS_PER_THREAD} checkouts of product {product_id}")
+        print(f"{'slots':>6}{'checkouts/s':>14}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}{'retries':>9}")
+        for slots in layouts:
+            reset_stock(product_id, slots)
+            result = run(product_id, threads)
+            print(f"{slots:>6}{result['throughput']:>14.0f}{result['p50']:>10.2f}{result['p99']:>10.2f}{result['errors']:>8}{result['retries']:>9}")
+    finally:
+        drop_product(product_id)
+
+
+if __name__ == '__main__':
+    main()
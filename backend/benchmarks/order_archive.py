@@ -0,0 +1,134 @@
+"""Staff order listing latency as order history grows, with and without archiving.
+
+Builds synthetic histories of increasing length in a scratch SQLite database
+(nothing touches the database in .env), then times GET /api/orders/all
+through the Flask app: the first page, a status-filtered page, and filtered
+searches over the last 90 days and over all time whose approximate totals are
+recounted on every request. Each size is measured with every
+order in the hot table and again after archive() has moved finished orders
+older than ORDER_ARCHIVE_AFTER_DAYS.
+
+    cd backend && python -m benchmarks.order_archive [months ...]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SCRATCH = tempfile.mkdtemp(prefix='awe_archive_bench_')
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(SCRATCH, 'orders.db')
+os.environ['HTTP_CACHE_VERSIONS_FILE'] = os.path.join(SCRATCH, 'versions.bin')
+os.environ['RATE_LIMITS_ENABLED'] = 'false'
+os.environ['QUERY_PROFILING_ENABLED'] = 'false'
+
+import logging  # noqa: E402
+from app import create_app  # noqa: E402
+from app.db import get_db_connection  # noqa: E402
+from app.utils.order_archive import archive  # noqa: E402
+from app.utils.order_counts import order_counts  # noqa: E402
+
+ORDERS_PER_MONTH = 5000
+USERS = 2000
+ITERATIONS = 50
+
+RECENT = (datetime.now() - timedelta(days=90)).date().isoformat()
+
+# label -> (url, whether the approximate total is recounted on every request)
+QUERIES = {
+    'first page': ('/api/orders/all?limit=50', False),
+    'status=pending': ('/api/orders/all?limit=50&status=pending', False),
+    '90 days, COUNT': (f'/api/orders/all?limit=50&minTotal=500&dateFrom={RECENT}', True),
+    'all time, COUNT': ('/api/orders/all?limit=50&minTotal=500', True),
+}
+
+
+def reset_database():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    for table in ('order_items', 'orders', 'order_items_archive', 'orders_archive'):
+        cursor.execute(f'DELETE FROM {table}')
+    conn.commit()
+    cursor.execute('SELECT COUNT(*) FROM users')
+    if cursor.fetchone()[0] == 0:
+        cursor.executemany(
+            'INSERT INTO users (name, email, password) VALUES (%s, %s, %s)',
+            [(f'User {n}', f'user{n}@example.com', 'x') for n in range(USERS)]
+        )
+        conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def load_history(months):
+    """ORDERS_PER_MONTH orders per month; anything older than a month is finished."""
+    rng = random.Random(months)
+    now = datetime.now()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    order_id = 0
+    for month in range(months):
+        orders = []
+        items = []
+        for _ in range(ORDERS_PER_MONTH):
+            order_id += 1
+            placed = now - timedelta(days=30 * month + rng.random() * 30)
+            if month == 0:
+                status = rng.choice(['pending', 'processing', 'shipped', 'delivered'])
+            else:
+                status = 'cancelled' if rng.random() < 0.05 else 'delivered'
+            total = round(rng.uniform(10, 2000), 2)
+            orders.append((order_id, rng.randint(1, USERS), total, '{}', '{}', status, placed))
+            items.append((order_id, rng.randint(1, 9), 1, total))
+        cursor.executemany(
+            'INSERT INTO orders (orderId, userId, total, shipping, payment, status, timestamp) '
+            'VALUES (%s, %s, %s, %s, %s, %s, %s)',
+            orders
+        )
+        cursor.executemany(
+            'INSERT INTO order_items (orderId, productId, quantity, price) VALUES (%s, %s, %s, %s)',
+            items
+        )
+        conn.commit()
+    cursor.execute('ANALYZE')
+    cursor.close()
+    conn.close()
+    return order_id
+
+
+def time_queries(client):
+    results = {}
+    order_counts._status_counts = None
+    for label, (url, recount) in QUERIES.items():
+        client.get(url, headers={'X-Staff-ID': '1'})
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            if recount:
+                # Drop cached totals so every request pays for its COUNT
+                order_counts._filter_counts.clear()
+            response = client.get(url, headers={'X-Staff-ID': '1'})
+            assert response.status_code == 200, response.get_json()
+        results[label] = (time.perf_counter() - start) / ITERATIONS * 1000
+    return results
+
+
+def main():
+    logging.disable(logging.WARNING)
+    sizes = [int(arg) for arg in sys.argv[1:]] or [6, 24, 60]
+    client = create_app().test_client()
+    print(f"scratch database: {os.environ['SQLITE_PATH']}")
+    print(f"{'months':>7}{'orders':>10}  {'layout':<9}" + ''.join(f'{label:>20}' for label in QUERIES))
+    for months in sizes:
+        reset_database()
+        total = load_history(months)
+        for layout in ('hot only', 'archived'):
+            if layout == 'archived':
+                archive(pause=0, batch_size=5000)
+            results = time_queries(client)
+            print(f"{months:>7}{total:>10}  {layout:<9}" + ''.join(f'{results[label]:>17.2f} ms' for label in QUERIES))
+
+
+if __name__ == '__main__':
+    main()
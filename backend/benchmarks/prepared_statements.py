@@ -0,0 +1,57 @@
+"""Compare text-protocol queries with the prepared statement cache.
+
+Runs the product-by-id and cart JOIN statements against the database in
+.env, first as plain cursor.execute calls and then through
+Connection.fetch_one/fetch_all, and prints wall time and client CPU per query.
+
+    cd backend && python -m benchmarks.prepared_statements [iterations]
+"""
+import sys
+import time
+from app.db import STATEMENTS, get_db_connection
+
+PRODUCT_ID = 1
+USER_ID = '1'
+
+
+def run_text(conn, name, params, iterations):
+    cursor = conn.cursor(dictionary=True)
+    for _ in range(iterations):
+        cursor.execute(STATEMENTS[name], params)
+        cursor.fetchall()
+    cursor.close()
+
+
+def run_prepared(conn, name, params, iterations):
+    for _ in range(iterations):
+        conn.fetch_all(name, params)
+
+
+def measure(label, fn, *args):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    fn(*args)
+    return label, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    conn = get_db_connection()
+    print(f"{'path':<28}{'wall us/query':>16}{'cpu us/query':>16}")
+    for name, params in (('product_by_id', (PRODUCT_ID,)), ('cart_items', (USER_ID,))):
+        # Warm both paths so the first prepare is not counted
+        run_text(conn, name, params, 10)
+        run_prepared(conn, name, params, 10)
+        results = [
+            measure(f'{name} (text)', run_text, conn, name, params, iterations),
+            measure(f'{name} (prepared)', run_prepared, conn, name, params, iterations),
+        ]
+        for label, wall, cpu in results:
+            print(f"{label:<28}{wall / iterations * 1e6:>16.1f}{cpu / iterations * 1e6:>16.1f}")
+        saved = (results[0][2] - results[1][2]) / iterations * 1e6
+        print(f"{'  client CPU saved':<28}{'':>16}{saved:>16.1f}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
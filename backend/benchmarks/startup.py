@@ -0,0 +1,83 @@
+"""Startup time and first-request latency, cold versus warmed before serving.
+
+Each run starts a fresh interpreter against a scratch SQLite copy of the
+sample catalog (nothing touches the database in .env) and times the first
+request to each catalog endpoint, either straight after create_app() (what
+`python main.py` does) or after wsgi.py's warm-up (what gunicorn preloads).
+
+    cd backend && python -m benchmarks.startup [runs]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+SCRATCH = tempfile.mkdtemp(prefix='awe_startup_bench_')
+ENDPOINTS = [
+    '/api/products',
+    '/api/search?q=laptop',
+    '/api/categories/1/products',
+    '/api/categories/facets',
+    '/api/products/1/related',
+]
+
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+if sys.argv[1] == 'warmed':
+    import wsgi
+    app = wsgi.app
+else:
+    from app import create_app
+    app = create_app()
+ready = time.perf_counter() - started
+client = app.test_client()
+timings = {}
+for url in %r:
+    start = time.perf_counter()
+    client.get(url)
+    timings[url] = (time.perf_counter() - start) * 1000
+print(json.dumps({'startupMs': ready * 1000, 'firstRequestMs': timings}))
+""" % (ENDPOINTS,)
+
+
+def run(mode, runs):
+    env = dict(
+        os.environ,
+        DB_BACKEND='sqlite',
+        SQLITE_PATH=os.path.join(SCRATCH, 'store.db'),
+        HTTP_CACHE_VERSIONS_FILE=os.path.join(SCRATCH, 'versions.bin'),
+        CATALOG_SNAPSHOT_DIR=os.path.join(SCRATCH, 'catalog'),
+        RECOMMENDATIONS_DIR=os.path.join(SCRATCH, 'recommendations'),
+        RATE_LIMITS_ENABLED='false',
+        LOG_LEVEL='WARNING',
+    )
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', CHILD, mode], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    # One throwaway run creates the scratch database and the first snapshot
+    run('warmed', 1)
+    print(f"scratch directory: {SCRATCH} (median of {runs} runs)")
+    print(f"{'':<10}{'startup':>12}" + ''.join(f'{url:>30}' for url in ENDPOINTS))
+    for mode in ('cold', 'warmed'):
+        results = run(mode, runs)
+        startup = median([result['startupMs'] for result in results])
+        firsts = [median([result['firstRequestMs'][url] for result in results]) for url in ENDPOINTS]
+        print(f"{mode:<10}{startup:>9.1f} ms" + ''.join(f'{ms:>27.2f} ms' for ms in firsts))
+
+
+if __name__ == '__main__':
+    main()
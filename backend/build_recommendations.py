@@ -0,0 +1,18 @@
+import argparse
+import logging
+from app.utils.recommendations import build
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update the "frequently bought together" tables from order_items.')
+    parser.add_argument('--full', action='store_true', help='recount every order instead of only new ones')
+    args = parser.parse_args()
+
+    watermark = build(full=args.full)
+    print(f"Recommendations current through order {watermark}")
+
+
+if __name__ == '__main__':
+    main()
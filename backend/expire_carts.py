@@ -0,0 +1,32 @@
+import argparse
+import logging
+from app.utils.cart_retention import (
+    CART_RETENTION_ARCHIVE, CART_RETENTION_BATCH_SIZE, CART_RETENTION_DAYS, CART_RETENTION_PAUSE_SECONDS,
+    count_expired, cutoff_for, expire_carts
+)
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Delete abandoned cart items, optionally archiving them first.')
+    parser.add_argument('--older-than-days', type=int, default=CART_RETENTION_DAYS,
+                        help='delete items not added or changed for this many days')
+    parser.add_argument('--batch-size', type=int, default=CART_RETENTION_BATCH_SIZE, help='rows per transaction')
+    parser.add_argument('--pause', type=float, default=CART_RETENTION_PAUSE_SECONDS, help='seconds to sleep between batches')
+    parser.add_argument('--max-batches', type=int, help='stop after this many batches')
+    parser.add_argument('--archive', action=argparse.BooleanOptionalAction, default=CART_RETENTION_ARCHIVE,
+                        help='copy the rows to cart_items_archive before deleting them')
+    parser.add_argument('--dry-run', action='store_true', help='only count the rows that would be deleted')
+    args = parser.parse_args()
+
+    if args.dry_run:
+        cutoff = cutoff_for(args.older_than_days)
+        print(f"{count_expired(cutoff)} cart items last touched before {cutoff:%Y-%m-%d %H:%M} would be deleted")
+        return
+    deleted = expire_carts(args.older_than_days, args.batch_size, args.pause, args.max_batches, args.archive)
+    print(f"Deleted {deleted} cart items{' (archived to cart_items_archive)' if args.archive else ''}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""gunicorn settings for wsgi:app. The app (and its catalog snapshot, indexes
+and imports) is loaded once in the master and shared with the workers
+copy-on-write; database connections are opened by each worker after fork."""
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+# Each open order event stream (SSE) holds one of its worker's threads for up to
+# 5 minutes. Streams are capped so this many threads per worker are always left
+# for ordinary requests; the app reads the cap when it is preloaded.
+request_threads = int(os.getenv('GUNICORN_REQUEST_THREADS', '4'))
+if threads <= request_threads:
+    raise ValueError(f'GUNICORN_THREADS ({threads}) must exceed GUNICORN_REQUEST_THREADS ({request_threads})')
+os.environ['ORDER_EVENTS_MAX_STREAMS'] = str(min(
+    int(os.getenv('ORDER_EVENTS_MAX_STREAMS', threads)),
+    threads - request_threads,
+))
+preload_app = True
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    # Runs in the master after preloading and before the first fork
+    from app.utils import startup
+    startup.before_fork()
+
+
+def post_fork(server, worker):
+    from app.utils import startup
+    startup.after_fork()
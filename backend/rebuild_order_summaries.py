@@ -0,0 +1,19 @@
+import argparse
+import logging
+from app.utils.order_summaries import REBUILD_BATCH_SIZE, rebuild
+
+logging.basicConfig(level=logging.INFO)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill user_order_summaries from orders and order_items.')
+    parser.add_argument('--user-id', type=int, help='rebuild a single user')
+    parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE, help='users per transaction')
+    args = parser.parse_args()
+
+    written = rebuild(args.user_id, args.batch_size)
+    print(f"Rebuilt {written} order summaries")
+
+
+if __name__ == '__main__':
+    main()
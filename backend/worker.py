@@ -0,0 +1,78 @@
+import argparse
+import logging
+import os
+import signal
+import time
+
+# Orders cancelled here (expired stock reservations) must reach the web workers' event
+# streams, so publish through the shared event file rather than this process's own hub.
+# Set before the app modules are imported: order_events reads it at import.
+os.environ.setdefault('ORDER_EVENTS_BACKEND', 'shared')
+
+from app.utils import event_handlers  # noqa: F401 (registers the outbox handlers)
+from app.utils.outbox import default_worker_id, process_batch, purge_done
+from app.utils import cart_retention, inventory, order_archive, recommendations
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('worker')
+
+running = True
+
+# (name, default interval in seconds, fn) run between outbox batches
+PERIODIC_JOBS = [
+    ('recommendations', 600, lambda: recommendations.build()),
+    ('order_archive', 3600, lambda: order_archive.archive()),
+    ('inventory_expiry', 60, lambda: inventory.expire_reservations()),
+    ('cart_retention', 3600, lambda: cart_retention.expire_carts()),
+    ('outbox_purge', 3600, lambda: purge_done()),
+]
+
+
+def stop(signum, frame):
+    global running
+    logger.info("Shutting down after the current batch")
+    running = False
+
+
+def run_due_jobs(next_run):
+    now = time.monotonic()
+    for name, interval, fn in PERIODIC_JOBS:
+        if now < next_run[name]:
+            continue
+        next_run[name] = now + interval
+        try:
+            fn()
+        except Exception as e:
+            logger.error(f"Periodic job {name} failed: {str(e)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deliver outbox events written by the API.')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds to sleep when the outbox is empty')
+    parser.add_argument('--once', action='store_true', help='drain due events and exit')
+    parser.add_argument('--no-periodic', action='store_true', help='only deliver outbox events')
+    args = parser.parse_args()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    worker_id = default_worker_id()
+    logger.info(f"Outbox worker {worker_id} started")
+    next_run = {name: 0.0 for name, _, _ in PERIODIC_JOBS}
+    while running:
+        if not args.no_periodic and not args.once:
+            run_due_jobs(next_run)
+        try:
+            claimed = process_batch(args.batch_size, worker_id)
+        except Exception as e:
+            logger.error(f"Outbox batch failed: {str(e)}")
+            claimed = 0
+        if claimed == 0:
+            if args.once:
+                break
+            time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+"""Production entry point: the app is created and warmed once, before workers fork.
+
+    cd backend && gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import time
+
+_started = time.perf_counter()
+
+from app import create_app  # noqa: E402
+from app.utils import startup  # noqa: E402
+
+startup.metrics.record_phase('imports', time.perf_counter() - _started)
+
+_created = time.perf_counter()
+app = create_app()
+startup.metrics.record_phase('createApp', time.perf_counter() - _created)
+
+startup.warm()
+startup.metrics.record_phase('total', time.perf_counter() - _started)
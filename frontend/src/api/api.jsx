@@ -49,6 +49,27 @@ const api = {
         }
     },
 
+    async getProductsByIds(ids) {
+        try {
+            // Long id lists go in a POST body so the URL stays short
+            const response = ids.length > 50
+                ? await axios.post(`${API_URL}/api/products/batch`, { ids })
+                : await axios.get(`${API_URL}/api/products`, { params: { ids: ids.join(',') } });
+            return response.data;
+        } catch (error) {
+            throw error.response?.data || { error: 'Failed to fetch products' };
+        }
+    },
+
+    async getRelatedProducts(id, limit = 8) {
+        try {
+            const response = await axios.get(`${API_URL}/api/products/${id}/related`, { params: { limit } });
+            return response.data;
+        } catch (error) {
+            throw error.response?.data || { error: `Failed to fetch related products for ${id}` };
+        }
+    },
+
     async getProducts(params = {}) {
         try {
             // If search parameter is provided, redirect to searchProducts
@@ -66,6 +87,27 @@ const api = {
         }
     },
 
+    async getCategoryProducts(categoryId, sort = 'price', order = 'asc') {
+        try {
+            const response = await axios.get(`${API_URL}/api/categories/${categoryId}/products`, {
+                params: { sort, order }
+            });
+            return response.data;
+        } catch (error) {
+            throw error.response?.data || { error: `Failed to fetch products for category ${categoryId}` };
+        }
+    },
+
+    async getCategoryFacets(categoryId) {
+        try {
+            const url = categoryId ? `${API_URL}/api/categories/${categoryId}/facets` : `${API_URL}/api/categories/facets`;
+            const response = await axios.get(url);
+            return response.data;
+        } catch (error) {
+            throw error.response?.data || { error: 'Failed to fetch category facets' };
+        }
+    },
+
     async searchProducts(query) {
         try {
             if (!query || !query.trim()) {
@@ -196,6 +238,16 @@ const api = {
         }
     },
 
+    async getOrderSummary(userId) {
+        try {
+            const response = await axios.get(`${API_URL}/api/users/${userId}/order-summary`);
+            return response.data;
+        } catch (error) {
+            console.error('Get order summary error:', error.response?.data || error.message);
+            throw error.response?.data || { error: 'Failed to fetch order summary' };
+        }
+    },
+
     async placeOrder(data) {
         try {
             const response = await axios.post(`${API_URL}/api/checkout`, data);
@@ -291,10 +343,10 @@ const api = {
         }
     },
 
-    async getOrders(staffId) {
+    async getOrders(staffId, filters = {}) {
         try {
             const response = await axios.get(`${API_URL}/api/orders/all`, {
-                params: { staffId },
+                params: { staffId, ...filters },
                 headers: { 'X-Staff-ID': staffId }
             });
             console.log('Get orders response:', response.data);
@@ -333,6 +385,20 @@ const api = {
         }
     },
 
+    async bulkUpdateOrderStatus(staffId, payload) {
+        try {
+            const response = await axios.put(`${API_URL}/api/orders/bulk-status`, payload, {
+                params: { staffId },
+                headers: { 'X-Staff-ID': staffId }
+            });
+            console.log('Bulk update order status response:', response.data);
+            return response.data;
+        } catch (error) {
+            console.error('Bulk update order status error:', error.response?.data || error.message);
+            throw error.response?.data || { error: 'Failed to update order statuses' };
+        }
+    },
+
     async addProduct(staffId, productData) {
         try {
             // Ensure numeric fields are numbers
@@ -358,6 +424,98 @@ const api = {
             throw { error: error.response?.data?.error || 'Failed to add product' };
         }
     },
+
+    async repriceProducts(staffId, rules, dryRun = true) {
+        try {
+            const response = await axios.post(
+                `${API_URL}/api/products/reprice`,
+                { rules, dryRun },
+                { headers: { 'X-Staff-ID': staffId } }
+            );
+            return response.data;
+        } catch (error) {
+            console.error('Repricing error:', error.response?.data || error.message);
+            throw error.response?.data || { error: 'Failed to reprice products' };
+        }
+    },
+
+    async getProductStock(staffId, productId) {
+        try {
+            const response = await axios.get(`${API_URL}/api/products/${productId}/stock`, {
+                headers: { 'X-Staff-ID': staffId }
+            });
+            return response.data;
+        } catch (error) {
+            throw error.response?.data || { error: `Failed to fetch stock for product ${productId}` };
+        }
+    },
+
+    // change is { stock: n } (null stops tracking) or { adjust: n }
+    async updateProductStock(staffId, productId, change) {
+        try {
+            const response = await axios.put(`${API_URL}/api/products/${productId}/stock`, change, {
+                headers: { 'X-Staff-ID': staffId }
+            });
+            return response.data;
+        } catch (error) {
+            console.error('Update stock error:', error.response?.data || error.message);
+            throw error.response?.data || { error: `Failed to update stock for product ${productId}` };
+        }
+    },
+
+    /**
+     * Open a Server-Sent Events stream of order events.
+     * handlers: { onStatusChanged, onOrderPlaced, onReset }; onReset means events
+     * were missed and the caller should fetch its orders again.
+     * Returns a function that closes the stream.
+     */
+    subscribeOrderEvents(path, params, handlers = {}) {
+        // EventSource reconnects on its own and resends the last event id it saw. It gives up
+        // when the server answers with an error (e.g. 503 when the worker's streams are full),
+        // so reopen it later from the last event id seen.
+        let source;
+        let lastEventId;
+        let retryTimer;
+        let closed = false;
+        const open = (reopening = false) => {
+            const query = lastEventId ? { ...params, lastEventId } : params;
+            source = new EventSource(`${API_URL}${path}?${new URLSearchParams(query)}`);
+            if (reopening && !lastEventId && handlers.onReset) {
+                // Nothing to resume from: reload whatever changed while disconnected
+                source.onopen = () => handlers.onReset({});
+            }
+            const listen = (type, handler) => {
+                source.addEventListener(type, (event) => {
+                    lastEventId = event.lastEventId || lastEventId;
+                    if (handler) {
+                        handler(JSON.parse(event.data));
+                    }
+                });
+            };
+            listen('order.status_changed', handlers.onStatusChanged);
+            listen('order.placed', handlers.onOrderPlaced);
+            listen('reset', handlers.onReset);
+            source.onerror = () => {
+                if (source.readyState === EventSource.CLOSED && !closed) {
+                    retryTimer = setTimeout(() => open(true), 5000 + Math.random() * 5000);
+                }
+            };
+        };
+        open();
+        return () => {
+            closed = true;
+            clearTimeout(retryTimer);
+            source.close();
+        };
+    },
+
+    subscribeToOrderEvents(userId, handlers) {
+        return this.subscribeOrderEvents('/api/orders/events', { userId }, handlers);
+    },
+
+    subscribeToAllOrderEvents(staffId, handlers) {
+        return this.subscribeOrderEvents('/api/orders/events/all', { staffId }, handlers);
+    },
 };
 
 export default api;
\ No newline at end of file
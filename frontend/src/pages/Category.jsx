@@ -8,15 +8,16 @@ import Navbar from '../components/Navbar';
  * Category page for browsing products by category
  */
 const Category = () => {
-    const { categoryName } = useParams();
+    const { categoryId } = useParams();
     const [products, setProducts] = useState([]);
+    const [sort, setSort] = useState('price');
     const [loading, setLoading] = useState(true);
 
     useEffect(() => {
-        // Placeholder for GET /api/products?category={categoryName}
         const fetchProducts = async () => {
             try {
-                const data = await api.getProducts({ category: categoryName });
+                const order = sort === 'price' ? 'asc' : 'desc';
+                const data = await api.getCategoryProducts(categoryId, sort, order);
                 setProducts(data);
             } catch (error) {
                 console.error(error.error || 'Failed to fetch products');
@@ -25,25 +26,31 @@ const Category = () => {
             }
         };
         fetchProducts();
-    }, [categoryName]);
+    }, [categoryId, sort]);
 
-    // Mock data for now
-    const mockProducts = [
-        { id: 1, title: `${categoryName} Item 1`, price: 199.99, image: `https://via.placeholder.com/300x200?text=${categoryName} 1` },
-        { id: 2, title: `${categoryName} Item 2`, price: 299.99, image: `https://via.placeholder.com/300x200?text=${categoryName} 2` },
-    ];
     if (loading) return <div className="text-center py-12">Loading...</div>;
 
     return (
         <div className="min-h-screen bg-gray-100">
             <div className="py-12">
                 <div className="container mx-auto">
-                    <h1 className="text-3xl font-bold text-center mb-8">{categoryName}</h1>
+                    <h1 className="text-3xl font-bold text-center mb-8">Category {categoryId}</h1>
+                    <div className="flex justify-end mb-6">
+                        <select
+                            value={sort}
+                            onChange={(e) => setSort(e.target.value)}
+                            className="p-2 border border-gray-300 rounded"
+                        >
+                            <option value="price">Price: Low to High</option>
+                            <option value="rating">Top Rated</option>
+                            <option value="discount">Biggest Discount</option>
+                        </select>
+                    </div>
                     <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-6">
                         {products.length > 0 ? (
                             products.map((product) => (
                                 <ProductCard
-                                    key={product.id}
+                                    key={product.productId}
                                     title={product.title}
                                     price={product.price}
                                     image={product.image}
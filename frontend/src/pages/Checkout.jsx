@@ -100,6 +100,7 @@ const Checkout = () => {
                 total: total.toFixed(2),
                 shipping: shippingForm,
                 payment: {
+                    method: 'card',
                     cardName: paymentForm.cardName,
                     last4: paymentForm.cardNumber.slice(-4),
                 },
@@ -112,7 +113,8 @@ const Checkout = () => {
             navigate('/order-confirmation', { state: { orderId: response.orderId, order } });
         } catch (error) {
             console.error('Checkout failed:', error);
-            setError('Failed to place order. Please try again.');
+            // Out of stock (409) names the product and what is left
+            setError(error.productId ? error.error : 'Failed to place order. Please try again.');
         }
     };
 
@@ -29,6 +29,19 @@ const OrderDetails = () => {
             }
         };
         fetchOrderDetails();
+
+        const userId = localStorage.getItem('userId');
+        if (!userId) {
+            return undefined;
+        }
+        return api.subscribeToOrderEvents(userId, {
+            onStatusChanged: (event) => {
+                if (String(event.orderId) === String(orderId)) {
+                    setOrder((current) => (current ? { ...current, status: event.status } : current));
+                }
+            },
+            onReset: fetchOrderDetails,
+        });
     }, [orderId]);
 
     // Helper function to decode image paths
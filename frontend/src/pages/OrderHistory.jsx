@@ -28,6 +28,19 @@ const OrderHistory = () => {
             }
         };
         fetchOrderHistory();
+
+        const userId = localStorage.getItem('userId');
+        if (!userId) {
+            return undefined;
+        }
+        // Status changes arrive as events; only new orders (and missed events) need a refetch
+        return api.subscribeToOrderEvents(userId, {
+            onStatusChanged: (event) => setOrders((current) => current.map((order) => (
+                order.orderId === event.orderId ? { ...order, status: event.status } : order
+            ))),
+            onOrderPlaced: fetchOrderHistory,
+            onReset: fetchOrderHistory,
+        });
     }, []);
 
     if (loading) {
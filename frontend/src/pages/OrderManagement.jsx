@@ -9,6 +9,9 @@ import Navbar from '../components/Navbar';
  */
 const OrderManagement = () => {
     const [orders, setOrders] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [totalOrders, setTotalOrders] = useState(null);
+    const [newOrders, setNewOrders] = useState(0);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [alert, setAlert] = useState(null);
@@ -40,7 +43,10 @@ const OrderManagement = () => {
             try {
                 const data = await api.getOrders(staffId);
                 console.log('Fetched orders:', data); // Debug log
-                setOrders(data);
+                setOrders(data.orders);
+                setNextCursor(data.nextCursor);
+                setTotalOrders(data.approximateTotal);
+                setNewOrders(0);
                 setError(null);
             } catch (error) {
                 console.error('Failed to fetch orders:', error);
@@ -50,6 +56,15 @@ const OrderManagement = () => {
             }
         };
         fetchOrders();
+
+        // Orders already on the page are updated in place; new ones are counted until the list is reloaded
+        return api.subscribeToAllOrderEvents(staffId, {
+            onStatusChanged: (event) => setOrders((current) => current.map((order) => (
+                order.orderId === event.orderId ? { ...order, status: event.status } : order
+            ))),
+            onOrderPlaced: () => setNewOrders((count) => count + 1),
+            onReset: fetchOrders,
+        });
     }, [staffId, navigate]);
 
     const handleViewDetails = async (orderId) => {
@@ -68,14 +83,39 @@ const OrderManagement = () => {
             await api.updateOrderStatus(orderId, newStatus, staffId);
             setAlert({ message: 'Order status updated successfully.', type: 'success' });
             // Refresh the orders list
-            const updatedOrders = await api.getOrders(staffId);
-            setOrders(updatedOrders);
+            setOrders((current) => current.map((order) => (
+                order.orderId === orderId ? { ...order, status: newStatus } : order
+            )));
         } catch (error) {
             console.error('Failed to update order status:', error);
             setAlert({ message: error.error || 'Failed to update order status.', type: 'error' });
         }
     };
 
+    const handleLoadMore = async () => {
+        try {
+            const data = await api.getOrders(staffId, { cursor: nextCursor });
+            setOrders((current) => [...current, ...data.orders]);
+            setNextCursor(data.nextCursor);
+        } catch (error) {
+            console.error('Failed to fetch more orders:', error);
+            setAlert({ message: error.error || 'Failed to fetch more orders.', type: 'error' });
+        }
+    };
+
+    const handleShowNewOrders = async () => {
+        try {
+            const data = await api.getOrders(staffId);
+            setOrders(data.orders);
+            setNextCursor(data.nextCursor);
+            setTotalOrders(data.approximateTotal);
+            setNewOrders(0);
+        } catch (error) {
+            console.error('Failed to fetch new orders:', error);
+            setAlert({ message: error.error || 'Failed to fetch new orders.', type: 'error' });
+        }
+    };
+
     const handleLogout = () => {
         localStorage.removeItem('staffId');
         localStorage.removeItem('staffRole');
@@ -133,7 +173,17 @@ const OrderManagement = () => {
 
                     {/* Orders Table */}
                     <div className="bg-gray-800/50 backdrop-blur-xl border border-gray-700/50 rounded-2xl p-8 shadow-2xl">
-                        <h2 className="text-2xl font-semibold text-white mb-6">All Orders</h2>
+                        <h2 className="text-2xl font-semibold text-white mb-6">
+                            All Orders{totalOrders !== null && <span className="text-gray-400 text-lg"> ({totalOrders})</span>}
+                        </h2>
+                        {newOrders > 0 && (
+                            <button
+                                onClick={handleShowNewOrders}
+                                className="w-full mb-6 py-2 bg-yellow-400/10 border border-yellow-400/30 text-yellow-400 rounded-lg hover:bg-yellow-400/20 transition-colors"
+                            >
+                                {newOrders} new order{newOrders === 1 ? '' : 's'} - show
+                            </button>
+                        )}
                         {orders.length === 0 ? (
                             <div className="text-center py-8">
                                 <div className="w-20 h-20 bg-gray-700/50 rounded-full flex items-center justify-center mx-auto mb-6">
@@ -202,6 +252,16 @@ const OrderManagement = () => {
                                         ))}
                                     </tbody>
                                 </table>
+                                {nextCursor && (
+                                    <div className="mt-6 text-center">
+                                        <button
+                                            onClick={handleLoadMore}
+                                            className="bg-gray-700/50 hover:bg-gray-700/70 text-gray-300 hover:text-gray-200 border border-gray-600/50 hover:border-gray-600/70 font-semibold py-3 px-6 rounded-xl transition-all duration-200"
+                                        >
+                                            Load more
+                                        </button>
+                                    </div>
+                                )}
                             </div>
                         )}
                     </div>
@@ -232,11 +292,21 @@ const OrderManagement = () => {
                                     </div>
                                     <div>
                                         <p className="text-gray-400 text-sm">Shipping</p>
-                                        <p className="text-white">{JSON.stringify(selectedOrder.shipping)}</p>
+                                        <p className="text-white">
+                                            {selectedOrder.shipping?.fullName}<br />
+                                            {selectedOrder.shipping?.address}<br />
+                                            {[selectedOrder.shipping?.city, selectedOrder.shipping?.state, selectedOrder.shipping?.zip]
+                                                .filter(Boolean).join(', ')}<br />
+                                            {selectedOrder.shipping?.country}
+                                        </p>
                                     </div>
                                     <div>
                                         <p className="text-gray-400 text-sm">Payment</p>
-                                        <p className="text-white">{JSON.stringify(selectedOrder.payment)}</p>
+                                        <p className="text-white">
+                                            {selectedOrder.payment?.method || 'card'}
+                                            {selectedOrder.payment?.last4 && ` ending ${selectedOrder.payment.last4}`}
+                                            {selectedOrder.payment?.cardName && ` (${selectedOrder.payment.cardName})`}
+                                        </p>
                                     </div>
                                     <div>
                                         <p className="text-gray-400 text-sm">Items</p>
@@ -3,6 +3,7 @@ import { useParams, Link, useNavigate } from 'react-router-dom';
 import api from '../api/api.jsx';
 import Button from '../components/Button.jsx';
 import Alert from '../components/Alert.jsx';
+import ProductCard from '../components/ProductCard.jsx';
 
 /**
  * Product details page
@@ -16,6 +17,7 @@ const ProductDetails = () => {
     const [alertVisible, setAlertVisible] = useState(false);
     const [alertMessage, setAlertMessage] = useState('');
     const [alertType, setAlertType] = useState('success');
+    const [relatedProducts, setRelatedProducts] = useState([]);
 
     useEffect(() => {
         const fetchProduct = async () => {
@@ -38,6 +40,14 @@ const ProductDetails = () => {
         fetchProduct();
     }, [productId]);
 
+    useEffect(() => {
+        // Optional section: the page works the same without recommendations
+        setRelatedProducts([]);
+        api.getRelatedProducts(productId, 4)
+            .then(setRelatedProducts)
+            .catch((error) => console.error('Failed to fetch related products:', error));
+    }, [productId]);
+
     const showAlert = (message, type = 'success') => {
         setAlertMessage(message);
         setAlertType(type);
@@ -307,6 +317,32 @@ const ProductDetails = () => {
                     </div>
                 </div>
 
+                {relatedProducts.length > 0 && (
+                    <div className="mt-12">
+                        <h2 className="text-2xl font-bold text-gray-900 mb-6">Frequently Bought Together</h2>
+                        <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-4 gap-8">
+                            {relatedProducts.map((related) => (
+                                <Link
+                                    key={related.productId}
+                                    to={`/product-details/${related.productId}`}
+                                    className="block transform transition-transform hover:scale-105"
+                                >
+                                    <ProductCard
+                                        id={related.productId}
+                                        title={related.title}
+                                        price={related.price}
+                                        original_price={related.original_price}
+                                        discount_percentage={related.discount_percentage || 0}
+                                        rating={related.rating || 4.0}
+                                        image={related.image || ''}
+                                        description={related.description}
+                                    />
+                                </Link>
+                            ))}
+                        </div>
+                    </div>
+                )}
+
                 <div className="text-center mt-12">
                     <Link
                         to="/products"